@@ -1,6 +1,11 @@
 from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
+from rasa_sdk.events import FollowupAction
 from rasa_sdk.executor import CollectingDispatcher
+from collections import namedtuple
+from datetime import datetime
+import asyncio
+import functools
 import sys
 import os
 
@@ -8,75 +13,363 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 
 try:
-    from models import create_session, UnansweredQuestion, Product, Order
+    from sqlalchemy import bindparam, insert, select, update
+    from models import (session_scope, async_session_scope, async_driver_available, statement_timeout,
+                        UnansweredQuestion, Product, Order, FAQ)
 except ImportError:
     # Fallback if database not available
-    create_session = None
+    session_scope = None
+    statement_timeout = None
+    async_session_scope = None
+    async_driver_available = None
     UnansweredQuestion = None
     Product = None
     Order = None
+    FAQ = None
+
+from cache import LRUCache
+from invalidation import get_invalidation_bus
+from metrics import RequestMetrics, default_registry, metrics_enabled, pool_collector, stats_collector
+from profiling import load_budgets, profile_mode, query_profile
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .product_index import ProductCatalog, ProductRecord, make_record
+from .question_writer import QuestionWriter
+from .question_clusters import QuestionClusters, signature_bytes
+from .faq_index import FaqCatalog, FaqEntry
+
+def load_product_records():
+    """Load the columns the product index needs, in catalog order"""
+    with session_scope() as session:
+        rows = session.query(
+            Product.product_id,
+            Product.product_name,
+            Product.current_stock,
+            Product.moq,
+            Product.quantity_type
+        ).order_by(Product.product_id).all()
+        return [make_record(*row) for row in rows]
+
+# Near-duplicate clusters of unanswered questions, one row per cluster
+question_clusters = QuestionClusters()
+
+def load_question_clusters():
+    """Index every cluster; rows stored before clustering are hashed from their text"""
+    with session_scope() as session:
+        rows = session.query(
+            UnansweredQuestion.uq_id,
+            UnansweredQuestion.minhash,
+            UnansweredQuestion.question
+        ).execution_options(stream_results=True)
+        question_clusters.load(rows.yield_per(10000))
+
+def on_unanswered_change(key):
+    """
+    Invalidation bus callback for reviewer edits: re-index or drop one cluster.
+
+    Keyless changes come from action servers after a batch, including this
+    one; clusters other action servers created are picked up by the TTL
+    reload, and until then the unique signature merges exact repeats.
+    """
+    if key is None or not question_clusters.loaded:
+        return
+    with session_scope() as session:
+        row = session.execute(
+            select(UnansweredQuestion.uq_id, UnansweredQuestion.minhash, UnansweredQuestion.question)
+            .where(UnansweredQuestion.uq_id == int(key))
+        ).first()
+    if row is None:
+        question_clusters.remove(int(key))
+    else:
+        question_clusters.add_rows([row])
+
+def insert_cluster_statement(session):
+    """
+    INSERT of a new cluster that, on PostgreSQL and SQLite, adds to the
+    cluster with the same signature if another action server created it first.
+    """
+    table = UnansweredQuestion.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return insert(table).returning(table.c.uq_id)
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.minhash],
+        set_={'occurrences': table.c.occurrences + stmt.excluded.occurrences,
+              'last_seen': stmt.excluded.last_seen}
+    ).returning(table.c.uq_id)
+
+def record_unanswered_questions(questions):
+    """
+    Fold a batch of unanswered questions into their clusters: a repeat of a
+    known question bumps its occurrence count and last_seen, a new question
+    becomes a new row.
+    """
+    if question_clusters.is_stale():
+        load_question_clusters()
+
+    table = UnansweredQuestion.__table__
+    now = datetime.utcnow()
+    with session_scope() as session:
+        counts, created = question_clusters.assign(questions)
+        if counts:
+            existing = set(session.scalars(
+                select(UnansweredQuestion.uq_id).where(UnansweredQuestion.uq_id.in_(counts))))
+            stale = [key for key in counts if key not in existing]
+            if stale:
+                # Clusters deleted by a reviewer; their questions start new ones
+                for key in stale:
+                    question_clusters.remove(key)
+                counts, created = question_clusters.assign(questions)
+
+        if counts:
+            session.execute(
+                update(table)
+                .where(table.c.uq_id == bindparam('key'))
+                .values(occurrences=table.c.occurrences + bindparam('count'), last_seen=now),
+                [{'key': key, 'count': count} for key, count in counts.items()]
+            )
+        stmt = insert_cluster_statement(session)
+        keys = [session.execute(stmt, {'question': question, 'occurrences': count,
+                                       'first_seen': now, 'last_seen': now,
+                                       'minhash': signature_bytes(signature)}).scalar_one()
+                for question, signature, count in created]
+        session.commit()
+    question_clusters.register(keys, created)
+
+    # Lets the admin API know its unanswered list changed
+    try:
+        get_invalidation_bus().publish('unanswered')
+    except Exception as e:
+        print(f"Invalidation error: {e}")
+
+def resolve_db_mode():
+    """
+    Decide how actions reach the database.
+
+    DB_ASYNC_MODE=async uses the async engine, sync runs the blocking
+    queries in the default thread pool, and auto (the default) picks async
+    when the async driver is installed.
+    """
+    mode = os.getenv('DB_ASYNC_MODE', 'auto').lower()
+    if mode == 'auto':
+        mode = 'async' if async_driver_available and async_driver_available() else 'sync'
+    return mode
+
+DB_MODE = resolve_db_mode() if session_scope else 'sync'
+
+# Rendered order status kept in the order cache
+OrderStatusRecord = namedtuple('OrderStatusRecord', ['status', 'product_name', 'estimated_delivery'])
+
+# Read-through cache of order statuses, invalidated by OrderManager changes.
+# Expired entries are kept ORDER_CACHE_STALE_TTL seconds more as answers of
+# last resort while the database is unavailable.
+order_cache = LRUCache(
+    max_size=int(os.getenv('ORDER_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('ORDER_CACHE_TTL', '300')),
+    stale_ttl=float(os.getenv('ORDER_CACHE_STALE_TTL', '86400'))
+)
+
+# Shared by every action that queries the database on the user's behalf
+db_breaker = CircuitBreaker('database')
+
+# Longest an action waits for the database before answering without it
+ORDER_LOOKUP_TIMEOUT = float(os.getenv('ORDER_LOOKUP_TIMEOUT', '2.0'))
+PRODUCT_REFRESH_TIMEOUT = float(os.getenv('PRODUCT_REFRESH_TIMEOUT', '2.0'))
+
+STALE_NOTE = "Note: I couldn't reach the database just now, so this information may be out of date."
+
+def order_status_query(order_id):
+    """Status, product name and delivery date of one order in a single joined query"""
+    return (select(Order.status, Product.product_name, Order.estimated_delivery)
+            .join(Product, Order.product_id == Product.product_id)
+            .where(Order.order_id == order_id))
+
+def fetch_order_status_sync(order_id, timeout=None):
+    with session_scope() as session:
+        # Stops the query on the server too, not just the wait for it
+        limit = statement_timeout(session.get_bind().dialect.name, timeout)
+        if limit is not None:
+            session.execute(limit)
+        return session.execute(order_status_query(order_id)).first()
+
+async def fetch_order_status_async(order_id, timeout=None):
+    async with async_session_scope() as session:
+        limit = statement_timeout(session.bind.dialect.name, timeout)
+        if limit is not None:
+            await session.execute(limit)
+        result = await session.execute(order_status_query(order_id))
+        return result.first()
+
+async def fetch_order_status(order_id):
+    """
+    Look up an order through the order cache without blocking the event loop.
+
+    The query goes through db_breaker and is abandoned after
+    ORDER_LOOKUP_TIMEOUT seconds; CircuitOpenError and asyncio.TimeoutError
+    tell the caller the database could not answer in time.
+    """
+    record = order_cache.get(order_id)
+    if record is not None:
+        return record
+
+    if DB_MODE == 'async':
+        make_call = lambda: fetch_order_status_async(order_id, ORDER_LOOKUP_TIMEOUT)
+    else:
+        # to_thread carries the context, so the query is attributed to this action's profile
+        make_call = lambda: asyncio.to_thread(fetch_order_status_sync, order_id, ORDER_LOOKUP_TIMEOUT)
+    row = await db_breaker.call(make_call, ORDER_LOOKUP_TIMEOUT)
+
+    if row is None:
+        return None
+    record = OrderStatusRecord(*row)
+    order_cache.set(order_id, record)
+    return record
+
+def invalidate_order(key):
+    """Invalidation bus callback: drop one order, or all of them when key is None"""
+    if key is None:
+        order_cache.clear()
+    else:
+        order_cache.invalidate(int(key))
+
+# Product snapshot shared by every ActionGetProductInfo run
+product_catalog = ProductCatalog(load_product_records)
+
+# Background writer so fallbacks do not wait on the database
+question_writer = QuestionWriter(record_unanswered_questions)
+
+def load_faqs():
+    with session_scope() as session:
+        return [FaqEntry(*row) for row in session.query(FAQ.faq_id, FAQ.question, FAQ.answer)]
+
+def load_faq(faq_id):
+    """One FAQ, or None if it was deleted"""
+    with session_scope() as session:
+        row = session.query(FAQ.faq_id, FAQ.question, FAQ.answer).filter(FAQ.faq_id == faq_id).first()
+        return FaqEntry(*row) if row else None
+
+# TF-IDF index of the FAQ table, updated as FAQs are edited in the admin UI
+faq_catalog = FaqCatalog(load_faqs, load_faq)
+
+# Per-action latency, in-flight runs and errors, plus the state of the caches
+# above; served on the action server's /metrics by rasa_sdk_plugins
+action_metrics = RequestMetrics(default_registry, 'action_runs', 'action runs', ('action',))
+for collector in (
+    pool_collector,
+    stats_collector('order_cache', order_cache.stats),
+    stats_collector('db_breaker', db_breaker.stats),
+    stats_collector('product_catalog', product_catalog.stats),
+    stats_collector('faq_catalog', faq_catalog.stats),
+    stats_collector('question_writer', question_writer.stats),
+    lambda: {'question_clusters': ('Clusters of unanswered questions indexed', len(question_clusters))},
+):
+    default_registry.add_collector(collector)
+
+# Statements allowed per run when QUERY_PROFILE is on; QUERY_BUDGETS overrides them
+ACTION_QUERY_BUDGETS = load_budgets({
+    # The lookup, plus SET LOCAL statement_timeout on PostgreSQL
+    'action_fetch_order_status': 2,
+    'action_get_product_info': 1,
+    'action_answer_faq': 0,
+    'action_log_unknown_question': 0,
+})
+
+def measured(run):
+    """Record the latency and outcome of an action's run() and, with QUERY_PROFILE, its SQL statements"""
+    track = metrics_enabled()
+    profile = profile_mode()
+    if not track and profile == 'off':
+        return run
+
+    @functools.wraps(run)
+    async def wrapper(self, dispatcher, tracker, domain):
+        name = self.name()
+        with query_profile(name, ACTION_QUERY_BUDGETS.get(name), profile):
+            if not track:
+                return await run(self, dispatcher, tracker, domain)
+            with action_metrics.track(name):
+                return await run(self, dispatcher, tracker, domain)
+    return wrapper
 
 class ActionFetchOrderStatus(Action):
     """Look up order status from database"""
 
+    def __init__(self):
+        super().__init__()
+        if session_scope and Order:
+            get_invalidation_bus().subscribe('orders', invalidate_order)
+
     def name(self) -> Text:
         return "action_fetch_order_status"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @measured
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         order_number = tracker.get_slot("ordernumber")
         
         if not order_number:
             dispatcher.utter_message(text="I need an order number to look up your status.")
             return []
 
-        if not Order or not create_session:
+        if not Order or not session_scope:
             dispatcher.utter_message(text="Sorry, order database is not available.")
             return []
 
-        session = create_session()
         try:
             order_id = int(order_number)
-            order = session.query(Order).filter_by(order_id=order_id).first()
-
-            if order:
-                message = (f"Order {order_number} is {order.status}. "
-                          f"Items: {order.product.product_name}. "
-                          f"Estimated delivery: {order.estimated_delivery}.")
-                dispatcher.utter_message(text=message)
-            else:
-                dispatcher.utter_message(text=f"Sorry, order {order_number} was not found.")
-
         except ValueError:
             dispatcher.utter_message(text="Please provide a valid order number.")
+            return []
+
+        stale = False
+        try:
+            order = await fetch_order_status(order_id)
         except Exception as e:
-            dispatcher.utter_message(text="Sorry, I'm having trouble accessing the order database.")
-            print(f"Database error: {e}")
-        finally:
-            session.close()
+            # Slow, failing or circuit open: answer from the last known status if there is one
+            action_metrics.record_error((self.name(),), e)
+            if not isinstance(e, CircuitOpenError):
+                print(f"Database error: {type(e).__name__} {e}")
+            order = order_cache.get_stale(order_id)
+            if order is None:
+                dispatcher.utter_message(text="Sorry, I'm having trouble accessing the order database.")
+                return []
+            stale = True
+
+        if order:
+            message = (f"Order {order_number} is {order.status}. "
+                      f"Items: {order.product_name}. "
+                      f"Estimated delivery: {order.estimated_delivery}.")
+            dispatcher.utter_message(text=message)
+        else:
+            dispatcher.utter_message(text=f"Sorry, order {order_number} was not found.")
+        if stale:
+            dispatcher.utter_message(text=STALE_NOTE)
 
         return []
 
 class ActionLogUnknownQuestion(Action):
     """Save unknown questions to database for review"""
 
+    def __init__(self):
+        super().__init__()
+        if session_scope and UnansweredQuestion:
+            question_writer.start()
+            get_invalidation_bus().subscribe('unanswered', on_unanswered_change)
+
     def name(self) -> Text:
         return "action_log_unknown_question"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @measured
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         user_message = tracker.latest_message.get('text', '')
 
-        # Save question to database if available
-        if create_session and UnansweredQuestion:
-            session = create_session()
-            try:
-                question = UnansweredQuestion(question=user_message)
-                session.add(question)
-                session.commit()
-                print(f"Saved unknown question: {user_message}")
-            except Exception as e:
-                print(f"Database error: {e}")
-            finally:
-                session.close()
+        # Queue question for the background writer if the database is available
+        if session_scope and UnansweredQuestion:
+            if not question_writer.submit(user_message):
+                print(f"Unanswered question queue full, dropped: {user_message}")
 
         # Show helpful message to user
         help_message = ("I'm sorry, I didn't understand that. I can help you with:\n"
@@ -90,43 +383,79 @@ class ActionLogUnknownQuestion(Action):
         dispatcher.utter_message(text=help_message)
         return []
 
+class ActionAnswerFaq(Action):
+    """Answer FAQs from the FAQ table, so edits take effect without retraining"""
+
+    def __init__(self):
+        super().__init__()
+        if session_scope and FAQ:
+            faq_catalog.start()
+            get_invalidation_bus().subscribe('faq', faq_catalog.invalidate)
+
+    def name(self) -> Text:
+        return "action_answer_faq"
+
+    @measured
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        user_message = tracker.latest_message.get('text', '')
+
+        match = faq_catalog.match(user_message) if session_scope and FAQ else None
+        if match:
+            dispatcher.utter_message(text=match.faq.answer)
+            return []
+
+        # No FAQ is close enough (or the table is unavailable): use the trained ResponseSelector
+        return [FollowupAction('utter_faq')]
+
 class ActionGetProductInfo(Action):
-    """Find product information using simple text matching"""
+    """Find product information using an in-memory product name index"""
+
+    def __init__(self):
+        super().__init__()
+        # Build the snapshot when the action server registers this action
+        if session_scope and Product:
+            product_catalog.start()
+            get_invalidation_bus().subscribe('products', product_catalog.invalidate)
 
     def name(self) -> Text:
         return "action_get_product_info"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @measured
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         product_name = tracker.get_slot("productname")
 
         if not product_name:
             dispatcher.utter_message(text="Which product would you like to know about?")
             return []
 
-        if not Product or not create_session:
+        if not Product or not session_scope:
             dispatcher.utter_message(text="Sorry, product database is not available.")
             return []
 
-        session = create_session()
         try:
-            # Get all products from database
-            all_products = session.query(Product).all()
-            
+            # Lookups are served from the in-memory index, not the products table
+            index = product_catalog.index
+            stale = False
+            if not product_catalog.is_fresh():
+                # Missing or older than the allowed staleness; rebuild off the event loop
+                try:
+                    index = await db_breaker.call(lambda: asyncio.to_thread(product_catalog.get),
+                                                  PRODUCT_REFRESH_TIMEOUT)
+                except Exception as e:
+                    # Keep answering from the old snapshot while the database is unavailable
+                    if index is None:
+                        raise
+                    action_metrics.record_error((self.name(),), e)
+                    stale = True
+
             # Find exact match first (case insensitive)
-            exact_match = None
-            for product in all_products:
-                if product.product_name.lower() == product_name.lower():
-                    exact_match = product
-                    break
+            exact_match = index.find_exact(product_name)
 
             if exact_match:
                 self.send_product_info(dispatcher, exact_match)
             else:
                 # Look for partial matches (case insensitive)
-                partial_matches = []
-                for product in all_products:
-                    if product_name.lower() in product.product_name.lower():
-                        partial_matches.append(product)
+                partial_matches = index.find_partial(product_name)
 
                 if len(partial_matches) == 1:
                     # Found one partial match
@@ -137,32 +466,24 @@ class ActionGetProductInfo(Action):
                     dispatcher.utter_message(text=f"I found multiple products matching '{product_name}': {', '.join(product_names)}. Which one would you like to know about?.")
                 else:
                     # No matches found
-                    all_product_names = [p.product_name for p in all_products]
+                    all_product_names = index.names()
                     dispatcher.utter_message(text=f"Sorry, I couldn't find '{product_name}'. Available products: {', '.join(all_product_names)}")
+            if stale:
+                dispatcher.utter_message(text=STALE_NOTE)
 
         except Exception as e:
             dispatcher.utter_message(text="Sorry, I'm having trouble accessing the product database.")
+            action_metrics.record_error((self.name(),), e)
             print(f"Product database error: {e}")
-        finally:
-            session.close()
 
         return []
 
-    def send_product_info(self, dispatcher: CollectingDispatcher, product: Product):
+    def send_product_info(self, dispatcher: CollectingDispatcher, product: ProductRecord):
         """Send product information to user"""
-        # Check stock status
-        if product.current_stock > 0:
-            if product.current_stock <= 5:
-                stock_status = "✅ In Stock (Low Stock!)"
-            else:
-                stock_status = "✅ In Stock"
-        else:
-            stock_status = "❌ Out of Stock"
-
-        # Create message
+        # Stock status is precomputed when the product snapshot is built
         message = (f"📦 **{product.product_name}**\n"
                   f"📊 Stock: {product.current_stock} {product.quantity_type}\n"
                   f"📦 Minimum Order: {product.moq} {product.quantity_type}\n"
-                  f"🏷️ Status: {stock_status}")
+                  f"🏷️ Status: {product.stock_status}")
         
         dispatcher.utter_message(text=message)
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the breaker is open"""
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency that is failing or too slow.
+
+    The outcomes of the last window calls are kept, dropping those older
+    than max_age seconds. Counting calls rather than seconds matters here:
+    a database outage also cuts how many calls finish, so a time window
+    stays full of the successes from before it. Once at least min_calls
+    outcomes are kept, the breaker opens when failure_ratio of them failed
+    (errors and timeouts) or slow_ratio took longer than slow_call seconds.
+    While open, calls are rejected at once with CircuitOpenError; after
+    open_seconds a single probe call is let through (half open), which
+    closes the breaker if it succeeds and opens it again if it fails.
+    """
+
+    def __init__(self, name, failure_ratio=None, slow_ratio=None, slow_call=None, min_calls=None,
+                 window=None, max_age=None, open_seconds=None, clock=time.monotonic):
+        self.name = name
+        self.failure_ratio = (failure_ratio if failure_ratio is not None
+                              else float(os.getenv('DB_BREAKER_FAILURE_RATIO', '0.5')))
+        self.slow_ratio = (slow_ratio if slow_ratio is not None
+                           else float(os.getenv('DB_BREAKER_SLOW_RATIO', '0.5')))
+        self.slow_call = (slow_call if slow_call is not None
+                          else float(os.getenv('DB_BREAKER_SLOW_CALL', '1.0')))
+        self.min_calls = (min_calls if min_calls is not None
+                          else int(os.getenv('DB_BREAKER_MIN_CALLS', '10')))
+        self.window = (window if window is not None
+                       else int(os.getenv('DB_BREAKER_WINDOW', '20')))
+        self.max_age = (max_age if max_age is not None
+                        else float(os.getenv('DB_BREAKER_MAX_AGE', '60')))
+        self.open_seconds = (open_seconds if open_seconds is not None
+                             else float(os.getenv('DB_BREAKER_OPEN_SECONDS', '15')))
+        self.clock = clock
+
+        self.state = CLOSED
+        self.opened_at = None
+        self._probing = False
+        # (time, failed, slow) of the last window calls, oldest first
+        self._outcomes = deque(maxlen=self.window)
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self):
+        """True if a call may go ahead now; counts a rejection otherwise"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, elapsed, failed):
+        """Count the outcome of a call that allow() let through"""
+        slow = elapsed >= self.slow_call
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            self.slow_calls += slow
+
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._trip()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+
+            now = self.clock()
+            while self._outcomes and self._outcomes[0][0] <= now - self.max_age:
+                self._outcomes.popleft()
+            self._outcomes.append((now, failed, slow))
+
+            # Calls let through before the breaker opened may still finish while it is open
+            if self.state == CLOSED:
+                calls = len(self._outcomes)
+                if calls >= self.min_calls and (
+                        sum(o[1] for o in self._outcomes) >= self.failure_ratio * calls or
+                        sum(o[2] for o in self._outcomes) >= self.slow_ratio * calls):
+                    self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.trips += 1
+        self._outcomes.clear()
+
+    async def call(self, make_call, timeout):
+        """
+        Await make_call() through the breaker, giving up after timeout seconds.
+
+        Raises CircuitOpenError without calling when the breaker is open, and
+        asyncio.TimeoutError (counted as a failure) when the call takes too long.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(make_call(), timeout)
+        except BaseException as e:
+            # A cancelled caller says nothing about the database
+            self.record(time.perf_counter() - started, not isinstance(e, asyncio.CancelledError))
+            raise
+        self.record(time.perf_counter() - started, False)
+        return result
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'open': self.state != CLOSED,
+            'calls': self.calls,
+            'failures': self.failures,
+            'slow_calls': self.slow_calls,
+            'rejected': self.rejected,
+            'trips': self.trips,
+        }
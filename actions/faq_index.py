@@ -0,0 +1,381 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# One FAQ row as the action server keeps it
+FaqEntry = namedtuple('FaqEntry', ['faq_id', 'question', 'answer'])
+
+# The (faq, cosine similarity) of the best match for a message
+FaqMatch = namedtuple('FaqMatch', ['faq', 'score'])
+
+MIN_NGRAM = 2
+MAX_NGRAM = 4
+# Answers help match paraphrases ("Can I visit on Sunday?") but count less than the question
+ANSWER_WEIGHT = 0.5
+NON_WORD = re.compile(r'[\W_]+')
+
+def char_ngrams(text, weight=1.0, counts=None):
+    """
+    Weighted counts of the character n-grams of each word padded with spaces,
+    like CountVectorsFeaturizer's char_wb analyzer.
+    """
+    counts = Counter() if counts is None else counts
+    for word in NON_WORD.sub(' ', text.casefold()).split():
+        padded = f" {word} "
+        for size in range(MIN_NGRAM, MAX_NGRAM + 1):
+            for start in range(len(padded) - size + 1):
+                counts[padded[start:start + size]] += weight
+    return counts
+
+def faq_ngrams(faq):
+    return char_ngrams(faq.answer, ANSWER_WEIGHT, char_ngrams(faq.question))
+
+class FaqMatrix:
+    """
+    Immutable TF-IDF matrix of FAQ n-grams, stored column-wise (CSC).
+
+    Column j of the matrix holds, for n-gram j, the FAQs containing it and
+    their L2-normalized tf-idf weights in doc_ids[indptr[j]:indptr[j + 1]]
+    and weights[...]. Scoring a message only touches the columns of its own
+    n-grams, so its cost does not depend on how many FAQs there are.
+    """
+
+    def __init__(self, faqs, vectors, vocabulary, idf=None):
+        """
+        vectors holds the (columns, term counts) of each FAQ, in faqs order.
+        With idf (that of another matrix, with vocabulary its vocabulary),
+        the FAQs are weighted by it and columns beyond it are dropped.
+        """
+        self.faqs = tuple(faqs)
+        self.positions = {faq.faq_id: pos for pos, faq in enumerate(self.faqs)}
+        # A given idf comes with the vocabulary of an existing matrix, which is never changed
+        self.vocabulary = dict(vocabulary) if idf is None else vocabulary
+        size = len(self.faqs)
+        width = len(self.vocabulary) if idf is None else len(idf)
+
+        if np is not None:
+            lengths = np.array([len(cols) for cols, _ in vectors], dtype=np.int64)
+            cols = np.concatenate([cols for cols, _ in vectors]) if size else np.zeros(0, dtype=np.int32)
+            tfs = np.concatenate([tfs for _, tfs in vectors]) if size else np.zeros(0, dtype=np.float32)
+            rows = np.repeat(np.arange(size, dtype=np.int32), lengths)
+            if idf is not None:
+                known = cols < width
+                cols, tfs, rows = cols[known], tfs[known], rows[known]
+            document_frequency = np.bincount(cols, minlength=width)
+            # Smoothed idf, as in scikit-learn's TfidfVectorizer
+            self.idf = (np.log((1 + size) / (1 + document_frequency)) + 1).astype(np.float32) if idf is None else idf
+            weights = tfs * self.idf[cols]
+            norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=size))
+            weights = weights / np.where(norms > 0, norms, 1.0)[rows]
+            order = np.argsort(cols, kind='stable')
+            self.indptr = np.concatenate(([0], np.cumsum(document_frequency))).astype(np.int64)
+            self.doc_ids = rows[order]
+            self.weights = weights[order].astype(np.float32)
+            return
+
+        if idf is None:
+            document_frequency = [0] * width
+            for cols, _ in vectors:
+                for col in cols:
+                    document_frequency[col] += 1
+            idf = [math.log((1 + size) / (1 + df)) + 1 for df in document_frequency]
+        self.idf = idf
+        columns = [[] for _ in range(width)]
+        for pos, (cols, tfs) in enumerate(vectors):
+            weights = [tf * idf[col] for col, tf in zip(cols, tfs) if col < width]
+            cols = [col for col in cols if col < width]
+            norm = math.sqrt(sum(w * w for w in weights)) or 1.0
+            for col, weight in zip(cols, weights):
+                columns[col].append((pos, weight / norm))
+        self.indptr = [0]
+        self.doc_ids = []
+        self.weights = []
+        for column in columns:
+            for pos, weight in column:
+                self.doc_ids.append(pos)
+                self.weights.append(weight)
+            self.indptr.append(len(self.doc_ids))
+
+    def query_vector(self, text):
+        """{column: weight} of a message, L2-normalized; unknown n-grams are dropped"""
+        vector = {}
+        for gram, tf in char_ngrams(text).items():
+            col = self.vocabulary.get(gram)
+            if col is not None:
+                vector[col] = tf * float(self.idf[col])
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {col: w / norm for col, w in vector.items()} if norm else {}
+
+    def scores(self, text):
+        """Cosine similarity of the message to every FAQ, in matrix order"""
+        return self.vector_scores(self.query_vector(text))
+
+    def vector_scores(self, vector):
+        """Cosine similarity of a query_vector() to every FAQ, in matrix order"""
+        if np is not None:
+            if not vector:
+                return np.zeros(len(self.faqs), dtype=np.float32)
+            cols = np.fromiter(vector.keys(), dtype=np.int64, count=len(vector))
+            starts, ends = self.indptr[cols], self.indptr[cols + 1]
+            lengths = ends - starts
+            # Positions of every stored entry of the selected columns, in one gather
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            query_weights = np.repeat(np.fromiter(vector.values(), dtype=np.float32, count=len(vector)), lengths)
+            return np.bincount(self.doc_ids[offsets], weights=self.weights[offsets] * query_weights,
+                               minlength=len(self.faqs))
+
+        scores = [0.0] * len(self.faqs)
+        for col, query_weight in vector.items():
+            for i in range(self.indptr[col], self.indptr[col + 1]):
+                scores[self.doc_ids[i]] += self.weights[i] * query_weight
+        return scores
+
+    def best(self, text):
+        """FaqMatch of the most similar FAQ, or None if the matrix is empty"""
+        return best_match(self.faqs, self.scores(text))
+
+    def __len__(self):
+        return len(self.faqs)
+
+def best_match(faqs, scores):
+    """FaqMatch of the highest of scores, or None if there are no FAQs"""
+    if not faqs:
+        return None
+    if np is not None:
+        pos = int(scores.argmax())
+    else:
+        pos = max(range(len(scores)), key=scores.__getitem__)
+    return FaqMatch(faqs[pos], float(scores[pos]))
+
+class PatchedFaqMatrix:
+    """
+    A FaqMatrix with FAQs changed or removed since it was compiled.
+
+    The base matrix's rows of those FAQs are hidden, and the current
+    versions of the changed ones are scored from a small matrix weighted
+    with the base vocabulary and idf. Both are immutable, like FaqMatrix.
+    """
+
+    def __init__(self, base, changed, vectors, hidden_ids):
+        self.base = base
+        self.changes = FaqMatrix(changed, vectors, base.vocabulary, base.idf)
+        self.hidden = [base.positions[faq_id] for faq_id in hidden_ids if faq_id in base.positions]
+        if np is not None:
+            self.hidden = np.array(self.hidden, dtype=np.int64)
+        self.size = len(base.faqs) - len(self.hidden) + len(changed)
+
+    def best(self, text):
+        vector = self.base.query_vector(text)
+        found = None
+        if self.base.faqs:
+            scores = self.base.vector_scores(vector)
+            if np is not None:
+                scores[self.hidden] = -1.0
+            else:
+                for pos in self.hidden:
+                    scores[pos] = -1.0
+            found = best_match(self.base.faqs, scores)
+        changed = best_match(self.changes.faqs, self.changes.vector_scores(vector))
+        if found is None or found.score < 0 or (changed is not None and changed.score > found.score):
+            return changed
+        return found
+
+    def __len__(self):
+        return self.size
+
+class FaqIndex:
+    """
+    TF-IDF retrieval over the FAQ table, updated one FAQ at a time.
+
+    Each FAQ's n-gram counts are kept as a sparse row over a vocabulary
+    that only grows, so adding or changing a FAQ only analyzes that FAQ's
+    text. The change is then patched over the last compiled matrix: only
+    the changed FAQs are weighted, with that matrix's vocabulary and idf.
+    The whole matrix is recompiled, refreshing idf and the vocabulary, by
+    replace() (FaqCatalog does so every ttl seconds), once more than
+    max_changes FAQs are patched, or when a FAQ has more than
+    max_new_ngrams of its n-grams missing from the compiled vocabulary.
+    Matches read the current matrix, so they never wait for or see a
+    half-built one.
+    """
+
+    def __init__(self, faqs=(), threshold=None, max_changes=None, max_new_ngrams=0.2):
+        self.threshold = threshold if threshold is not None else float(os.getenv('FAQ_MATCH_THRESHOLD', '0.3'))
+        self.max_changes = (max_changes if max_changes is not None
+                            else int(os.getenv('FAQ_INDEX_MAX_CHANGES', '64')))
+        self.max_new_ngrams = max_new_ngrams
+        self._vocabulary = {}
+        self._faqs = {}
+        self._vectors = {}
+        # faq_id -> FaqEntry, or None when removed, of FAQs changed since the last compile
+        self._changes = {}
+        self._lock = threading.Lock()
+        self._compiled = FaqMatrix((), [], {})
+        self.matrix = self._compiled
+        self.compiles = 0
+        self.replace(faqs)
+
+    def _vector(self, faq):
+        counts = faq_ngrams(faq)
+        vocabulary = self._vocabulary
+        cols = [vocabulary.setdefault(gram, len(vocabulary)) for gram in counts]
+        if np is not None:
+            return (np.array(cols, dtype=np.int32),
+                    np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        return cols, list(counts.values())
+
+    def _compile(self):
+        ids = sorted(self._faqs)
+        self._compiled = FaqMatrix([self._faqs[faq_id] for faq_id in ids],
+                                   [self._vectors[faq_id] for faq_id in ids], self._vocabulary)
+        self._changes = {}
+        self.compiles += 1
+        self.matrix = self._compiled
+
+    def _patch(self, faq_id):
+        """Swap in the compiled matrix with the FAQs changed since then patched over it"""
+        self._changes[faq_id] = self._faqs.get(faq_id)
+        if len(self._changes) > self.max_changes:
+            self._compile()
+            return
+        changed = [faq for _, faq in sorted(self._changes.items()) if faq is not None]
+        self.matrix = PatchedFaqMatrix(self._compiled, changed, [self._vectors[faq.faq_id] for faq in changed],
+                                       self._changes)
+
+    def _mostly_known(self, vector):
+        """True if at most max_new_ngrams of a FAQ's n-grams are in the compiled vocabulary"""
+        cols, _ = vector
+        if not len(cols):
+            return True
+        width = len(self._compiled.idf)
+        new = int((cols >= width).sum()) if np is not None else sum(col >= width for col in cols)
+        return new <= self.max_new_ngrams * len(cols)
+
+    def replace(self, faqs):
+        """Index exactly these FAQs"""
+        with self._lock:
+            self._vocabulary = {}
+            self._faqs = {faq.faq_id: faq for faq in faqs}
+            self._vectors = {faq_id: self._vector(faq) for faq_id, faq in self._faqs.items()}
+            self._compile()
+
+    def add(self, faq):
+        """Add a FAQ or replace the one with the same id"""
+        with self._lock:
+            self._faqs[faq.faq_id] = faq
+            vector = self._vectors[faq.faq_id] = self._vector(faq)
+            if self._mostly_known(vector):
+                self._patch(faq.faq_id)
+            else:
+                self._compile()
+
+    def remove(self, faq_id):
+        with self._lock:
+            if self._faqs.pop(faq_id, None) is not None:
+                del self._vectors[faq_id]
+                self._patch(faq_id)
+
+    def match(self, text):
+        """FaqMatch of the best FAQ if it is similar enough to the message, else None"""
+        found = self.matrix.best(text)
+        if found is None or found.score < self.threshold:
+            return None
+        return found
+
+    def __len__(self):
+        return len(self._faqs)
+
+class FaqCatalog:
+    """
+    Keeps a FaqIndex in step with the FAQ table.
+
+    load_all returns every FaqEntry and load_one(faq_id) one FaqEntry or
+    None if it was deleted. invalidate(key) reloads only the changed FAQ, or
+    everything when key is None; a background thread also reloads
+    everything every ttl seconds in case a notification was missed.
+    """
+
+    def __init__(self, load_all, load_one, ttl=None, threshold=None):
+        self.load_all = load_all
+        self.load_one = load_one
+        self.ttl = ttl if ttl is not None else float(os.getenv('FAQ_INDEX_TTL', '300'))
+        self.index = FaqIndex(threshold=threshold)
+        self.loaded = False
+        self.refreshes = 0
+        self.updates = 0
+        self.refresh_failures = 0
+        self.refreshed_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Reload every FAQ"""
+        try:
+            self.index.replace(self.load_all())
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        self.loaded = True
+        self.refreshes += 1
+        self.refreshed_at = time.time()
+
+    def invalidate(self, key=None):
+        """Invalidation bus callback: reload one FAQ, or all of them when key is None"""
+        try:
+            if key is None or not self.loaded:
+                self.refresh()
+                return
+            faq_id = int(key)
+            faq = self.load_one(faq_id)
+            if faq is None:
+                self.index.remove(faq_id)
+            else:
+                self.index.add(faq)
+            self.updates += 1
+        except Exception as e:
+            print(f"FAQ index refresh failed: {e}")
+
+    def match(self, text):
+        """Best FAQ for a message, or None if none is close enough or FAQs are not loaded"""
+        if not self.loaded:
+            return None
+        return self.index.match(text)
+
+    def stats(self):
+        return {
+            'faqs': len(self.index),
+            'loaded': self.loaded,
+            'refreshes': self.refreshes,
+            'updates': self.updates,
+            'compiles': self.index.compiles,
+            'refresh_failures': self.refresh_failures,
+            'refreshed_at': self.refreshed_at,
+            'threshold': self.index.threshold,
+        }
+
+    def start(self):
+        """Load the FAQs and start the background refresh thread"""
+        if self._thread is not None:
+            return
+        self.invalidate()
+
+        self._thread = threading.Thread(target=self._run, name='faq-index-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.ttl):
+            self.invalidate()
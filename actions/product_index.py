@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+# Compact product row kept in memory by the action server
+ProductRecord = namedtuple('ProductRecord', ['product_id', 'product_name', 'current_stock', 'moq',
+                                             'quantity_type', 'stock_status'])
+
+LOW_STOCK_THRESHOLD = 5
+
+def stock_status_label(current_stock):
+    """Stock status shown to the customer"""
+    if current_stock > 0:
+        if current_stock <= LOW_STOCK_THRESHOLD:
+            return "✅ In Stock (Low Stock!)"
+        return "✅ In Stock"
+    return "❌ Out of Stock"
+
+def make_record(product_id, product_name, current_stock, moq, quantity_type):
+    """Build a ProductRecord with its stock status label precomputed"""
+    return ProductRecord(product_id, product_name, current_stock, moq, quantity_type,
+                         stock_status_label(current_stock))
+
+class ProductIndex:
+    """
+    Immutable, versioned snapshot of the product catalog with a name index.
+
+    A snapshot is never modified after it is built; ProductCatalog swaps in
+    a new one when products change.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self, records, version=0):
+        self.version = version
+        self.created_at = time.time()
+        self.created_monotonic = time.monotonic()
+        self.records = tuple(records)
+        self.folded_names = tuple(r.product_name.casefold() for r in self.records)
+        self.exact = {}
+        self.grams = {}
+
+        for pos, name in enumerate(self.folded_names):
+            # Keep the first product for duplicate names, like the old linear scan
+            self.exact.setdefault(name, pos)
+            for gram in self._grams(name):
+                self.grams.setdefault(gram, set()).add(pos)
+
+        self.grams = {gram: frozenset(posting) for gram, posting in self.grams.items()}
+
+    def age(self):
+        """Seconds since this snapshot was built"""
+        return time.monotonic() - self.created_monotonic
+
+    def _grams(self, text):
+        """All substrings of length 1..GRAM_SIZE"""
+        grams = set()
+        for size in range(1, self.GRAM_SIZE + 1):
+            for start in range(len(text) - size + 1):
+                grams.add(text[start:start + size])
+        return grams
+
+    def find_exact(self, name):
+        """Return the product whose name equals name (case insensitive), or None"""
+        pos = self.exact.get(name.casefold())
+        return self.records[pos] if pos is not None else None
+
+    def find_partial(self, name):
+        """Return products whose name contains name (case insensitive), in catalog order"""
+        query = name.casefold()
+        if not query:
+            return list(self.records)
+
+        if len(query) <= self.GRAM_SIZE:
+            # Short queries are grams themselves, so the posting list is the answer
+            return [self.records[pos] for pos in sorted(self.grams.get(query, ()))]
+
+        postings = []
+        for start in range(len(query) - self.GRAM_SIZE + 1):
+            posting = self.grams.get(query[start:start + self.GRAM_SIZE])
+            if not posting:
+                return []
+            postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+
+        return [self.records[pos] for pos in sorted(candidates) if query in self.folded_names[pos]]
+
+    def names(self):
+        return [r.product_name for r in self.records]
+
+    def __len__(self):
+        return len(self.records)
+
+class ProductCatalog:
+    """
+    Holds the current ProductIndex snapshot and replaces it when products change.
+
+    The loader returns an iterable of ProductRecord. Lookups only read the
+    current snapshot; a background thread rebuilds it every ttl seconds and
+    invalidate() rebuilds it on demand (e.g. from the invalidation bus).
+    A snapshot older than max_staleness seconds is rebuilt before use.
+    """
+
+    def __init__(self, loader, ttl=None, max_staleness=None):
+        self.loader = loader
+        self.ttl = ttl if ttl is not None else float(os.getenv('PRODUCT_INDEX_TTL', '60'))
+        self.max_staleness = (max_staleness if max_staleness is not None
+                              else float(os.getenv('PRODUCT_SNAPSHOT_MAX_STALENESS', '300')))
+        self.index = None
+        self.version = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Reload products and atomically swap in a new snapshot"""
+        with self._lock:
+            try:
+                index = ProductIndex(self.loader(), version=self.version + 1)
+            except Exception:
+                self.refresh_failures += 1
+                raise
+            self.version = index.version
+            self.refreshes += 1
+            # Readers see either the old or the new snapshot, never a mix
+            self.index = index
+            return index
+
+    def is_fresh(self):
+        index = self.index
+        return index is not None and index.age() <= self.max_staleness
+
+    def get(self):
+        """Return the current snapshot, rebuilding it if missing or too stale"""
+        index = self.index
+        if index is None or index.age() > self.max_staleness:
+            index = self.refresh()
+        return index
+
+    def invalidate(self, key=None):
+        """Rebuild the snapshot now; key is accepted for invalidation bus callbacks"""
+        try:
+            return self.refresh()
+        except Exception as e:
+            print(f"Product index refresh failed: {e}")
+
+    def stats(self):
+        index = self.index
+        return {
+            'version': self.version,
+            'products': len(index) if index else 0,
+            'snapshot_age_seconds': index.age() if index else None,
+            'max_staleness_seconds': self.max_staleness,
+            'refreshes': self.refreshes,
+            'refresh_failures': self.refresh_failures,
+        }
+
+    def start(self):
+        """Build the snapshot and start the background refresh thread"""
+        if self._thread is not None:
+            return
+        self.invalidate()
+
+        self._thread = threading.Thread(target=self._run, name='product-index-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.ttl):
+            self.invalidate()
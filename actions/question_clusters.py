@@ -0,0 +1,217 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Mersenne prime for the permutation hashes; values fit in 31 bits
+PRIME = (1 << 31) - 1
+SHINGLE_SIZE = 3
+NON_WORD = re.compile(r'[\W_]+')
+
+def normalize(text):
+    """Lowercase with punctuation and runs of spaces collapsed"""
+    return NON_WORD.sub(' ', text.casefold()).strip()
+
+def shingles(text):
+    """Stable 32-bit hashes of the character trigrams of a normalized question"""
+    padded = f" {normalize(text)} "
+    return {zlib.crc32(padded[i:i + SHINGLE_SIZE].encode()) for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+class MinHasher:
+    """
+    MinHash signatures of character trigram sets.
+
+    Two signatures agree in about the share of positions given by the
+    Jaccard similarity of the two trigram sets. Signatures are the same with
+    or without NumPy, so ones stored by one process can be used by another.
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        self.num_perm = num_perm
+        rng = random.Random(seed)
+        self.a = [rng.randrange(1, PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, PRIME) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, text):
+        values = shingles(text)
+        if not values:
+            return array('I', [PRIME] * self.num_perm)
+        if np is not None:
+            x = np.fromiter(values, dtype=np.uint64, count=len(values)) % PRIME
+            return array('I', ((self._a * x + self._b) % PRIME).min(axis=1).astype(np.uint32).tobytes())
+        values = [x % PRIME for x in values]
+        return array('I', [min((a * x + b) % PRIME for x in values) for a, b in zip(self.a, self.b)])
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+def signature_bytes(signature):
+    """Portable little-endian encoding for storing a signature"""
+    if sys.byteorder == 'little':
+        return signature.tobytes()
+    copy = array('I', signature)
+    copy.byteswap()
+    return copy.tobytes()
+
+def signature_from_bytes(data):
+    signature = array('I')
+    signature.frombytes(data)
+    if sys.byteorder != 'little':
+        signature.byteswap()
+    return signature
+
+class QuestionClusters:
+    """
+    Incremental near-duplicate clustering of unanswered questions.
+
+    Each cluster is one unanswered_questions row, represented by the MinHash
+    signature of its canonical (first seen) question. LSH buckets signatures
+    by bands, so finding the cluster of a new question only compares it with
+    clusters sharing a band, not with every cluster. A question joins the
+    most similar candidate at or above threshold, or starts a new cluster.
+
+    The index is reloaded when it is older than ttl seconds, so clusters
+    created by other action servers are found after at most that long.
+    """
+
+    def __init__(self, threshold=None, num_perm=64, bands=16, ttl=None):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv('QUESTION_CLUSTER_SIMILARITY', '0.6'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('QUESTION_CLUSTERS_TTL', '300'))
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._signatures = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.loaded = False
+        self._loaded_at = None
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [tuple(signature[i * rows:(i + 1) * rows]) for i in range(self.bands)]
+
+    def add(self, key, signature):
+        with self._lock:
+            self._add(key, signature)
+
+    def _add(self, key, signature):
+        self._remove(key)
+        self._signatures[key] = signature
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            members = buckets.get(band)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del buckets[band]
+
+    def match(self, signature):
+        """(key, similarity) of the most similar cluster above threshold, or None"""
+        with self._lock:
+            return self._match(signature)
+
+    def _match(self, signature):
+        candidates = set()
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            members = buckets.get(band)
+            if members:
+                candidates.update(members)
+        best = None
+        for key in candidates:
+            score = similarity(signature, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def assign(self, questions):
+        """
+        Group a batch of questions by cluster.
+
+        Returns (counts, created): counts maps known cluster keys to how many
+        questions of the batch joined them; created lists new clusters as
+        [question, signature, count], in order of first appearance. New
+        clusters are not added to the index until register() gets their keys.
+        """
+        counts = {}
+        created = []
+        pending = QuestionClusters(self.threshold, self.hasher.num_perm, self.bands)
+        with self._lock:
+            for question in questions:
+                signature = self.hasher.signature(question)
+                found = self._match(signature)
+                if found is not None:
+                    counts[found[0]] = counts.get(found[0], 0) + 1
+                    continue
+                found = pending._match(signature)
+                if found is not None:
+                    created[found[0]][2] += 1
+                    continue
+                pending._add(len(created), signature)
+                created.append([question.strip(), signature, 1])
+        return counts, created
+
+    def register(self, keys, created):
+        """Index new clusters from assign() under their database keys"""
+        with self._lock:
+            for key, (_, signature, _) in zip(keys, created):
+                self._add(key, signature)
+
+    def signatures_of(self, rows):
+        """key -> signature of (key, signature bytes or None, question) rows"""
+        return {key: signature_from_bytes(data) if data else self.hasher.signature(question)
+                for key, data, question in rows}
+
+    def add_rows(self, rows):
+        """Index or re-index (key, signature bytes or None, question) rows"""
+        signatures = self.signatures_of(rows)
+        with self._lock:
+            for key, signature in signatures.items():
+                self._add(key, signature)
+
+    def load(self, rows):
+        """Replace the index with (key, signature bytes or None, question) rows"""
+        signatures = self.signatures_of(rows)
+        with self._lock:
+            self._signatures = {}
+            self._buckets = [{} for _ in range(self.bands)]
+            for key, signature in signatures.items():
+                self._add(key, signature)
+            self.loaded = True
+            self._loaded_at = time.monotonic()
+
+    def is_stale(self):
+        """True if the index was never loaded, was invalidated, or is older than ttl"""
+        return not self.loaded or time.monotonic() - self._loaded_at > self.ttl
+
+    def invalidate(self):
+        """Reload before the next assign()"""
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._signatures)
@@ -0,0 +1,131 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+class QuestionWriter:
+    """
+    Write-behind buffer for unanswered questions.
+
+    Actions call submit(), which only puts the question on a bounded queue.
+    A background thread drains the queue and hands batches to flush_batch,
+    either when batch_size questions are waiting or every flush_interval
+    seconds. Questions that do not fit in the queue are dropped and counted.
+    """
+
+    def __init__(self, flush_batch, max_queue=None, batch_size=None, flush_interval=None, max_retries=3):
+        self.flush_batch = flush_batch
+        self.max_queue = max_queue or int(os.getenv('QUESTION_QUEUE_SIZE', '10000'))
+        self.batch_size = batch_size or int(os.getenv('QUESTION_BATCH_SIZE', '100'))
+        self.flush_interval = flush_interval or float(os.getenv('QUESTION_FLUSH_INTERVAL', '1.0'))
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pending = []
+        self._attempts = 0
+
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        """Start the background writer and flush remaining questions at exit"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='question-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, question):
+        """Queue a question without blocking; returns False if it was dropped"""
+        try:
+            self._queue.put_nowait(question)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def flush(self):
+        """Write everything queued so far"""
+        with self._flush_lock:
+            while True:
+                if not self._pending:
+                    self._drain(self.batch_size)
+                if not self._pending:
+                    return
+                self._write_pending()
+
+    def stop(self):
+        """Stop the background thread and flush what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize() + len(self._pending),
+            'queue_capacity': self.max_queue,
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
+
+    def _drain(self, limit):
+        while len(self._pending) < limit:
+            try:
+                self._pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+    def _write_pending(self):
+        batch = self._pending
+        try:
+            self.flush_batch(batch)
+        except Exception as e:
+            self._attempts += 1
+            print(f"Unanswered question batch failed ({self._attempts}/{self.max_retries}): {e}")
+            if self._attempts < self.max_retries:
+                return False
+            self.failed += len(batch)
+        else:
+            self.written += len(batch)
+            self.batches += 1
+        self._pending = []
+        self._attempts = 0
+        return True
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                # Block until a question arrives or it is time to flush
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                question = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                question = None
+
+            with self._flush_lock:
+                if question is not None:
+                    self._pending.append(question)
+                    self._drain(self.batch_size)
+
+                due = time.monotonic() - last_flush >= self.flush_interval
+                if self._pending and (len(self._pending) >= self.batch_size or due):
+                    if not self._write_pending():
+                        # Back off before retrying a failed batch
+                        self._stop.wait(self.flush_interval)
+                    last_flush = time.monotonic()
+                elif due:
+                    last_flush = time.monotonic()
@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+
+from actions.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test tripping, rejecting and recovering"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('database', failure_ratio=0.5, slow_ratio=0.5, slow_call=1.0,
+                                      min_calls=4, window=6, max_age=10, open_seconds=5, clock=self.clock)
+
+    def test_trips_on_failure_ratio(self):
+        """Half the calls failing opens the breaker once min_calls were made"""
+        for failed in (False, True, False):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(0.01, failed)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record(0.01, True)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_trips_on_slow_calls(self):
+        """Calls that succeed too slowly count against the database as well"""
+        for _ in range(4):
+            self.breaker.record(2.0, False)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_old_outcomes_leave_the_window(self):
+        """Failures older than the window do not count"""
+        self.breaker.record(0.01, True)
+        self.breaker.record(0.01, True)
+        self.clock.now += 11
+        for _ in range(3):
+            self.breaker.record(0.01, False)
+        self.breaker.record(0.01, True)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_only_the_last_calls_count(self):
+        """Successes from before an outage do not dilute the failures once window calls were made"""
+        for _ in range(20):
+            self.breaker.record(0.01, False)
+        for _ in range(3):
+            self.breaker.record(0.01, True)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_zero_settings_are_kept(self):
+        """An explicit 0 is a setting, not a request for the default"""
+        breaker = CircuitBreaker('database', slow_ratio=0, open_seconds=0, clock=self.clock)
+        self.assertEqual((breaker.slow_ratio, breaker.open_seconds), (0, 0))
+
+    def test_half_open_probe(self):
+        """After open_seconds one probe goes through; its outcome closes or reopens the breaker"""
+        for _ in range(4):
+            self.breaker.record(0.01, True)
+        self.clock.now += 5
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record(0.01, True)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.clock.now += 5
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(0.01, False)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()['trips'], 2)
+
+    def test_call_times_out_and_fails_fast_when_open(self):
+        """A call over its timeout raises and counts as a failure; an open breaker never calls"""
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(1)
+
+        async def scenario():
+            for _ in range(4):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await self.breaker.call(slow, 0.01)
+            with self.assertRaises(CircuitOpenError):
+                await self.breaker.call(slow, 0.01)
+
+        asyncio.run(scenario())
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(self.breaker.state, OPEN)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from actions.faq_index import FaqCatalog, FaqEntry, FaqIndex, char_ngrams
+
+FAQS = [
+    FaqEntry(1, 'What are your store hours?', 'We are open 9 AM to 9 PM, Monday through Saturday.'),
+    FaqEntry(2, 'What is your return policy?', 'You can return any item within 30 days for a full refund.'),
+    FaqEntry(3, 'How can I contact support?', 'Email support@example.com or call 1-800-123-4567.'),
+]
+
+class TestFaqIndex(unittest.TestCase):
+    """Test TF-IDF retrieval of FAQ answers"""
+
+    def setUp(self):
+        self.index = FaqIndex(FAQS, threshold=0.2)
+
+    def test_char_ngrams(self):
+        """Words are padded with spaces and split into 2 to 4 character grams"""
+        self.assertEqual(set(char_ngrams('Hi!')), {' h', 'hi', 'i ', ' hi', 'hi ', ' hi '})
+        self.assertEqual(char_ngrams('a a', weight=0.5)[' a'], 1.0)
+
+    def test_paraphrases_match(self):
+        """Rephrased questions find the right FAQ"""
+        self.assertEqual(self.index.match('when are you open on saturday').faq.faq_id, 1)
+        self.assertEqual(self.index.match('Can I get a refund?').faq.faq_id, 2)
+        self.assertEqual(self.index.match('contact SUPPORT').faq.faq_id, 3)
+
+    def test_threshold(self):
+        """Unrelated messages fall below the threshold"""
+        self.assertIsNone(self.index.match('qwerty zxcv'))
+        self.assertIsNone(self.index.match(''))
+        self.assertAlmostEqual(self.index.match('What is your return policy?').score, 0.9, delta=0.1)
+
+    def test_incremental_updates(self):
+        """Added, changed and removed FAQs take effect immediately"""
+        self.index.add(FaqEntry(4, 'Do you ship abroad?', 'We ship to Canada and Mexico.'))
+        self.assertEqual(self.index.match('shipping to canada').faq.faq_id, 4)
+        self.index.add(FaqEntry(2, 'Do you sell gift cards?', 'Gift cards are sold in store.'))
+        self.assertEqual(self.index.match('gift card').faq.answer, 'Gift cards are sold in store.')
+        self.index.remove(4)
+        self.index.remove(99)
+        self.assertIsNone(self.index.match('shipping to canada'))
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(len(FaqIndex().matrix), 0)
+        self.assertIsNone(FaqIndex().match('anything'))
+
+    def test_changes_are_patched_over_the_compiled_matrix(self):
+        """Edits in known vocabulary skip the full recompile until max_changes is exceeded"""
+        index = FaqIndex(FAQS, threshold=0.2, max_changes=2)
+        compiles = index.compiles
+        index.add(FaqEntry(1, 'How can I contact the store?', 'Call the store, open 9 AM to 9 PM.'))
+        index.remove(2)
+        self.assertEqual(index.compiles, compiles)
+        self.assertEqual(index.match('contact the store').faq.answer, 'Call the store, open 9 AM to 9 PM.')
+        self.assertEqual(index.match('email support').faq.faq_id, 3)
+        self.assertIsNone(index.match('What is your return policy?'))
+        self.assertEqual(len(index), 2)
+        self.assertEqual(len(index.matrix), 2)
+
+        index.remove(3)
+        self.assertEqual(index.compiles, compiles + 1)
+        self.assertEqual(index.match('contact the store').faq.faq_id, 1)
+        self.assertEqual(len(index.matrix), 1)
+
+    def test_new_vocabulary_recompiles(self):
+        """A FAQ mostly made of unseen n-grams is weighted with a fresh idf"""
+        compiles = self.index.compiles
+        self.index.add(FaqEntry(4, 'Do you ship abroad?', 'We ship to Canada and Mexico.'))
+        self.assertEqual(self.index.compiles, compiles + 1)
+
+class TestFaqCatalog(unittest.TestCase):
+    """Test keeping the index in step with the FAQ table"""
+
+    def test_invalidate_reloads_one_faq(self):
+        """A key reloads that FAQ only; a missing row removes it"""
+        rows = {faq.faq_id: faq for faq in FAQS}
+        catalog = FaqCatalog(lambda: list(rows.values()), rows.get, ttl=60, threshold=0.2)
+        self.assertIsNone(catalog.match('store hours'))
+        catalog.invalidate()
+        self.assertEqual(catalog.match('store hours').faq.faq_id, 1)
+
+        del rows[1]
+        catalog.invalidate('1')
+        self.assertIsNone(catalog.match('store hours'))
+        self.assertEqual(catalog.stats()['faqs'], 2)
+        self.assertEqual((catalog.stats()['refreshes'], catalog.stats()['updates']), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
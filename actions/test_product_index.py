@@ -0,0 +1,102 @@
+import unittest
+
+from actions.product_index import ProductIndex, ProductCatalog, make_record
+
+def sample_products():
+    return [
+        make_record(1, 'Jacket', 50, 1, 'pcs'),
+        make_record(2, 'Shoes', 30, 1, 'pcs'),
+        make_record(3, 'Headphones', 25, 1, 'pcs'),
+        make_record(4, 'Laptop 2000', 10, 1, 'pcs'),
+        make_record(5, 'Smartphone 500', 20, 1, 'pcs'),
+    ]
+
+class TestProductIndex(unittest.TestCase):
+    """Test ProductIndex lookups"""
+
+    def setUp(self):
+        self.index = ProductIndex(sample_products())
+
+    def test_exact_match_is_case_insensitive(self):
+        """Exact lookup ignores case"""
+        self.assertEqual(self.index.find_exact('jACKET').product_id, 1)
+        self.assertIsNone(self.index.find_exact('Jack'))
+
+    def test_partial_match(self):
+        """Substring lookup returns every product containing the query"""
+        names = [p.product_name for p in self.index.find_partial('phone')]
+        self.assertEqual(names, ['Headphones', 'Smartphone 500'])
+
+        names = [p.product_name for p in self.index.find_partial('lap')]
+        self.assertEqual(names, ['Laptop 2000'])
+
+    def test_partial_match_matches_linear_scan(self):
+        """Index results agree with a plain substring scan"""
+        products = sample_products()
+        for query in ['o', '00', 'sh', 'top 2', 'phones', 'none', 'e 5', 'Jacket']:
+            expected = [p for p in products if query.lower() in p.product_name.lower()]
+            self.assertEqual(self.index.find_partial(query), expected, query)
+
+    def test_names(self):
+        """All product names are available without a database query"""
+        self.assertEqual(len(self.index), 5)
+        self.assertIn('Shoes', self.index.names())
+
+    def test_stock_status_is_precomputed(self):
+        """Stock labels are part of the snapshot records"""
+        index = ProductIndex([make_record(1, 'Cable', 3, 1, 'pcs'), make_record(2, 'Plug', 0, 1, 'pcs')])
+        self.assertEqual(index.find_exact('cable').stock_status, "✅ In Stock (Low Stock!)")
+        self.assertEqual(index.find_exact('plug').stock_status, "❌ Out of Stock")
+        self.assertEqual(self.index.find_exact('jacket').stock_status, "✅ In Stock")
+
+class TestProductCatalog(unittest.TestCase):
+    """Test ProductCatalog refresh behaviour"""
+
+    def test_builds_once_and_refreshes_on_invalidate(self):
+        """The loader only runs on first use and on invalidation"""
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return sample_products()[:len(calls) + 1]
+
+        catalog = ProductCatalog(loader, ttl=60)
+        self.assertEqual(len(catalog.get()), 2)
+        self.assertEqual(len(catalog.get()), 2)
+        self.assertEqual(len(calls), 1)
+
+        catalog.invalidate()
+        self.assertEqual(len(catalog.get()), 3)
+        self.assertEqual(len(calls), 2)
+
+    def test_versions_and_staleness(self):
+        """Each rebuild gets a new version; stale snapshots are rebuilt on get()"""
+        catalog = ProductCatalog(sample_products, ttl=60, max_staleness=0)
+        first = catalog.get()
+        self.assertEqual(first.version, 1)
+        self.assertFalse(catalog.is_fresh())
+
+        second = catalog.get()
+        self.assertEqual(second.version, 2)
+        self.assertIsNot(first, second)
+        self.assertEqual(catalog.stats()['refreshes'], 2)
+        self.assertIsNotNone(catalog.stats()['snapshot_age_seconds'])
+
+    def test_failed_refresh_keeps_previous_snapshot(self):
+        """A failing loader leaves the last snapshot in place"""
+        state = {'fail': False}
+
+        def loader():
+            if state['fail']:
+                raise RuntimeError("database down")
+            return sample_products()
+
+        catalog = ProductCatalog(loader, ttl=60)
+        snapshot = catalog.get()
+        state['fail'] = True
+        catalog.invalidate()
+        self.assertIs(catalog.index, snapshot)
+        self.assertEqual(catalog.stats()['refresh_failures'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
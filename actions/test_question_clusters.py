@@ -0,0 +1,86 @@
+import unittest
+
+from actions.question_clusters import (MinHasher, QuestionClusters, normalize, similarity,
+                                       signature_bytes, signature_from_bytes)
+
+class TestMinHasher(unittest.TestCase):
+    """Test MinHash signatures of questions"""
+
+    def setUp(self):
+        self.hasher = MinHasher()
+
+    def test_normalize(self):
+        """Case, punctuation and spacing do not matter"""
+        self.assertEqual(normalize("  Where's my   ORDER?? "), 'where s my order')
+
+    def test_signatures_are_stable(self):
+        """Equal questions get equal signatures, also after a byte round trip"""
+        first = self.hasher.signature('Where is my order?')
+        self.assertEqual(first, MinHasher().signature('where is my order'))
+        self.assertEqual(signature_from_bytes(signature_bytes(first)), first)
+        self.assertEqual(len(first), 64)
+
+    def test_similarity(self):
+        """Near-duplicates are similar, unrelated questions are not"""
+        order = self.hasher.signature('where is my order')
+        self.assertGreater(similarity(order, self.hasher.signature('where is my order??? please')), 0.6)
+        self.assertLess(similarity(order, self.hasher.signature('do you ship to canada')), 0.3)
+
+class TestQuestionClusters(unittest.TestCase):
+    """Test incremental clustering of unanswered questions"""
+
+    def setUp(self):
+        self.clusters = QuestionClusters(threshold=0.6)
+
+    def test_batch_groups_near_duplicates(self):
+        """A batch creates one cluster per distinct question with its count"""
+        counts, created = self.clusters.assign(['Where is my order?', 'where is my order',
+                                                'Do you ship to Canada?', 'WHERE IS MY ORDER!'])
+        self.assertEqual(counts, {})
+        self.assertEqual([(question, count) for question, _, count in created],
+                         [('Where is my order?', 3), ('Do you ship to Canada?', 1)])
+        self.assertEqual(len(self.clusters), 0)
+
+    def test_registered_clusters_are_matched(self):
+        """Later questions join registered clusters instead of creating new ones"""
+        _, created = self.clusters.assign(['where is my order', 'do you ship to canada'])
+        self.clusters.register([10, 11], created)
+        counts, created = self.clusters.assign(['Where is my order?', 'refund policy'])
+        self.assertEqual(counts, {10: 1})
+        self.assertEqual([question for question, _, _ in created], ['refund policy'])
+
+    def test_remove_and_load(self):
+        """Removed clusters stop matching; load replaces the index"""
+        hasher = self.clusters.hasher
+        self.clusters.load([(1, signature_bytes(hasher.signature('where is my order')), 'ignored'),
+                            (2, None, 'do you ship to canada')])
+        self.assertTrue(self.clusters.loaded)
+        self.assertEqual(self.clusters.match(hasher.signature('do you ship to canada?'))[0], 2)
+        self.clusters.remove(2)
+        self.clusters.remove(99)
+        self.assertIsNone(self.clusters.match(hasher.signature('do you ship to canada?')))
+        self.assertEqual(len(self.clusters), 1)
+
+    def test_reload_after_ttl_or_invalidate(self):
+        """The index asks for a reload when it is too old or was invalidated"""
+        clusters = QuestionClusters(threshold=0.6, ttl=60)
+        self.assertTrue(clusters.is_stale())
+        clusters.load([])
+        self.assertFalse(clusters.is_stale())
+        clusters.invalidate()
+        self.assertTrue(clusters.is_stale())
+        clusters = QuestionClusters(threshold=0.6, ttl=0)
+        clusters.load([])
+        self.assertTrue(clusters.is_stale())
+
+    def test_add_rows_reindexes(self):
+        """add_rows indexes new rows and replaces the signature of known ones"""
+        hasher = self.clusters.hasher
+        self.clusters.load([(1, None, 'where is my order')])
+        self.clusters.add_rows([(1, None, 'do you ship to canada'), (2, None, 'refund policy')])
+        self.assertIsNone(self.clusters.match(hasher.signature('where is my order')))
+        self.assertEqual(self.clusters.match(hasher.signature('do you ship to canada'))[0], 1)
+        self.assertEqual(len(self.clusters), 2)
+
+if __name__ == '__main__':
+    unittest.main()
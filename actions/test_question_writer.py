@@ -0,0 +1,61 @@
+import time
+import unittest
+
+from actions.question_writer import QuestionWriter
+
+class TestQuestionWriter(unittest.TestCase):
+    """Test the write-behind queue for unanswered questions"""
+
+    def test_flush_writes_in_batches(self):
+        """Queued questions are written in batches of batch_size"""
+        batches = []
+        writer = QuestionWriter(batches.append, max_queue=100, batch_size=3, flush_interval=60)
+        for i in range(7):
+            self.assertTrue(writer.submit(f"question {i}"))
+
+        writer.flush()
+        self.assertEqual([len(b) for b in batches], [3, 3, 1])
+        self.assertEqual(writer.stats()['written'], 7)
+        self.assertEqual(writer.stats()['queue_depth'], 0)
+
+    def test_full_queue_drops(self):
+        """Submitting to a full queue drops the question instead of blocking"""
+        writer = QuestionWriter(lambda batch: None, max_queue=2, batch_size=10, flush_interval=60)
+        self.assertTrue(writer.submit("a"))
+        self.assertTrue(writer.submit("b"))
+        self.assertFalse(writer.submit("c"))
+        self.assertEqual(writer.stats()['dropped'], 1)
+        self.assertEqual(writer.stats()['queue_depth'], 2)
+
+    def test_background_flush_on_interval(self):
+        """The background thread flushes partial batches after flush_interval"""
+        batches = []
+        writer = QuestionWriter(batches.append, max_queue=100, batch_size=50, flush_interval=0.05)
+        writer.start()
+        try:
+            writer.submit("where is my parcel")
+            deadline = time.monotonic() + 2
+            while not batches and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            writer.stop()
+        self.assertEqual(batches, [["where is my parcel"]])
+
+    def test_failed_batch_is_retried(self):
+        """A failing batch is retried before being counted as failed"""
+        attempts = []
+
+        def flaky(batch):
+            attempts.append(len(batch))
+            if len(attempts) < 2:
+                raise RuntimeError("database down")
+
+        writer = QuestionWriter(flaky, max_queue=10, batch_size=10, flush_interval=60)
+        writer.submit("hello")
+        writer.flush()
+        self.assertEqual(attempts, [1, 1])
+        self.assertEqual(writer.stats()['written'], 1)
+        self.assertEqual(writer.stats()['failed'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
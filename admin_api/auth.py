@@ -1,27 +1,432 @@
-import hashlib
 import sys
 import os
+import time
+from datetime import date, datetime
 
 # Add database path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 
 try:
-    from models import create_session, User, Role, Product, Order, FAQ, UnansweredQuestion
+    from sqlalchemy import func, select, insert, update, delete
+    from models import session_scope, User, Role, RolePermission, Product, Order, FAQ, UnansweredQuestion
 except ImportError:
-    create_session = None
+    func = None
+    session_scope = None
     User = None
     Role = None
+    RolePermission = None
     Product = None
     Order = None
     FAQ = None
     UnansweredQuestion = None
 
+from invalidation import get_invalidation_bus
+from passwords import PasswordVerifier, PasswordVerifierBusy
+from permissions import permission_table, resource_mask, mask_resources
+from versions import TableVersions
+from serialization import RowSet
+from search import search_service, postgres_match
+
+# Change counters behind the ETag and ?since= support of the list endpoints
+table_versions = TableVersions()
+
+# Password hashing runs on this pool instead of the request thread
+password_verifier = PasswordVerifier()
+
+def notify_change(topic, key=None):
+    """Tell caches in other components (e.g. the action server) that rows changed"""
+    table_versions.bump(topic, key)
+    try:
+        get_invalidation_bus().publish(topic, key)
+    except Exception as e:
+        print(f"Invalidation error: {e}")
+
+DEFAULT_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '1000'))
+
+def parse_bool(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def parse_date(value):
+    return date.fromisoformat(value)
+
+def contains(column, value):
+    """Case-insensitive substring filter"""
+    return func.lower(column).contains(value.lower(), autoescape=True)
+
+def order_search(value):
+    """?q= for orders: order id, exact status, or part of the product or customer name"""
+    value = value.strip()
+    condition = contains(Product.product_name, value) | contains(User.username, value) | (Order.status == value)
+    if value.isdigit():
+        condition = condition | (Order.order_id == int(value))
+    return condition
+
+def json_value(value):
+    if isinstance(value, (date, datetime)):
+        return str(value)
+    return value
+
+def resolve_list_params(id_field, columns, filter_specs, fields=None, filters=None):
+    """
+    Validate projection and filter parameters for a list query.
+
+    Returns (selected field names, filter conditions); raises ValueError
+    with a user-facing message for unknown fields/filters or bad values.
+    """
+    filter_specs = filter_specs or {}
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [name for name in (fields or []) if name not in columns]
+    if unknown:
+        raise ValueError(f'Unknown field: {", ".join(unknown)}')
+    selected = [name for name in columns if not fields or name in fields]
+    if id_field not in selected:
+        selected.insert(0, id_field)
+
+    unknown = [name for name in (filters or {}) if name not in filter_specs]
+    if unknown:
+        raise ValueError(f'Unknown filter: {", ".join(unknown)}')
+    try:
+        conditions = [filter_specs[name](value) for name, value in (filters or {}).items()]
+    except ValueError as e:
+        raise ValueError(f'Invalid parameter: {str(e)}')
+    return selected, conditions
+
+def build_list_query(session, columns, joins, selected, conditions):
+    query = session.query(*[columns[name].label(name) for name in selected])
+    for target, onclause in joins:
+        query = query.join(target, onclause)
+    if conditions:
+        query = query.filter(*conditions)
+    return query
+
+def list_page(id_field, columns, joins=(), filter_specs=None, after=None, limit=None,
+              fields=None, filters=None, with_total=False):
+    """
+    Keyset-paginated list query shared by the manager get_page methods.
+
+    Args:
+        id_field: Name of the column in columns used as the cursor
+        columns: Ordered mapping of output field name -> column expression
+        joins: (target, onclause) pairs needed by the columns or filters
+        filter_specs: Mapping of filter name -> function(value) -> condition
+        after: Return rows whose id is greater than this cursor
+        limit: Page size (default API_PAGE_SIZE, capped at API_MAX_PAGE_SIZE)
+        fields: Field names to select (comma separated or list); all if empty
+        filters: Mapping of filter name -> raw value
+        with_total: Also count all rows matching the filters
+
+    Returns:
+        {'success': True, 'data': [...], 'next_after': id or None, 'total': n}
+    """
+    try:
+        selected, conditions = resolve_list_params(id_field, columns, filter_specs, fields, filters)
+        limit = min(int(limit), MAX_PAGE_SIZE) if limit else DEFAULT_PAGE_SIZE
+        if limit < 1:
+            return {'success': False, 'message': 'limit must be positive'}
+        after = int(after) if after not in (None, '') else None
+    except ValueError as e:
+        message = str(e)
+        if not message.startswith(('Unknown', 'Invalid')):
+            message = f'Invalid parameter: {message}'
+        return {'success': False, 'message': message}
+
+    id_column = columns[id_field]
+    try:
+        with session_scope() as session:
+            query = build_list_query(session, columns, joins, selected, conditions)
+
+            total = query.order_by(None).count() if with_total else None
+
+            if after is not None:
+                query = query.filter(id_column > after)
+            rows = query.order_by(id_column).limit(limit + 1).all()
+
+            has_more = len(rows) > limit
+            # Rows stay tuples; the serializer turns them into JSON objects
+            data = RowSet(selected, [tuple(row) for row in rows[:limit]])
+            result = {
+                'success': True,
+                'data': data,
+                'next_after': data.rows[-1][selected.index(id_field)] if has_more else None
+            }
+            if with_total:
+                result['total'] = total
+            return result
+    except Exception as e:
+        return {'success': False, 'message': f'Error: {str(e)}'}
+
+def list_changes(id_field, columns, joins=(), filter_specs=None, ids=(), fields=None, filters=None):
+    """
+    Current state of the given rows, for ?since= delta responses.
+
+    Rows that no longer exist or no longer match the filters are reported
+    in 'removed' so the client can drop them.
+
+    Returns:
+        {'success': True, 'id_field': ..., 'data': [...], 'removed': [ids]}
+    """
+    try:
+        selected, conditions = resolve_list_params(id_field, columns, filter_specs, fields, filters)
+        ids = sorted({int(i) for i in ids})
+    except ValueError as e:
+        message = str(e)
+        if not message.startswith(('Unknown', 'Invalid')):
+            message = f'Invalid parameter: {message}'
+        return {'success': False, 'message': message}
+
+    rows = []
+    id_column = columns[id_field]
+    try:
+        with session_scope() as session:
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                chunk = ids[start:start + BULK_CHUNK_SIZE]
+                query = build_list_query(session, columns, joins, selected, conditions + [id_column.in_(chunk)])
+                rows.extend(tuple(row) for row in query.order_by(id_column))
+    except Exception as e:
+        return {'success': False, 'message': f'Error: {str(e)}'}
+
+    data = RowSet(selected, rows)
+    found = set(data.column(id_field))
+    return {
+        'success': True,
+        'id_field': id_field,
+        'data': data,
+        'removed': [i for i in ids if i not in found]
+    }
+
+def search_page(id_field, columns, joins=(), filter_specs=None, search=None, q='', offset=None,
+                limit=None, fields=None, filters=None):
+    """
+    Ranked search shared by the manager search methods.
+
+    With PostgreSQL search, matching, ranking and paging happen in one query
+    on the trigram/full-text indexes. Otherwise the in-process index ranks
+    the ids and rows are read for them in BULK_CHUNK_SIZE chunks, applying
+    the filters, until the page is full.
+
+    Args:
+        search: Search spec of the manager (topic, kind, id and text columns)
+        q: Search text
+        offset: Number of ranked results to skip
+        Other arguments as for list_page
+
+    Returns:
+        {'success': True, 'data': [...], 'next_offset': n or None}
+    """
+    try:
+        selected, conditions = resolve_list_params(id_field, columns, filter_specs, fields, filters)
+        limit = min(int(limit), MAX_PAGE_SIZE) if limit else DEFAULT_PAGE_SIZE
+        offset = int(offset) if offset not in (None, '') else 0
+        if limit < 1 or offset < 0:
+            return {'success': False, 'message': 'limit must be positive and offset not negative'}
+    except ValueError as e:
+        message = str(e)
+        if not message.startswith(('Unknown', 'Invalid')):
+            message = f'Invalid parameter: {message}'
+        return {'success': False, 'message': message}
+
+    q = (q or '').strip()
+    if not q:
+        return {'success': False, 'message': 'q is required'}
+
+    id_column = columns[id_field]
+    id_index = selected.index(id_field)
+    try:
+        with session_scope() as session:
+            if search_service.uses_database():
+                condition, rank = postgres_match(search, q)
+                query = build_list_query(session, columns, joins, selected, conditions + [condition])
+                rows = [tuple(row) for row in query.order_by(rank.desc(), id_column)
+                        .offset(offset).limit(limit + 1)]
+            else:
+                wanted = offset + limit + 1
+                # Without filters every ranked id is a result, so only the page needs ranking
+                ranked = search_service.ranked_ids(search, q, None if conditions else wanted)
+                rows = []
+                for start in range(0, len(ranked), BULK_CHUNK_SIZE):
+                    chunk = ranked[start:start + BULK_CHUNK_SIZE]
+                    query = build_list_query(session, columns, joins, selected, conditions + [id_column.in_(chunk)])
+                    found = {row[id_index]: tuple(row) for row in query}
+                    rows.extend(found[i] for i in chunk if i in found)
+                    if len(rows) >= wanted:
+                        break
+                rows = rows[offset:wanted]
+    except Exception as e:
+        return {'success': False, 'message': f'Error: {str(e)}'}
+
+    has_more = len(rows) > limit
+    return {
+        'success': True,
+        'data': RowSet(selected, rows[:limit]),
+        'next_offset': offset + limit if has_more else None
+    }
+
+def ranked_page(id_field, columns, joins=(), filter_specs=None, order_by=(), offset=None, limit=None,
+                fields=None, filters=None):
+    """
+    One page of rows in a fixed order other than by id, e.g. most frequent first.
+
+    order_by expressions are followed by the id to make the order total.
+    Paged with offset like search_page, since keyset cursors only work on
+    the id order.
+
+    Returns:
+        {'success': True, 'data': [...], 'next_offset': n or None}
+    """
+    try:
+        selected, conditions = resolve_list_params(id_field, columns, filter_specs, fields, filters)
+        limit = min(int(limit), MAX_PAGE_SIZE) if limit else DEFAULT_PAGE_SIZE
+        offset = int(offset) if offset not in (None, '') else 0
+        if limit < 1 or offset < 0:
+            return {'success': False, 'message': 'limit must be positive and offset not negative'}
+    except ValueError as e:
+        message = str(e)
+        if not message.startswith(('Unknown', 'Invalid')):
+            message = f'Invalid parameter: {message}'
+        return {'success': False, 'message': message}
+
+    try:
+        with session_scope() as session:
+            query = build_list_query(session, columns, joins, selected, conditions)
+            rows = [tuple(row) for row in query.order_by(*order_by, columns[id_field])
+                    .offset(offset).limit(limit + 1)]
+    except Exception as e:
+        return {'success': False, 'message': f'Error: {str(e)}'}
+
+    has_more = len(rows) > limit
+    return {
+        'success': True,
+        'data': RowSet(selected, rows[:limit]),
+        'next_offset': offset + limit if has_more else None
+    }
+
+EXPORT_CHUNK_SIZE = int(os.getenv('API_EXPORT_CHUNK_SIZE', '1000'))
+
+def export_rows(id_field, columns, joins=(), filter_specs=None, fields=None, filters=None):
+    """
+    Stream every row matching the filters, for the export endpoints.
+
+    Parameters are validated up front (raising ValueError); the returned
+    generator then reads the rows through a server-side cursor in chunks
+    of API_EXPORT_CHUNK_SIZE, so memory use does not grow with the table.
+
+    Returns:
+        (selected field names, generator of row tuples)
+    """
+    selected, conditions = resolve_list_params(id_field, columns, filter_specs, fields, filters)
+
+    def generate():
+        with session_scope() as session:
+            query = build_list_query(session, columns, joins, selected, conditions)
+            query = query.order_by(columns[id_field]).execution_options(stream_results=True)
+            for row in query.yield_per(EXPORT_CHUNK_SIZE):
+                yield tuple(json_value(value) for value in row)
+
+    return selected, generate()
+
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+BULK_OPERATIONS = ('create', 'update', 'upsert', 'delete')
+
+def run_bulk(items, prepare, apply_chunk, chunk_size=None):
+    """
+    Shared driver for the bulk endpoints.
+
+    Each item is validated with prepare(item) -> row dict (raising
+    ValueError/TypeError/KeyError for bad input). Valid rows are applied
+    with apply_chunk(session, chunk), one transaction per chunk, where chunk
+    is a list of (index, row) and the return value one result dict per
+    entry. If a chunk fails as a whole (e.g. a foreign key violation), its
+    items are retried one by one so only the offending items fail.
+
+    Returns:
+        Summary dict with per-item results and throughput
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    start = time.perf_counter()
+    results = [None] * len(items)
+    valid = []
+
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, prepare(item)))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            results[index] = {'index': index, 'success': False, 'message': f'Invalid item: {str(e)}'}
+
+    for offset in range(0, len(valid), chunk_size):
+        chunk = valid[offset:offset + chunk_size]
+        try:
+            with session_scope() as session:
+                chunk_results = apply_chunk(session, chunk)
+                session.commit()
+        except Exception:
+            chunk_results = []
+            for entry in chunk:
+                try:
+                    with session_scope() as session:
+                        result = apply_chunk(session, [entry])[0]
+                        session.commit()
+                except Exception as e:
+                    result = {'success': False, 'message': f'Error: {str(e)}'}
+                chunk_results.append(result)
+
+        for (index, _), result in zip(chunk, chunk_results):
+            results[index] = {'index': index, **result}
+
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for r in results if r['success'])
+    return {
+        'success': True,
+        'processed': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'elapsed_seconds': round(elapsed, 4),
+        'items_per_second': round(len(items) / elapsed, 1) if elapsed > 0 else None,
+        'results': results
+    }
+
+def existing_ids(session, column, ids):
+    """Set-based existence check: which of ids are present in column"""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    return set(session.scalars(select(column).where(column.in_(ids))))
+
+def upsert_rows(session, model, key, rows):
+    """INSERT ... ON CONFLICT (key) DO UPDATE for PostgreSQL/SQLite, select-then-write elsewhere"""
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key],
+            set_={name: stmt.excluded[name] for name in rows[0] if name != key}
+        )
+        session.execute(stmt, rows)
+        return
+
+    column = getattr(model, key)
+    present = existing_ids(session, column, [row[key] for row in rows])
+    new_rows = [row for row in rows if row[key] not in present]
+    old_rows = [row for row in rows if row[key] in present]
+    if new_rows:
+        session.execute(insert(model), new_rows)
+    if old_rows:
+        session.execute(update(model), old_rows)
+
 class AdminAuth:
     """Enhanced authentication for both admin and regular users"""
 
+    def __init__(self, verifier=None):
+        self.verifier = verifier or password_verifier
+
     def hash_password(self, password):
-        """Hash password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with the configured KDF (PASSWORD_KDF)"""
+        return self.verifier.hash(password)
 
     def verify_admin_user(self, username, password):
         """Check if user credentials are valid for admin access"""
@@ -39,581 +444,1083 @@ class AdminAuth:
         
         Returns:
             User info dict if valid, None if invalid
+
+        Raises:
+            PasswordVerifierBusy: if the password pool is saturated
         """
-        if not create_session or not User or not Role:
+        if not session_scope or not User or not Role:
             return None
 
-        session = create_session()
         try:
-            user = session.query(User).join(Role).filter(
-                User.username == username
-            ).first()
+            # The connection goes back to the pool before the slow KDF work starts
+            with session_scope() as session:
+                user = session.execute(login_query(username)).first()
 
             if not user:
+                # Same KDF work as a real user, so timing does not reveal which usernames exist
+                self.verifier.verify_missing(password)
                 return None
 
-            hashed_input = self.hash_password(password)
-            if user.password != hashed_input:
+            valid, new_hash = self.verifier.verify(password, user.password)
+            if not valid:
                 return None
 
             # Check role permissions
             if allowed_roles:
                 # Use specific allowed roles
-                if user.role.role_name not in allowed_roles:
+                if user.role_name not in allowed_roles:
                     return None
             elif admin_only:
-                # Admin-only check (existing behavior)
-                admin_roles = ['System Admin', 'Application Admin', 'Product Admin', 'Order Admin']
-                if user.role.role_name not in admin_roles:
+                # Admin roles are those with at least one admin permission
+                if not permission_table.mask(user.role_name):
                     return None
             # If neither admin_only nor allowed_roles specified, allow any valid user
 
+            if new_hash:
+                # Transparently move old SHA-256 / outdated hashes to the current KDF
+                with session_scope() as session:
+                    session.execute(update(User).where(User.user_id == user.user_id).values(password=new_hash))
+                    session.commit()
+
             return {
                 'user_id': user.user_id,
                 'username': user.username,
-                'role': user.role.role_name
+                'role': user.role_name
             }
 
+        except PasswordVerifierBusy:
+            raise
         except Exception as e:
             print(f"Auth error: {e}")
             return None
-        finally:
-            session.close()
 
     def check_access(self, user_role, resource):
         """Check if user role has access to resource"""
-        if user_role == 'System Admin':
-            return resource in ['roles', 'users', 'products', 'orders', 'faq', 'unanswered']
-        elif user_role == 'Application Admin':
-            return resource in ['users', 'products', 'orders', 'faq', 'unanswered']
-        elif user_role == 'Product Admin':
-            return resource in ['products', 'orders']
-        elif user_role == 'Order Admin':
-            return resource in ['orders']
-        else:
-            return False
+        return permission_table.allows(user_role, resource)
+
+def login_query(username):
+    """The user's id, name, password hash and role name in a single joined query"""
+    return (select(User.user_id, User.username, User.password, Role.role_name)
+            .join(Role, User.role_id == Role.role_id)
+            .where(User.username == username))
 
 class ProductManager:
     """Product CRUD operations"""
+
+    topic = 'products'
     
     def get_all(self):
-        if not create_session or not Product:
+        if not session_scope or not Product:
             return []
         
-        session = create_session()
         try:
-            products = session.query(Product).all()
-            product_list = []
-            for p in products:
-                product_dict = {
-                    'product_id': p.product_id,
-                    'product_name': p.product_name,
-                    'current_stock': p.current_stock,
-                    'moq': p.moq,
-                    'quantity_type': p.quantity_type
-                }
-                product_list.append(product_dict)
-            return product_list
+            with session_scope() as session:
+                # Plain row tuples of the listed columns; no ORM objects are built
+                rows = session.execute(select(
+                    Product.product_id, Product.product_name, Product.current_stock, Product.moq,
+                    Product.quantity_type
+                ))
+                product_list = []
+                for product_id, product_name, current_stock, moq, quantity_type in rows:
+                    product_dict = {
+                        'product_id': product_id,
+                        'product_name': product_name,
+                        'current_stock': current_stock,
+                        'moq': moq,
+                        'quantity_type': quantity_type
+                    }
+                    product_list.append(product_dict)
+                return product_list
         except Exception as e:
             print(f"Error: {e}")
             return []
-        finally:
-            session.close()
+
+    def list_spec(self):
+        """Columns, joins and filters of the products list and export"""
+        return {
+            'id_field': 'product_id',
+            'columns': {
+                'product_id': Product.product_id,
+                'product_name': Product.product_name,
+                'current_stock': Product.current_stock,
+                'moq': Product.moq,
+                'quantity_type': Product.quantity_type
+            },
+            'filter_specs': {
+                'name': lambda v: contains(Product.product_name, v),
+                'in_stock': lambda v: Product.current_stock > 0 if parse_bool(v) else Product.current_stock <= 0,
+                'quantity_type': lambda v: Product.quantity_type == v
+            }
+        }
+
+    def get_page(self, **params):
+        """One page of products; see list_page for the parameters"""
+        if not session_scope or not Product:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_page(**self.list_spec(), **params)
+
+    def get_changes(self, ids, fields=None, filters=None):
+        """Current state of changed products; see list_changes"""
+        if not session_scope or not Product:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_changes(**self.list_spec(), ids=ids, fields=fields, filters=filters)
+
+    def search_spec(self):
+        """What ?q= searches and how it is indexed"""
+        return {'topic': self.topic, 'kind': 'trigram', 'id': Product.product_id, 'text': [Product.product_name]}
+
+    def search(self, q, **params):
+        """Ranked products matching q; see search_page for the parameters"""
+        if not session_scope or not Product:
+            return {'success': False, 'message': 'Database not available'}
+
+        return search_page(**self.list_spec(), search=self.search_spec(), q=q, **params)
 
     def create(self, name, stock, moq, qty_type):
-        if not create_session or not Product:
+        if not session_scope or not Product:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            product = Product(
-                product_name=name,
-                current_stock=stock,
-                moq=moq,
-                quantity_type=qty_type
-            )
-            session.add(product)
-            session.commit()
-            return {'success': True, 'message': f'Product "{name}" created'}
+            with session_scope() as session:
+                product = Product(
+                    product_name=name,
+                    current_stock=stock,
+                    moq=moq,
+                    quantity_type=qty_type
+                )
+                session.add(product)
+                session.commit()
+                notify_change('products', product.product_id)
+                return {'success': True, 'message': f'Product "{name}" created'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def update(self, product_id, name, stock, moq, qty_type):
-        if not create_session or not Product:
+        if not session_scope or not Product:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            product = session.query(Product).filter_by(product_id=product_id).first()
-            if not product:
-                return {'success': False, 'message': 'Product not found'}
-
-            if name:
-                product.product_name = name
-            if stock is not None:
-                product.current_stock = stock
-            if moq is not None:
-                product.moq = moq
-            if qty_type:
-                product.quantity_type = qty_type
+            with session_scope() as session:
+                product = session.query(Product).filter_by(product_id=product_id).first()
+                if not product:
+                    return {'success': False, 'message': 'Product not found'}
+
+                renamed = bool(name) and name != product.product_name
+                if name:
+                    product.product_name = name
+                if stock is not None:
+                    product.current_stock = stock
+                if moq is not None:
+                    product.moq = moq
+                if qty_type:
+                    product.quantity_type = qty_type
             
-            session.commit()
-            return {'success': True, 'message': 'Product updated successfully'}
+                session.commit()
+                notify_change('products', product_id)
+                if renamed:
+                    # Cached order statuses show the product name
+                    notify_change('orders')
+                return {'success': True, 'message': 'Product updated successfully'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def delete(self, product_id):
-        if not create_session or not Product:
+        if not session_scope or not Product:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            product = session.query(Product).filter_by(product_id=product_id).first()
-            if not product:
-                return {'success': False, 'message': 'Product not found'}
-
-            name = product.product_name
-            session.delete(product)
-            session.commit()
-            return {'success': True, 'message': f'Product "{name}" deleted'}
+            with session_scope() as session:
+                product = session.query(Product).filter_by(product_id=product_id).first()
+                if not product:
+                    return {'success': False, 'message': 'Product not found'}
+
+                name = product.product_name
+                session.delete(product)
+                session.commit()
+                notify_change('products', product_id)
+                return {'success': True, 'message': f'Product "{name}" deleted'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
+
+    def bulk(self, operation, items):
+        """
+        Create, update, upsert or delete many products in chunked transactions.
+
+        Items use the same keys as the single-product endpoints: product_id,
+        name, stock, moq and quantity_type. Upserts are full records keyed
+        by product_id.
+        """
+        if not session_scope or not Product:
+            return {'success': False, 'message': 'Database not available'}
+        if operation not in BULK_OPERATIONS:
+            return {'success': False, 'message': f'Unknown operation: {operation}'}
+
+        def full_record(item, with_id):
+            row = {
+                'product_name': str(item['name']).strip(),
+                'current_stock': int(item.get('stock', 0)),
+                'moq': int(item.get('moq', 1)),
+                'quantity_type': item.get('quantity_type') or 'pcs'
+            }
+            if not row['product_name']:
+                raise ValueError('name is required')
+            if with_id:
+                row['product_id'] = int(item['product_id'])
+            return row
+
+        def partial_record(item):
+            row = {'product_id': int(item['product_id'])}
+            if item.get('name'):
+                row['product_name'] = item['name']
+            if item.get('stock') is not None:
+                row['current_stock'] = int(item['stock'])
+            if item.get('moq') is not None:
+                row['moq'] = int(item['moq'])
+            if item.get('quantity_type'):
+                row['quantity_type'] = item['quantity_type']
+            return row
+
+        def apply_create(session, chunk):
+            ids = session.scalars(
+                insert(Product).returning(Product.product_id, sort_by_parameter_order=True),
+                [row for _, row in chunk]
+            ).all()
+            return [{'success': True, 'product_id': product_id} for product_id in ids]
+
+        def apply_update(session, chunk):
+            present = existing_ids(session, Product.product_id, [row['product_id'] for _, row in chunk])
+            rows = [row for _, row in chunk if row['product_id'] in present and len(row) > 1]
+            if rows:
+                session.execute(update(Product), rows)
+            return [{'success': True, 'product_id': row['product_id']} if row['product_id'] in present
+                    else {'success': False, 'product_id': row['product_id'], 'message': 'Product not found'}
+                    for _, row in chunk]
+
+        def apply_upsert(session, chunk):
+            upsert_rows(session, Product, 'product_id', [row for _, row in chunk])
+            return [{'success': True, 'product_id': row['product_id']} for _, row in chunk]
+
+        def apply_delete(session, chunk):
+            present = existing_ids(session, Product.product_id, [row['product_id'] for _, row in chunk])
+            if present:
+                session.execute(delete(Product).where(Product.product_id.in_(present)))
+            return [{'success': True, 'product_id': row['product_id']} if row['product_id'] in present
+                    else {'success': False, 'product_id': row['product_id'], 'message': 'Product not found'}
+                    for _, row in chunk]
+
+        if operation == 'create':
+            result = run_bulk(items, lambda item: full_record(item, False), apply_create)
+        elif operation == 'update':
+            result = run_bulk(items, partial_record, apply_update)
+        elif operation == 'upsert':
+            result = run_bulk(items, lambda item: full_record(item, True), apply_upsert)
+        else:
+            result = run_bulk(items, lambda item: {'product_id': int(item['product_id'])}, apply_delete)
+
+        if result['succeeded']:
+            notify_change('products')
+        if operation in ('update', 'upsert') and result['succeeded']:
+            # Cached order statuses show product names
+            notify_change('orders')
+        return result
 
 class OrderManager:
     """Order CRUD operations"""
+
+    topic = 'orders'
     
     def get_all(self):
-        if not create_session or not Order:
+        if not session_scope or not Order:
             return []
         
-        session = create_session()
         try:
-            orders = session.query(Order).join(Product).join(User).all()
-            order_list = []
-            for o in orders:
-                order_dict = {
-                    'order_id': o.order_id,
-                    'username': o.user.username,
-                    'product_name': o.product.product_name,
-                    'status': o.status,
-                    'estimated_delivery': str(o.estimated_delivery) if o.estimated_delivery else None
-                }
-                order_list.append(order_dict)
-            return order_list
+            with session_scope() as session:
+                # Usernames and product names come from the joins in the same statement,
+                # not from lazy loads of o.user and o.product
+                rows = session.execute(
+                    select(Order.order_id, User.username, Product.product_name, Order.status,
+                           Order.estimated_delivery)
+                    .join(Product, Order.product_id == Product.product_id)
+                    .join(User, Order.user_id == User.user_id)
+                )
+                order_list = []
+                for order_id, username, product_name, status, estimated_delivery in rows:
+                    order_dict = {
+                        'order_id': order_id,
+                        'username': username,
+                        'product_name': product_name,
+                        'status': status,
+                        'estimated_delivery': str(estimated_delivery) if estimated_delivery else None
+                    }
+                    order_list.append(order_dict)
+                return order_list
         except Exception as e:
             print(f"Error: {e}")
             return []
-        finally:
-            session.close()
+
+    def list_spec(self):
+        """Columns, joins and filters of the orders list and export"""
+        return {
+            'id_field': 'order_id',
+            'columns': {
+                'order_id': Order.order_id,
+                'user_id': Order.user_id,
+                'username': User.username,
+                'product_id': Order.product_id,
+                'product_name': Product.product_name,
+                'status': Order.status,
+                'estimated_delivery': Order.estimated_delivery
+            },
+            'joins': [
+                (Product, Order.product_id == Product.product_id),
+                (User, Order.user_id == User.user_id)
+            ],
+            'filter_specs': {
+                'status': lambda v: Order.status == v,
+                'user_id': lambda v: Order.user_id == int(v),
+                'username': lambda v: User.username == v,
+                'product_id': lambda v: Order.product_id == int(v),
+                'product': lambda v: contains(Product.product_name, v),
+                'delivery_from': lambda v: Order.estimated_delivery >= parse_date(v),
+                'delivery_to': lambda v: Order.estimated_delivery <= parse_date(v),
+                'q': order_search
+            }
+        }
+
+    def get_page(self, **params):
+        """One page of orders; see list_page for the parameters"""
+        if not session_scope or not Order:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_page(**self.list_spec(), **params)
+
+    def get_changes(self, ids, fields=None, filters=None):
+        """Current state of changed orders; see list_changes"""
+        if not session_scope or not Order:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_changes(**self.list_spec(), ids=ids, fields=fields, filters=filters)
+
+    def export(self, fields=None, filters=None):
+        """All matching orders as a row stream; see export_rows"""
+        if not session_scope or not Order:
+            return {'success': False, 'message': 'Database not available'}
+
+        try:
+            selected, rows = export_rows(**self.list_spec(), fields=fields, filters=filters)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+        return {'success': True, 'fields': selected, 'rows': rows}
 
     def create(self, user_id, product_id, status, estimated_delivery):
-        if not create_session or not Order:
+        if not session_scope or not Order:
             return {'success': False, 'message': 'Database not available'}
     
-        session = create_session()
         try:
-            # Check if user exists
-            user = session.query(User).filter_by(user_id=user_id).first()
-            if not user:
-                return {'success': False, 'message': 'User not found'}
+            with session_scope() as session:
+                # Check if user exists
+                user = session.query(User).filter_by(user_id=user_id).first()
+                if not user:
+                    return {'success': False, 'message': 'User not found'}
     
-            # Check if product exists
-            product = session.query(Product).filter_by(product_id=product_id).first()
-            if not product:
-                return {'success': False, 'message': 'Product not found'}
+                # Check if product exists
+                product = session.query(Product).filter_by(product_id=product_id).first()
+                if not product:
+                    return {'success': False, 'message': 'Product not found'}
     
-            # Create new order
-            order = Order(
-                user_id=user_id,
-                product_id=product_id,
-                status=status if status else 'pending',
-                estimated_delivery=estimated_delivery
-            )
-            session.add(order)
-            session.commit()
+                # Create new order
+                order = Order(
+                    user_id=user_id,
+                    product_id=product_id,
+                    status=status if status else 'pending',
+                    estimated_delivery=estimated_delivery
+                )
+                session.add(order)
+                session.commit()
+                notify_change('orders', order.order_id)
     
-            return {
-                'success': True, 
-                'message': f'Order created successfully for user {user.username} - Product: {product.product_name}',
-                'order_id': order.order_id
-            }
+                return {
+                    'success': True, 
+                    'message': f'Order created successfully for user {user.username} - Product: {product.product_name}',
+                    'order_id': order.order_id
+                }
     
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error creating order: {str(e)}'}
-        finally:
-            session.close()
 
 
     def update(self, order_id, status, estimated_delivery):
-        if not create_session or not Order:
+        if not session_scope or not Order:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            order = session.query(Order).filter_by(order_id=order_id).first()
-            if not order:
-                return {'success': False, 'message': 'Order not found'}
-
-            if status:
-                order.status = status
-            if estimated_delivery:
-                order.estimated_delivery = estimated_delivery
+            with session_scope() as session:
+                order = session.query(Order).filter_by(order_id=order_id).first()
+                if not order:
+                    return {'success': False, 'message': 'Order not found'}
+
+                if status:
+                    order.status = status
+                if estimated_delivery:
+                    order.estimated_delivery = estimated_delivery
             
-            session.commit()
-            return {'success': True, 'message': 'Order updated successfully'}
+                session.commit()
+                notify_change('orders', order_id)
+                return {'success': True, 'message': 'Order updated successfully'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def delete(self, order_id):
-        if not create_session or not Order:
+        if not session_scope or not Order:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            order = session.query(Order).filter_by(order_id=order_id).first()
-            if not order:
-                return {'success': False, 'message': 'Order not found'}
-
-            session.delete(order)
-            session.commit()
-            return {'success': True, 'message': f'Order {order_id} deleted'}
+            with session_scope() as session:
+                order = session.query(Order).filter_by(order_id=order_id).first()
+                if not order:
+                    return {'success': False, 'message': 'Order not found'}
+
+                session.delete(order)
+                session.commit()
+                notify_change('orders', order_id)
+                return {'success': True, 'message': f'Order {order_id} deleted'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
+
+    def bulk(self, operation, items):
+        """
+        Create, update, upsert or delete many orders in chunked transactions.
+
+        Items use the same keys as the single-order endpoints: order_id,
+        user_id, product_id, status and estimated_delivery. Users and
+        products are validated with one query per chunk.
+        """
+        if not session_scope or not Order:
+            return {'success': False, 'message': 'Database not available'}
+        if operation not in BULK_OPERATIONS:
+            return {'success': False, 'message': f'Unknown operation: {operation}'}
+
+        def full_record(item, with_id):
+            row = {
+                'user_id': int(item['user_id']),
+                'product_id': int(item['product_id']),
+                'status': item.get('status') or 'pending',
+                'estimated_delivery': parse_date(item['estimated_delivery']) if item.get('estimated_delivery') else None
+            }
+            if with_id:
+                row['order_id'] = int(item['order_id'])
+            return row
+
+        def partial_record(item):
+            row = {'order_id': int(item['order_id'])}
+            if item.get('status'):
+                row['status'] = item['status']
+            if item.get('estimated_delivery'):
+                row['estimated_delivery'] = parse_date(item['estimated_delivery'])
+            return row
+
+        def check_references(session, chunk):
+            """Per-entry error message for unknown users/products, None if valid"""
+            users = existing_ids(session, User.user_id, [row['user_id'] for _, row in chunk])
+            products = existing_ids(session, Product.product_id, [row['product_id'] for _, row in chunk])
+            errors = []
+            for _, row in chunk:
+                if row['user_id'] not in users:
+                    errors.append('User not found')
+                elif row['product_id'] not in products:
+                    errors.append('Product not found')
+                else:
+                    errors.append(None)
+            return errors
+
+        def apply_create(session, chunk):
+            errors = check_references(session, chunk)
+            rows = [row for (_, row), error in zip(chunk, errors) if error is None]
+            ids = iter(session.scalars(
+                insert(Order).returning(Order.order_id, sort_by_parameter_order=True), rows
+            ).all() if rows else [])
+            return [{'success': True, 'order_id': next(ids)} if error is None
+                    else {'success': False, 'message': error}
+                    for error in errors]
+
+        def apply_update(session, chunk):
+            present = existing_ids(session, Order.order_id, [row['order_id'] for _, row in chunk])
+            rows = [row for _, row in chunk if row['order_id'] in present and len(row) > 1]
+            if rows:
+                session.execute(update(Order), rows)
+            return [{'success': True, 'order_id': row['order_id']} if row['order_id'] in present
+                    else {'success': False, 'order_id': row['order_id'], 'message': 'Order not found'}
+                    for _, row in chunk]
+
+        def apply_upsert(session, chunk):
+            errors = check_references(session, chunk)
+            rows = [row for (_, row), error in zip(chunk, errors) if error is None]
+            if rows:
+                upsert_rows(session, Order, 'order_id', rows)
+            return [{'success': True, 'order_id': row['order_id']} if error is None
+                    else {'success': False, 'order_id': row['order_id'], 'message': error}
+                    for (_, row), error in zip(chunk, errors)]
+
+        def apply_delete(session, chunk):
+            present = existing_ids(session, Order.order_id, [row['order_id'] for _, row in chunk])
+            if present:
+                session.execute(delete(Order).where(Order.order_id.in_(present)))
+            return [{'success': True, 'order_id': row['order_id']} if row['order_id'] in present
+                    else {'success': False, 'order_id': row['order_id'], 'message': 'Order not found'}
+                    for _, row in chunk]
+
+        if operation == 'create':
+            result = run_bulk(items, lambda item: full_record(item, False), apply_create)
+        elif operation == 'update':
+            result = run_bulk(items, partial_record, apply_update)
+        elif operation == 'upsert':
+            result = run_bulk(items, lambda item: full_record(item, True), apply_upsert)
+        else:
+            result = run_bulk(items, lambda item: {'order_id': int(item['order_id'])}, apply_delete)
+
+        if result['succeeded']:
+            # One message instead of one per order; new orders change list versions too
+            notify_change('orders')
+        return result
 
 class UserManager:
     """User CRUD operations"""
+
+    topic = 'users'
     
     def get_all(self):
-        if not create_session or not User:
+        if not session_scope or not User:
             return []
         
-        session = create_session()
         try:
-            users = session.query(User).join(Role).all()
-            user_list = []
-            for u in users:
-                user_dict = {
-                    'user_id': u.user_id,
-                    'username': u.username,
-                    'role_name': u.role.role_name
-                }
-                user_list.append(user_dict)
-            return user_list
+            with session_scope() as session:
+                # The role name comes from the join, not from a lazy load of u.role
+                rows = session.execute(
+                    select(User.user_id, User.username, Role.role_name)
+                    .join(Role, User.role_id == Role.role_id)
+                )
+                user_list = []
+                for user_id, username, role_name in rows:
+                    user_dict = {
+                        'user_id': user_id,
+                        'username': username,
+                        'role_name': role_name
+                    }
+                    user_list.append(user_dict)
+                return user_list
         except Exception as e:
             print(f"Error: {e}")
             return []
-        finally:
-            session.close()
+
+    def list_spec(self):
+        """Columns, joins and filters of the users list and export"""
+        return {
+            'id_field': 'user_id',
+            'columns': {
+                'user_id': User.user_id,
+                'username': User.username,
+                'role_name': Role.role_name
+            },
+            'joins': [
+                (Role, User.role_id == Role.role_id)
+            ],
+            'filter_specs': {
+                'username': lambda v: contains(User.username, v),
+                'role': lambda v: Role.role_name == v,
+                'q': lambda v: contains(User.username, v.strip())
+            }
+        }
+
+    def get_page(self, **params):
+        """One page of users; see list_page for the parameters"""
+        if not session_scope or not User:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_page(**self.list_spec(), **params)
+
+    def get_changes(self, ids, fields=None, filters=None):
+        """Current state of changed users; see list_changes"""
+        if not session_scope or not User:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_changes(**self.list_spec(), ids=ids, fields=fields, filters=filters)
 
     def create(self, username, password, role_name):
-        if not create_session or not User or not Role:
+        if not session_scope or not User or not Role:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
+        # Hashed before a connection is checked out; PasswordVerifierBusy propagates
+        hashed_password = AdminAuth().hash_password(password)
         try:
-            role = session.query(Role).filter_by(role_name=role_name).first()
-            if not role:
-                return {'success': False, 'message': 'Role not found'}
-
-            auth = AdminAuth()
-            hashed_password = auth.hash_password(password)
-            user = User(
-                username=username,
-                password=hashed_password,
-                role_id=role.role_id
-            )
-            session.add(user)
-            session.commit()
-            return {'success': True, 'message': f'User "{username}" created'}
+            with session_scope() as session:
+                role = session.query(Role).filter_by(role_name=role_name).first()
+                if not role:
+                    return {'success': False, 'message': 'Role not found'}
+
+                user = User(
+                    username=username,
+                    password=hashed_password,
+                    role_id=role.role_id
+                )
+                session.add(user)
+                session.commit()
+                notify_change('users', user.user_id)
+                return {'success': True, 'message': f'User "{username}" created'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def update(self, user_id, username, password, role_name):
-        if not create_session or not User or not Role:
+        if not session_scope or not User or not Role:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
+        # Hashed before a connection is checked out; PasswordVerifierBusy propagates
+        hashed_password = AdminAuth().hash_password(password) if password else None
         try:
-            user = session.query(User).filter_by(user_id=user_id).first()
-            if not user:
-                return {'success': False, 'message': 'User not found'}
+            with session_scope() as session:
+                user = session.query(User).filter_by(user_id=user_id).first()
+                if not user:
+                    return {'success': False, 'message': 'User not found'}
     
-            # Update username if provided
-            if username:
-                # Check if new username already exists (exclude current user)
-                existing_user = session.query(User).filter(
-                    User.username == username,
-                    User.user_id != user_id
-                ).first()
-                if existing_user:
-                    return {'success': False, 'message': 'Username already exists'}
-                user.username = username
-
-            # Update password if provided
-            if password:
-                auth = AdminAuth()
-                user.password = auth.hash_password(password)
-
-            # Update role if provided
-            if role_name:
-                role = session.query(Role).filter_by(role_name=role_name).first()
-                if not role:
-                    return {'success': False, 'message': 'Role not found'}
-                user.role_id = role.role_id
-
-            session.commit()
-            return {'success': True, 'message': f'User "{user.username}" updated successfully'}
+                renamed = False
+                # Update username if provided
+                if username:
+                    # Check if new username already exists (exclude current user)
+                    existing_user = session.query(User).filter(
+                        User.username == username,
+                        User.user_id != user_id
+                    ).first()
+                    if existing_user:
+                        return {'success': False, 'message': 'Username already exists'}
+                    renamed = user.username != username
+                    user.username = username
+
+                # Update password if provided
+                if hashed_password:
+                    user.password = hashed_password
+
+                # Update role if provided
+                if role_name:
+                    role = session.query(Role).filter_by(role_name=role_name).first()
+                    if not role:
+                        return {'success': False, 'message': 'Role not found'}
+                    user.role_id = role.role_id
+
+                session.commit()
+                notify_change('users', user_id)
+                if renamed:
+                    # The orders list shows usernames
+                    notify_change('orders')
+                return {'success': True, 'message': f'User "{user.username}" updated successfully'}
 
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
 
     def delete(self, user_id):
-        if not create_session or not User:
+        if not session_scope or not User:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            user = session.query(User).filter_by(user_id=user_id).first()
-            if not user:
-                return {'success': False, 'message': 'User not found'}
-
-            username = user.username
-            session.delete(user)
-            session.commit()
-            return {'success': True, 'message': f'User "{username}" deleted'}
+            with session_scope() as session:
+                user = session.query(User).filter_by(user_id=user_id).first()
+                if not user:
+                    return {'success': False, 'message': 'User not found'}
+
+                username = user.username
+                session.delete(user)
+                session.commit()
+                notify_change('users', user_id)
+                return {'success': True, 'message': f'User "{username}" deleted'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
 class FAQManager:
     """FAQ CRUD operations"""
+
+    topic = 'faq'
     
     def get_all(self):
-        if not create_session or not FAQ:
+        if not session_scope or not FAQ:
             return []
         
-        session = create_session()
         try:
-            faqs = session.query(FAQ).all()
-            faq_list = []
-            for f in faqs:
-                faq_dict = {
-                    'faq_id': f.faq_id,
-                    'question': f.question,
-                    'answer': f.answer
-                }
-                faq_list.append(faq_dict)
-            return faq_list
+            with session_scope() as session:
+                rows = session.execute(select(FAQ.faq_id, FAQ.question, FAQ.answer))
+                faq_list = []
+                for faq_id, question, answer in rows:
+                    faq_dict = {
+                        'faq_id': faq_id,
+                        'question': question,
+                        'answer': answer
+                    }
+                    faq_list.append(faq_dict)
+                return faq_list
         except Exception as e:
             print(f"Error: {e}")
             return []
-        finally:
-            session.close()
+
+    def list_spec(self):
+        """Columns, joins and filters of the FAQs list and export"""
+        return {
+            'id_field': 'faq_id',
+            'columns': {
+                'faq_id': FAQ.faq_id,
+                'question': FAQ.question,
+                'answer': FAQ.answer
+            },
+            'filter_specs': {
+                'question': lambda v: contains(FAQ.question, v)
+            }
+        }
+
+    def get_page(self, **params):
+        """One page of FAQs; see list_page for the parameters"""
+        if not session_scope or not FAQ:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_page(**self.list_spec(), **params)
+
+    def get_changes(self, ids, fields=None, filters=None):
+        """Current state of changed FAQs; see list_changes"""
+        if not session_scope or not FAQ:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_changes(**self.list_spec(), ids=ids, fields=fields, filters=filters)
+
+    def search_spec(self):
+        """What ?q= searches and how it is indexed"""
+        return {'topic': self.topic, 'kind': 'text', 'id': FAQ.faq_id, 'text': [FAQ.question, FAQ.answer]}
+
+    def search(self, q, **params):
+        """Ranked FAQs matching q; see search_page for the parameters"""
+        if not session_scope or not FAQ:
+            return {'success': False, 'message': 'Database not available'}
+
+        return search_page(**self.list_spec(), search=self.search_spec(), q=q, **params)
 
     def create(self, question, answer):
-        if not create_session or not FAQ:
+        if not session_scope or not FAQ:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            faq = FAQ(question=question, answer=answer)
-            session.add(faq)
-            session.commit()
-            return {'success': True, 'message': 'FAQ created successfully'}
+            with session_scope() as session:
+                faq = FAQ(question=question, answer=answer)
+                session.add(faq)
+                session.commit()
+                notify_change('faq', faq.faq_id)
+                return {'success': True, 'message': 'FAQ created successfully'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def update(self, faq_id, question, answer):
-        if not create_session or not FAQ:
+        if not session_scope or not FAQ:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            faq = session.query(FAQ).filter_by(faq_id=faq_id).first()
-            if not faq:
-                return {'success': False, 'message': 'FAQ not found'}
-
-            if question:
-                faq.question = question
-            if answer:
-                faq.answer = answer
+            with session_scope() as session:
+                faq = session.query(FAQ).filter_by(faq_id=faq_id).first()
+                if not faq:
+                    return {'success': False, 'message': 'FAQ not found'}
+
+                if question:
+                    faq.question = question
+                if answer:
+                    faq.answer = answer
             
-            session.commit()
-            return {'success': True, 'message': 'FAQ updated successfully'}
+                session.commit()
+                notify_change('faq', faq_id)
+                return {'success': True, 'message': 'FAQ updated successfully'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def delete(self, faq_id):
-        if not create_session or not FAQ:
+        if not session_scope or not FAQ:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            faq = session.query(FAQ).filter_by(faq_id=faq_id).first()
-            if not faq:
-                return {'success': False, 'message': 'FAQ not found'}
-
-            session.delete(faq)
-            session.commit()
-            return {'success': True, 'message': 'FAQ deleted successfully'}
+            with session_scope() as session:
+                faq = session.query(FAQ).filter_by(faq_id=faq_id).first()
+                if not faq:
+                    return {'success': False, 'message': 'FAQ not found'}
+
+                session.delete(faq)
+                session.commit()
+                notify_change('faq', faq_id)
+                return {'success': True, 'message': 'FAQ deleted successfully'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
 class UnansweredQuestionManager:
     """Unanswered Questions CRUD operations"""
+
+    topic = 'unanswered'
     
     def get_all(self):
-        if not create_session or not UnansweredQuestion:
+        if not session_scope or not UnansweredQuestion:
             return []
         
-        session = create_session()
         try:
-            questions = session.query(UnansweredQuestion).all()
-            question_list = []
-            for q in questions:
-                question_dict = {
-                    'uq_id': q.uq_id,
-                    'question': q.question,
-                    'status': q.status
-                }
-                question_list.append(question_dict)
-            return question_list
+            with session_scope() as session:
+                # One row per cluster of near-duplicates, most frequent first
+                rows = session.execute(
+                    select(UnansweredQuestion.uq_id, UnansweredQuestion.question, UnansweredQuestion.status,
+                           UnansweredQuestion.occurrences, UnansweredQuestion.first_seen,
+                           UnansweredQuestion.last_seen)
+                    .order_by(UnansweredQuestion.occurrences.desc(), UnansweredQuestion.uq_id)
+                )
+                question_list = []
+                for uq_id, question, status, occurrences, first_seen, last_seen in rows:
+                    question_dict = {
+                        'uq_id': uq_id,
+                        'question': question,
+                        'status': status,
+                        'occurrences': occurrences,
+                        'first_seen': str(first_seen) if first_seen else None,
+                        'last_seen': str(last_seen) if last_seen else None
+                    }
+                    question_list.append(question_dict)
+                return question_list
         except Exception as e:
             print(f"Error: {e}")
             return []
-        finally:
-            session.close()
+
+    def list_spec(self):
+        """Columns, joins and filters of the unanswered questions list and export"""
+        return {
+            'id_field': 'uq_id',
+            'columns': {
+                'uq_id': UnansweredQuestion.uq_id,
+                'question': UnansweredQuestion.question,
+                'status': UnansweredQuestion.status,
+                'occurrences': UnansweredQuestion.occurrences,
+                'first_seen': UnansweredQuestion.first_seen,
+                'last_seen': UnansweredQuestion.last_seen
+            },
+            'filter_specs': {
+                'status': lambda v: UnansweredQuestion.status == v,
+                'question': lambda v: contains(UnansweredQuestion.question, v),
+                'min_occurrences': lambda v: UnansweredQuestion.occurrences >= int(v)
+            }
+        }
+
+    def get_page(self, **params):
+        """One page of unanswered questions; see list_page for the parameters"""
+        if not session_scope or not UnansweredQuestion:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_page(**self.list_spec(), **params)
+
+    def get_changes(self, ids, fields=None, filters=None):
+        """Current state of changed unanswered questions; see list_changes"""
+        if not session_scope or not UnansweredQuestion:
+            return {'success': False, 'message': 'Database not available'}
+
+        return list_changes(**self.list_spec(), ids=ids, fields=fields, filters=filters)
+
+    def get_clusters(self, **params):
+        """Question clusters, most occurrences first; see ranked_page for the parameters"""
+        if not session_scope or not UnansweredQuestion:
+            return {'success': False, 'message': 'Database not available'}
+
+        return ranked_page(**self.list_spec(), order_by=[UnansweredQuestion.occurrences.desc()], **params)
+
+    def search_spec(self):
+        """What ?q= searches and how it is indexed"""
+        return {'topic': self.topic, 'kind': 'text', 'id': UnansweredQuestion.uq_id,
+                'text': [UnansweredQuestion.question]}
+
+    def search(self, q, **params):
+        """Ranked unanswered questions matching q; see search_page for the parameters"""
+        if not session_scope or not UnansweredQuestion:
+            return {'success': False, 'message': 'Database not available'}
+
+        return search_page(**self.list_spec(), search=self.search_spec(), q=q, **params)
+
+    def export(self, fields=None, filters=None):
+        """All matching unanswered questions as a row stream; see export_rows"""
+        if not session_scope or not UnansweredQuestion:
+            return {'success': False, 'message': 'Database not available'}
+
+        try:
+            selected, rows = export_rows(**self.list_spec(), fields=fields, filters=filters)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+        return {'success': True, 'fields': selected, 'rows': rows}
 
     def update(self, uq_id, status):
-        if not create_session or not UnansweredQuestion:
+        if not session_scope or not UnansweredQuestion:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            question = session.query(UnansweredQuestion).filter_by(uq_id=uq_id).first()
-            if not question:
-                return {'success': False, 'message': 'Question not found'}
+            with session_scope() as session:
+                question = session.query(UnansweredQuestion).filter_by(uq_id=uq_id).first()
+                if not question:
+                    return {'success': False, 'message': 'Question not found'}
 
-            if status:
-                question.status = status
+                if status:
+                    question.status = status
             
-            session.commit()
-            return {'success': True, 'message': 'Question updated successfully'}
+                session.commit()
+                notify_change('unanswered', uq_id)
+                return {'success': True, 'message': 'Question updated successfully'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def delete(self, uq_id):
-        if not create_session or not UnansweredQuestion:
+        if not session_scope or not UnansweredQuestion:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            question = session.query(UnansweredQuestion).filter_by(uq_id=uq_id).first()
-            if not question:
-                return {'success': False, 'message': 'Question not found'}
-
-            session.delete(question)
-            session.commit()
-            return {'success': True, 'message': 'Question deleted successfully'}
+            with session_scope() as session:
+                question = session.query(UnansweredQuestion).filter_by(uq_id=uq_id).first()
+                if not question:
+                    return {'success': False, 'message': 'Question not found'}
+
+                session.delete(question)
+                session.commit()
+                notify_change('unanswered', uq_id)
+                return {'success': True, 'message': 'Question deleted successfully'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
 class RoleManager:
     """Role CRUD operations (System Admin only)"""
+
+    topic = 'roles'
     
     def get_all(self):
-        if not create_session or not Role:
+        if not session_scope or not Role:
             return []
         
-        session = create_session()
         try:
-            roles = session.query(Role).all()
-            role_list = []
-            for r in roles:
-                role_dict = {
-                    'role_id': r.role_id,
-                    'role_name': r.role_name
-                }
-                role_list.append(role_dict)
-            return role_list
+            with session_scope() as session:
+                roles = session.query(Role).all()
+                permissions = self.permissions_by_role(session, [r.role_id for r in roles])
+                role_list = []
+                for r in roles:
+                    role_dict = {
+                        'role_id': r.role_id,
+                        'role_name': r.role_name,
+                        'permissions': permissions.get(r.role_id, [])
+                    }
+                    role_list.append(role_dict)
+                return role_list
         except Exception as e:
             print(f"Error: {e}")
             return []
-        finally:
-            session.close()
 
-    def create(self, role_name):
-        if not create_session or not Role:
+    def permissions_by_role(self, session, role_ids):
+        """role_id -> list of resources, for the given roles in one query"""
+        if not role_ids:
+            return {}
+        masks = {}
+        rows = session.query(RolePermission.role_id, RolePermission.resource).filter(
+            RolePermission.role_id.in_(role_ids)
+        )
+        for role_id, resource in rows:
+            masks[role_id] = masks.get(role_id, 0) | resource_mask([resource])
+        return {role_id: mask_resources(mask) for role_id, mask in masks.items()}
+
+    def list_spec(self):
+        """Columns, joins and filters of the roles list and export"""
+        return {
+            'id_field': 'role_id',
+            'columns': {
+                'role_id': Role.role_id,
+                'role_name': Role.role_name
+            },
+            'filter_specs': {
+                'role_name': lambda v: Role.role_name == v
+            }
+        }
+
+    def get_page(self, **params):
+        """One page of roles with their permissions; see list_page for the parameters"""
+        if not session_scope or not Role:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
+        return self.add_permissions(list_page(**self.list_spec(), **params))
+
+    def get_changes(self, ids, fields=None, filters=None):
+        """Current state of changed roles with their permissions; see list_changes"""
+        if not session_scope or not Role:
+            return {'success': False, 'message': 'Database not available'}
+
+        return self.add_permissions(list_changes(**self.list_spec(), ids=ids, fields=fields, filters=filters))
+
+    def add_permissions(self, result):
+        """Attach each role's permissions to a list result"""
+        if result.get('success') and result['data'] and 'role_id' in result['data'].fields:
+            roles = result['data'].to_dicts()
+            try:
+                with session_scope() as session:
+                    permissions = self.permissions_by_role(session, [r['role_id'] for r in roles])
+                for role in roles:
+                    role['permissions'] = permissions.get(role['role_id'], [])
+            except Exception as e:
+                return {'success': False, 'message': f'Error: {str(e)}'}
+            result['data'] = roles
+        return result
+
+    def create(self, role_name, permissions=None):
+        if not session_scope or not Role:
+            return {'success': False, 'message': 'Database not available'}
+
+        try:
+            resource_mask(permissions or [])
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+
         try:
-            role = Role(role_name=role_name)
-            session.add(role)
-            session.commit()
-            return {'success': True, 'message': f'Role "{role_name}" created'}
+            with session_scope() as session:
+                role = Role(role_name=role_name)
+                role.permissions = [RolePermission(resource=r) for r in dict.fromkeys(permissions or [])]
+                session.add(role)
+                session.commit()
+                notify_change('roles', role.role_id)
+                return {'success': True, 'message': f'Role "{role_name}" created'}
+        except Exception as e:
+            return {'success': False, 'message': f'Error: {str(e)}'}
+
+    def set_permissions(self, role_id, permissions):
+        """Replace the resources a role may access"""
+        if not session_scope or not Role:
+            return {'success': False, 'message': 'Database not available'}
+
+        try:
+            resource_mask(permissions)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+
+        try:
+            with session_scope() as session:
+                role = session.query(Role).filter_by(role_id=role_id).first()
+                if not role:
+                    return {'success': False, 'message': 'Role not found'}
+
+                role.permissions = [RolePermission(resource=r) for r in dict.fromkeys(permissions)]
+                session.commit()
+                notify_change('roles', role_id)
+                return {'success': True, 'message': f'Permissions of "{role.role_name}" updated'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
 
     def delete(self, role_id):
-        if not create_session or not Role:
+        if not session_scope or not Role:
             return {'success': False, 'message': 'Database not available'}
 
-        session = create_session()
         try:
-            role = session.query(Role).filter_by(role_id=role_id).first()
-            if not role:
-                return {'success': False, 'message': 'Role not found'}
-
-            role_name = role.role_name
-            session.delete(role)
-            session.commit()
-            return {'success': True, 'message': f'Role "{role_name}" deleted'}
+            with session_scope() as session:
+                role = session.query(Role).filter_by(role_id=role_id).first()
+                if not role:
+                    return {'success': False, 'message': 'Role not found'}
+
+                role_name = role.role_name
+                session.delete(role)
+                session.commit()
+                notify_change('roles', role_id)
+                return {'success': True, 'message': f'Role "{role_name}" deleted'}
         except Exception as e:
-            session.rollback()
             return {'success': False, 'message': f'Error: {str(e)}'}
-        finally:
-            session.close()
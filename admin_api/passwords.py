@@ -0,0 +1,237 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+# Hash formats:
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+#   <64 hex chars>   legacy unsalted SHA-256, upgraded on next successful login
+KDFS = ('pbkdf2_sha256', 'scrypt')
+
+def kdf_settings():
+    """KDF used for new hashes, read from the environment"""
+    return {
+        'kdf': os.getenv('PASSWORD_KDF', 'pbkdf2_sha256').lower(),
+        'iterations': int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '600000')),
+        'scrypt_n': int(os.getenv('PASSWORD_SCRYPT_N', '16384')),
+        'scrypt_r': int(os.getenv('PASSWORD_SCRYPT_R', '8')),
+        'scrypt_p': int(os.getenv('PASSWORD_SCRYPT_P', '1')),
+    }
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p)
+
+def hash_password(password, settings=None):
+    """Hash a password with the configured KDF and a random salt"""
+    settings = settings or kdf_settings()
+    salt = secrets.token_bytes(16)
+    if settings['kdf'] == 'scrypt':
+        n, r, p = settings['scrypt_n'], settings['scrypt_r'], settings['scrypt_p']
+        return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+    if settings['kdf'] != 'pbkdf2_sha256':
+        raise ValueError(f"Unknown PASSWORD_KDF: {settings['kdf']}")
+    iterations = settings['iterations']
+    return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(_pbkdf2(password, salt, iterations))}"
+
+def legacy_hash(password):
+    """Unsalted SHA-256 digest used by older versions"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def needs_rehash(stored, settings=None):
+    """True if stored was not produced with the current KDF settings"""
+    settings = settings or kdf_settings()
+    parts = stored.split('$')
+    if parts[0] != settings['kdf']:
+        return True
+    if parts[0] == 'pbkdf2_sha256':
+        return int(parts[1]) != settings['iterations']
+    return [int(v) for v in parts[1:4]] != [settings['scrypt_n'], settings['scrypt_r'], settings['scrypt_p']]
+
+def verify_password(password, stored):
+    """Check password against a stored hash in any supported format"""
+    if not stored:
+        return False
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            computed = _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+            return hmac.compare_digest(computed, _unb64(parts[3]))
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = (int(v) for v in parts[1:4])
+            computed = _scrypt(password, _unb64(parts[4]), n, r, p)
+            return hmac.compare_digest(computed, _unb64(parts[5]))
+    except (ValueError, TypeError):
+        return False
+    if len(stored) == 64:
+        return hmac.compare_digest(legacy_hash(password), stored)
+    return False
+
+class PasswordVerifierBusy(Exception):
+    """Raised when the verification pool has no room for another login"""
+
+class PasswordVerifier:
+    """
+    Bounded worker pool for password hashing.
+
+    Hashing runs on a fixed number of worker threads (hashlib releases the
+    GIL while it works), so a login burst cannot occupy every request thread
+    with KDF work. At most max_pending verifications are accepted at once;
+    further logins are rejected immediately with PasswordVerifierBusy, and
+    so are logins still waiting for a worker after timeout seconds.
+    """
+
+    def __init__(self, workers=None, max_pending=None, timeout=None):
+        self.workers = (workers if workers is not None
+                        else int(os.getenv('PASSWORD_WORKERS', str(os.cpu_count() or 2))))
+        self.max_pending = (max_pending if max_pending is not None
+                            else int(os.getenv('PASSWORD_MAX_PENDING', str(self.workers * 8))))
+        self.timeout = timeout if timeout is not None else float(os.getenv('PASSWORD_VERIFY_TIMEOUT', '10'))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.upgraded = 0
+        self._dummy_hash = None
+
+    def _check(self, password, stored):
+        """Verify and, if the stored hash is outdated, compute its replacement"""
+        if not verify_password(password, stored):
+            return False, None
+        if needs_rehash(stored):
+            return True, hash_password(password)
+        return True, None
+
+    def _done(self, future):
+        # The slot is held until the hashing itself ends, even if the caller gave up waiting
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordVerifierBusy('Too many logins in progress')
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            # The pool is too far behind to answer in time; not a wrong password
+            raise PasswordVerifierBusy('Password verification timed out')
+
+    def verify(self, password, stored):
+        """
+        Returns (valid, new_hash). new_hash is set when the password was
+        correct but stored used an old KDF and should be replaced.
+        """
+        valid, new_hash = self._run(self._check, password, stored)
+        if new_hash:
+            with self._lock:
+                self.upgraded += 1
+        return valid, new_hash
+
+    def verify_missing(self, password):
+        """
+        Spend the same KDF work as verify() for a username that does not
+        exist, so response times do not reveal which usernames are taken.
+        Always returns (False, None).
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = hash_password(secrets.token_urlsafe(16))
+        self._run(verify_password, password, self._dummy_hash)
+        return False, None
+
+    def hash(self, password):
+        return self._run(hash_password, password)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'upgraded': self.upgraded,
+        }
+
+class RateLimiter:
+    """Token bucket per key: burst attempts at once, refilled at rate per second"""
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return allowed
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = self.burst / self.rate if self.rate else float('inf')
+        self._buckets = {key: value for key, value in self._buckets.items()
+                         if now - value[1] < full_after}
+
+class LoginThrottle:
+    """
+    Admission control for login endpoints, checked before any hashing.
+
+    Every attempt takes a token from the bucket of the username and of the
+    client address; an attempt is refused if either bucket is empty.
+    """
+
+    def __init__(self, user_rate=None, user_burst=None, ip_rate=None, ip_burst=None):
+        self.per_user = RateLimiter(
+            user_rate if user_rate is not None else float(os.getenv('LOGIN_USER_RATE', '0.1')),
+            user_burst if user_burst is not None else int(os.getenv('LOGIN_USER_BURST', '5')))
+        self.per_ip = RateLimiter(
+            ip_rate if ip_rate is not None else float(os.getenv('LOGIN_IP_RATE', '5')),
+            ip_burst if ip_burst is not None else int(os.getenv('LOGIN_IP_BURST', '50')))
+        self.throttled = 0
+
+    def admit(self, username, client_ip):
+        """True if this login attempt may proceed"""
+        # Check the address first so a flood over many usernames stays cheap
+        if self.per_ip.allow(client_ip or '') and self.per_user.allow(username.lower()):
+            return True
+        self.throttled += 1
+        return False
@@ -0,0 +1,119 @@
+import os
+import sys
+import threading
+from types import MappingProxyType
+
+# Add database path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+try:
+    from models import session_scope, Role, RolePermission
+except ImportError:
+    session_scope = None
+    Role = None
+    RolePermission = None
+
+# Every resource an admin route can belong to, one bit each
+RESOURCES = ('roles', 'users', 'products', 'orders', 'faq', 'unanswered')
+RESOURCE_BITS = MappingProxyType({resource: 1 << i for i, resource in enumerate(RESOURCES)})
+
+# Permissions of the built-in roles, seeded into role_permissions when it is empty
+DEFAULT_PERMISSIONS = {
+    'System Admin': ('roles', 'users', 'products', 'orders', 'faq', 'unanswered'),
+    'Application Admin': ('users', 'products', 'orders', 'faq', 'unanswered'),
+    'Product Admin': ('products', 'orders'),
+    'Order Admin': ('orders',),
+}
+
+def resource_mask(resources):
+    """Bitmask for an iterable of resource names; unknown names raise ValueError"""
+    mask = 0
+    for resource in resources:
+        if resource not in RESOURCE_BITS:
+            raise ValueError(f"Unknown resource: {resource}")
+        mask |= RESOURCE_BITS[resource]
+    return mask
+
+def mask_resources(mask):
+    """Resource names contained in a bitmask, in RESOURCES order"""
+    return [resource for resource in RESOURCES if mask & RESOURCE_BITS[resource]]
+
+def compile_permissions(pairs):
+    """Frozen role name -> bitmask mapping from (role_name, resource) pairs"""
+    masks = {}
+    for role_name, resource in pairs:
+        masks[role_name] = masks.get(role_name, 0) | RESOURCE_BITS.get(resource, 0)
+    return MappingProxyType(masks)
+
+class PermissionTable:
+    """
+    Role -> resource permissions compiled into one bitmask per role.
+
+    Checks are a dict lookup and a bitwise AND. The compiled mapping is
+    read-only and replaced as a whole by reload(), so readers never see a
+    half-built table. Without a database the built-in defaults are used.
+    """
+
+    def __init__(self):
+        self._masks = None
+        self._lock = threading.Lock()
+
+    def seed_defaults(self):
+        """Grant the built-in roles their default permissions if role_permissions is empty"""
+        # The table itself comes from migration 0005
+        with session_scope() as session:
+            if session.query(RolePermission).first():
+                return
+            for role in session.query(Role).filter(Role.role_name.in_(DEFAULT_PERMISSIONS)):
+                session.add_all([RolePermission(role_id=role.role_id, resource=resource)
+                                 for resource in DEFAULT_PERMISSIONS[role.role_name]])
+            session.commit()
+
+    def load(self):
+        """Read every role's permissions from the database"""
+        with session_scope() as session:
+            return session.query(Role.role_name, RolePermission.resource).join(
+                RolePermission, RolePermission.role_id == Role.role_id
+            ).all()
+
+    def reload(self, key=None):
+        """
+        Recompile from the database; key is accepted for invalidation bus callbacks.
+
+        If the load fails the previous table stays in force, so a transient
+        database error neither restores revoked default grants nor drops
+        custom roles. The built-in defaults are used only when nothing was
+        loaded yet.
+        """
+        with self._lock:
+            if session_scope and RolePermission:
+                try:
+                    self._masks = compile_permissions(self.load())
+                    return self._masks
+                except Exception as e:
+                    if self._masks is not None:
+                        print(f"Permission load error, keeping the current permissions: {e}")
+                        return self._masks
+                    print(f"Permission load error, using built-in roles: {e}")
+            self._masks = compile_permissions(
+                (role, resource) for role, resources in DEFAULT_PERMISSIONS.items() for resource in resources
+            )
+            return self._masks
+
+    def mask(self, role_name):
+        masks = self._masks
+        if masks is None:
+            masks = self.reload()
+        return masks.get(role_name, 0)
+
+    def allows(self, role_name, resource):
+        masks = self._masks
+        if masks is None:
+            masks = self.reload()
+        return bool(masks.get(role_name, 0) & RESOURCE_BITS.get(resource, 0))
+
+    def resources(self, role_name):
+        return mask_resources(self.mask(role_name))
+
+# Shared by AdminAuth and the API server
+permission_table = PermissionTable()
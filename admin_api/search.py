@@ -0,0 +1,431 @@
+import bisect
+import heapq
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Add database path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+try:
+    from sqlalchemy import func, literal, or_, text
+    from models import session_scope, get_database_url
+except ImportError:
+    func = None
+    session_scope = None
+
+GRAM_SIZE = 3
+# Fuzzy matches need at least this share of the query's trigrams (pg_trgm's default limit)
+SIMILARITY_THRESHOLD = float(os.getenv('SEARCH_SIMILARITY_THRESHOLD', '0.3'))
+# Trigrams present in more than this share of documents (and in more than
+# COMMON_GRAM_MIN of them) are skipped when scoring fuzzy matches
+COMMON_GRAM_SHARE = 0.2
+COMMON_GRAM_MIN = 1000
+
+WORD = re.compile(r'\w+')
+
+def trigrams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+def tokenize(text):
+    return WORD.findall(text.casefold())
+
+class TrigramIndex:
+    """
+    Substring and fuzzy search over short texts such as product names.
+
+    Substring matches come first: exact, then prefix, then shorter texts.
+    Only if nothing contains the query are documents sharing enough of its
+    trigrams returned, by similarity.
+    """
+
+    def __init__(self):
+        self.texts = {}
+        self.grams = {}
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        folded = text.casefold()
+        self.texts[doc_id] = folded
+        for gram in trigrams(f" {folded} "):
+            posting = self.grams.get(gram)
+            if posting is None:
+                posting = self.grams[gram] = set()
+            posting.add(doc_id)
+
+    def remove(self, doc_id):
+        folded = self.texts.pop(doc_id, None)
+        if folded is None:
+            return
+        for gram in trigrams(f" {folded} "):
+            posting = self.grams.get(gram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self.grams[gram]
+
+    def search(self, query, limit=None):
+        """Matching ids, best first; only the first limit are ranked when given"""
+        query = query.casefold().strip()
+        if not query:
+            return []
+        texts = self.texts
+
+        if len(query) < GRAM_SIZE:
+            matches = [doc_id for doc_id, folded in texts.items() if query in folded]
+        else:
+            postings = []
+            for gram in trigrams(query):
+                posting = self.grams.get(gram)
+                if not posting:
+                    postings = None
+                    break
+                postings.append(posting)
+            matches = []
+            if postings:
+                postings.sort(key=len)
+                candidates = postings[0].intersection(*postings[1:])
+                matches = [doc_id for doc_id in candidates if query in texts[doc_id]]
+
+        if matches:
+            def rank(doc_id):
+                folded = texts[doc_id]
+                return (0 if folded == query else 1 if folded.startswith(query) else 2, len(folded), doc_id)
+            if limit is not None and limit < len(matches):
+                return heapq.nsmallest(limit, matches, key=rank)
+            return sorted(matches, key=rank)
+        return self.fuzzy(query, limit)
+
+    def fuzzy(self, query, limit=None):
+        grams = trigrams(f" {query} ")
+        common = max(COMMON_GRAM_MIN, int(len(self.texts) * COMMON_GRAM_SHARE))
+        hits = Counter()
+        for gram in grams:
+            posting = self.grams.get(gram, ())
+            if len(posting) <= common:
+                hits.update(posting)
+
+        # A document can only reach the threshold with this many shared trigrams
+        needed = SIMILARITY_THRESHOLD * len(grams)
+        texts = self.texts
+        scored = []
+        for doc_id, count in hits.items():
+            if count < needed:
+                continue
+            # Shared trigrams over all distinct trigrams, like pg_trgm similarity();
+            # a padded text has about as many trigrams as characters
+            score = count / (len(grams) + len(texts[doc_id]) - count)
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((-score, doc_id))
+        scored = heapq.nsmallest(limit, scored) if limit is not None else sorted(scored)
+        return [doc_id for _, doc_id in scored]
+
+    def __len__(self):
+        return len(self.texts)
+
+class WordIndex:
+    """
+    Full-text search over longer texts such as FAQ answers.
+
+    Every query word must prefix-match a word of the document. Results are
+    ranked by tf-idf, then by id.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+        self._vocabulary = None
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        counts = {}
+        for word in tokenize(text):
+            counts[word] = counts.get(word, 0) + 1
+        self.docs[doc_id] = tuple(counts)
+        for word, count in counts.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = {}
+                self._vocabulary = None
+            posting[doc_id] = count
+
+    def remove(self, doc_id):
+        for word in self.docs.pop(doc_id, ()):
+            posting = self.postings.get(word)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[word]
+                    self._vocabulary = None
+
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        return self._vocabulary
+
+    def expand(self, token):
+        """Indexed words starting with token"""
+        vocabulary = self.vocabulary()
+        start = bisect.bisect_left(vocabulary, token)
+        end = bisect.bisect_left(vocabulary, token + '\U0010ffff')
+        return vocabulary[start:end]
+
+    def search(self, query, limit=None):
+        """Matching ids, best first; only the first limit are ranked when given"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        total = len(self.docs)
+
+        per_token = []
+        for token in dict.fromkeys(tokens):
+            scores = {}
+            for word in self.expand(token):
+                posting = self.postings[word]
+                idf = math.log(1 + total / len(posting))
+                for doc_id, count in posting.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + count * idf
+            if not scores:
+                return []
+            per_token.append(scores)
+
+        per_token.sort(key=len)
+        ranked = []
+        for doc_id, score in per_token[0].items():
+            for scores in per_token[1:]:
+                extra = scores.get(doc_id)
+                if extra is None:
+                    break
+                score += extra
+            else:
+                ranked.append((-score, doc_id))
+        ranked = heapq.nsmallest(limit, ranked) if limit is not None else sorted(ranked)
+        return [doc_id for _, doc_id in ranked]
+
+    def __len__(self):
+        return len(self.docs)
+
+INDEX_TYPES = {'trigram': TrigramIndex, 'text': WordIndex}
+
+class FallbackIndex:
+    """
+    In-process search index for one resource, used when PostgreSQL search is not available.
+
+    Built from the database on first use, kept current row by row from the
+    invalidation bus, and rebuilt in the background for keyless changes and
+    every ttl seconds. Keyless changes start at most one rebuild per
+    min_interval seconds; the action server publishes one after every batch
+    of unanswered questions, and each would otherwise re-read the table.
+    Searches keep using the previous index during a rebuild, and rows
+    changed meanwhile are replayed onto the new one before it is swapped in.
+    """
+
+    def __init__(self, spec, ttl=None, min_interval=None):
+        self.spec = spec
+        self.ttl = ttl if ttl is not None else float(os.getenv('SEARCH_INDEX_TTL', '300'))
+        self.min_interval = (min_interval if min_interval is not None
+                             else float(os.getenv('SEARCH_REBUILD_INTERVAL', '30')))
+        self.index = None
+        self._lock = threading.RLock()
+        self._rebuilding = False
+        # A keyless change arrived that the current index may not contain
+        self._dirty = False
+        self._built_at = None
+        self._thread = None
+        # Builds in progress, and the rows changed since the first of them
+        # started (id -> row, None when deleted), replayed before each swap
+        self._builds = 0
+        self._changes = None
+
+    def text_of(self, row):
+        return ' '.join(value for value in row[1:] if value)
+
+    def rows(self):
+        """Every (id, *text) row, streamed"""
+        with session_scope() as session:
+            query = session.query(self.spec['id'], *self.spec['text']).execution_options(stream_results=True)
+            yield from query.yield_per(10000)
+
+    def fetch(self, doc_id):
+        """The (id, *text) row of doc_id, or None if it was deleted"""
+        with session_scope() as session:
+            return session.query(self.spec['id'], *self.spec['text']).filter(self.spec['id'] == doc_id).first()
+
+    def apply(self, index, doc_id, row):
+        if row is None:
+            index.remove(doc_id)
+        else:
+            index.add(doc_id, self.text_of(row))
+
+    def build(self):
+        # Keyless changes made after this point are picked up by the next rebuild;
+        # keyed ones are recorded by on_change and replayed below
+        self._built_at = time.monotonic()
+        with self._lock:
+            if not self._builds:
+                self._changes = {}
+            self._builds += 1
+        try:
+            index = INDEX_TYPES[self.spec['kind']]()
+            for row in self.rows():
+                index.add(row[0], self.text_of(row))
+            with self._lock:
+                # The stream may have read a row before it changed
+                for doc_id, row in self._changes.items():
+                    self.apply(index, doc_id, row)
+                self.index = index
+            return index
+        finally:
+            with self._lock:
+                self._builds -= 1
+                if not self._builds:
+                    self._changes = None
+
+    def get(self):
+        index = self.index
+        if index is None:
+            with self._lock:
+                index = self.index or self.build()
+        return index
+
+    def rebuild_later(self):
+        """
+        Rebuild in a background thread, no sooner than min_interval seconds
+        after the previous build. Changes arriving while the worker waits or
+        builds are folded into its next rebuild.
+        """
+        with self._lock:
+            self._dirty = True
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            while True:
+                if self._built_at is not None:
+                    wait = self._built_at + self.min_interval - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                with self._lock:
+                    if not self._dirty:
+                        self._rebuilding = False
+                        return
+                    self._dirty = False
+                try:
+                    self.build()
+                except Exception as e:
+                    print(f"Search index rebuild failed for {self.spec['topic']}: {e}")
+
+        threading.Thread(target=run, name=f"search-index-{self.spec['topic']}", daemon=True).start()
+
+    def on_change(self, key):
+        """Invalidation bus callback: update one row, or rebuild for a keyless change"""
+        if self.index is None:
+            return
+        if key is None:
+            self.rebuild_later()
+            return
+        doc_id = int(key)
+        row = self.fetch(doc_id)
+        with self._lock:
+            self.apply(self.index, doc_id, row)
+            if self._changes is not None:
+                self._changes[doc_id] = row
+
+    def search(self, query, limit=None):
+        index = self.get()
+        with self._lock:
+            return index.search(query, limit)
+
+    def start(self):
+        """Build in the background now and refresh every ttl seconds"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"search-refresh-{self.spec['topic']}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.build()
+            except Exception as e:
+                print(f"Search index build failed for {self.spec['topic']}: {e}")
+            time.sleep(self.ttl)
+
+def prefix_tsquery(query):
+    """to_tsquery text requiring every word as a prefix, e.g. 'ship & track:*'"""
+    return ' & '.join(f"{token}:*" for token in tokenize(query))
+
+def postgres_match(spec, query):
+    """(condition, rank) expressions searching spec's columns in PostgreSQL"""
+    columns = spec['text']
+    if spec['kind'] == 'trigram':
+        # lower() matches the trigram indexes, which also serve the list filters
+        column = func.lower(columns[0])
+        query = query.lower()
+        condition = or_(column.contains(query, autoescape=True), column.op('%')(query))
+        return condition, func.similarity(column, query)
+
+    document = columns[0]
+    for column in columns[1:]:
+        document = document.op('||')(literal(' ')).op('||')(column)
+    vector = func.to_tsvector(literal('simple'), document)
+    ts_query = func.to_tsquery(literal('simple'), prefix_tsquery(query))
+    return vector.op('@@')(ts_query), func.ts_rank(vector, ts_query)
+
+class SearchService:
+    """
+    Chooses the search backend and owns the in-process fallback indexes.
+
+    SEARCH_BACKEND selects 'postgres' or 'memory'; by default PostgreSQL
+    search is used when the database is PostgreSQL with pg_trgm installed.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.indexes = {}
+
+    def setup(self, specs, bus=None):
+        """Pick the backend; for the fallback, start building an index per spec"""
+        backend = os.getenv('SEARCH_BACKEND', 'auto').lower()
+        if backend == 'auto':
+            backend = 'postgres' if self.postgres_available() else 'memory'
+        self.backend = backend
+
+        if backend == 'memory':
+            for spec in specs:
+                index = self.indexes[spec['topic']] = FallbackIndex(spec)
+                if bus is not None:
+                    bus.subscribe(spec['topic'], index.on_change)
+                index.start()
+        return backend
+
+    def postgres_available(self):
+        """True if the search indexes of migration 0003 can be used"""
+        if not session_scope or not get_database_url().startswith('postgresql'):
+            return False
+        try:
+            with session_scope() as session:
+                installed = session.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+        except Exception as e:
+            print(f"Search backend check failed: {e}")
+            return False
+        if not installed:
+            print("pg_trgm is not installed (run database/migrations.py), using in-process search")
+        return bool(installed)
+
+    def uses_database(self):
+        return self.backend == 'postgres'
+
+    def ranked_ids(self, spec, query, limit=None):
+        index = self.indexes.get(spec['topic'])
+        if index is None:
+            index = self.indexes[spec['topic']] = FallbackIndex(spec)
+        return index.search(query, limit)
+
+# Shared by the managers and the API server
+search_service = SearchService()
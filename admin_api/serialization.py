@@ -0,0 +1,130 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+class RowSet:
+    """
+    Query rows kept as tuples plus their field names.
+
+    Managers return this instead of building a dict per row. The serializer
+    writes it as a list of objects, or list endpoints can send fields and
+    rows as-is (?shape=columns). Iterating or indexing yields dicts, for
+    Python callers that want them.
+    """
+
+    __slots__ = ('fields', 'rows')
+
+    def __init__(self, fields, rows):
+        self.fields = tuple(fields)
+        self.rows = rows
+
+    def to_dicts(self):
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in self.rows]
+
+    def column(self, name):
+        index = self.fields.index(name)
+        return [row[index] for row in self.rows]
+
+    def __iter__(self):
+        fields = self.fields
+        return (dict(zip(fields, row)) for row in self.rows)
+
+    def __getitem__(self, index):
+        return dict(zip(self.fields, self.rows[index]))
+
+    def __len__(self):
+        return len(self.rows)
+
+def json_default(obj):
+    """Types the JSON encoders do not handle themselves"""
+    if isinstance(obj, RowSet):
+        return obj.to_dicts()
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)) or hasattr(obj, '_fields'):
+        # Sets and SQLAlchemy Row objects
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj):
+    """Serialize to compact UTF-8 JSON bytes; uses orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=json_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+def choose_encoding(accept_encoding):
+    """Best content coding the client accepts: 'br', 'gzip' or None"""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+def compress_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+def compress_response(response, accept_encoding):
+    """
+    Compress a JSON, NDJSON or CSV response if the client accepts it.
+
+    Buffered bodies are only compressed from COMPRESS_MIN_SIZE bytes on;
+    streamed exports are always compressed, chunk by chunk.
+    """
+    if (response.status_code != 200 or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return response
+        if encoding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(body, COMPRESS_LEVEL)
+        response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
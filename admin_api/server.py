@@ -1,16 +1,60 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
+from flask.json.provider import DefaultJSONProvider
+import csv
+import io
+import json
+import os
+import zlib
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from auth import (AdminAuth, ProductManager, OrderManager, UserManager, 
-                 FAQManager, UnansweredQuestionManager, RoleManager)
+                 FAQManager, UnansweredQuestionManager, RoleManager, table_versions, password_verifier)
+from invalidation import get_invalidation_bus, PostgresInvalidationBus
+from metrics import (CONTENT_TYPE, MetricsAccess, RequestMetrics, default_registry, metrics_enabled,
+                     pool_collector, stats_collector)
+from passwords import LoginThrottle, PasswordVerifierBusy
+from profiling import (QueryBudgetExceeded, active_profile, finish_profile, load_budgets, profile_mode,
+                       start_profile)
+from permissions import permission_table, resource_mask, RESOURCES, RESOURCE_BITS
+from search import search_service
+from serialization import compress_response, dumps, json_default
+from sessions import create_session_store, start_sweeper
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider behind jsonify(), using orjson when it is installed"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', json_default)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
-# Simple session storage
-active_sessions = {}
+# Number of reverse proxies in front of the API. When set, request.remote_addr
+# (the per-IP login throttle key) is taken from that many X-Forwarded-For
+# entries instead of the socket peer, which would be the proxy for everyone.
+# Leave at 0 when clients connect directly, or they could spoof the header.
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES,
+                            x_host=TRUSTED_PROXIES)
+
+# Session storage shared by all workers when SESSION_STORE=sql
+session_store = create_session_store()
+start_sweeper(session_store)
 
 # Create instances of our managers
 auth = AdminAuth()
+login_throttle = LoginThrottle()
 product_manager = ProductManager()
 order_manager = OrderManager()
 user_manager = UserManager()
@@ -18,15 +62,333 @@ faq_manager = FAQManager()
 unanswered_manager = UnansweredQuestionManager()
 role_manager = RoleManager()
 
+# Conditional and delta list responses, only with the PostgreSQL bus. The
+# versions live in each process, so with the in-process bus a worker would
+# never see changes made through the other workers or the action server and
+# keep answering 304 for stale lists. With the PostgreSQL bus every change
+# reaches every worker, on top of the direct bumps of this process' own writes.
+bus = get_invalidation_bus()
+cross_process = isinstance(bus, PostgresInvalidationBus)
+if cross_process:
+    for manager in (product_manager, order_manager, user_manager, faq_manager,
+                    unanswered_manager, role_manager):
+        table_versions.track(manager.topic)
+        bus.subscribe(manager.topic, lambda key, topic=manager.topic: table_versions.bump(topic, key))
+
+# Compile role permissions now and again whenever roles change
+try:
+    permission_table.seed_defaults()
+except Exception as e:
+    print(f"Default permission seeding error: {e}")
+permission_table.reload()
+bus.subscribe('roles', permission_table.reload)
+
+# Ranked ?q= search: the PostgreSQL trigram/full-text indexes of migration 0003,
+# otherwise in-process indexes updated through the bus and rebuilt every
+# SEARCH_INDEX_TTL seconds (which also picks up the action server's writes)
+try:
+    search_service.setup([manager.search_spec() for manager in
+                          (product_manager, faq_manager, unanswered_manager)], bus)
+except Exception as e:
+    print(f"Search setup error: {e}")
+
+# Per-route latency, in-flight requests and errors, plus pool and password
+# verifier figures, rendered on /metrics. Each worker process reports its own.
+METRICS_ENABLED = metrics_enabled()
+# Per-route traffic and errors are not for everyone who can reach the API port
+metrics_access = MetricsAccess()
+http_metrics = RequestMetrics(default_registry, 'http_requests', 'admin API requests', ('method', 'route'))
+default_registry.add_collector(pool_collector)
+default_registry.add_collector(stats_collector('password_verifier', password_verifier.stats))
+
+@app.before_request
+def start_request_metrics():
+    """Registered before authenticate() so rejected requests are measured too"""
+    if METRICS_ENABLED:
+        g.metrics_started = http_metrics.start()
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """Runs even when the view raised; routes are labelled by their URL rule, not the raw path"""
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    rule = request.url_rule
+    status = g.pop('metrics_status', 500)
+    if exc is not None:
+        error = type(exc).__name__
+    else:
+        error = f'HTTP {status}' if status >= 500 else None
+    http_metrics.finish(started, (request.method, rule.rule if rule else 'unmatched'), status, error)
+
+# Statements per request, checked against these budgets (overridable with
+# QUERY_BUDGETS=endpoint=n,...) and for N+1 repeats when QUERY_PROFILE is on.
+# Budgets include the session lookup when SESSION_STORE=sql.
+PROFILE_QUERIES = profile_mode() != 'off'
+LIST_QUERY_BUDGET = 3  # page, total count, session
+QUERY_BUDGETS = load_budgets(dict(
+    {endpoint: LIST_QUERY_BUDGET for endpoint in ('get_products', 'get_orders', 'get_users', 'get_faq',
+                                                  'get_unanswered', 'get_unanswered_clusters', 'get_roles')},
+    global_search=6,
+    login=4,
+    user_login=4,
+))
+
+@app.before_request
+def start_query_profile():
+    if PROFILE_QUERIES:
+        g.query_profile = start_profile(request.endpoint or 'unmatched', QUERY_BUDGETS.get(request.endpoint))
+
+@app.teardown_request
+def drop_query_profile(exc):
+    """Stop profiling if the request ended before check_query_profile() ran"""
+    state = g.pop('query_profile', None)
+    if state is not None:
+        active_profile.reset(state[1])
+
 def check_user_session(token):
     """Check if user session is valid"""
-    if token in active_sessions:
-        return active_sessions[token]
+    return session_store.get(token)
+
+# endpoint name -> resource bit, filled in once every route is registered
+endpoint_permissions = {}
+
+def compile_endpoint_permissions():
+    """Map each /api/<resource>/... endpoint to the bit of its resource"""
+    table = {}
+    for rule in app.url_map.iter_rules():
+        parts = rule.rule.split('/')
+        if len(parts) > 2 and parts[1] == 'api' and parts[2] in RESOURCE_BITS:
+            table[rule.endpoint] = RESOURCE_BITS[parts[2]]
+    return table
+
+@app.before_request
+def authenticate():
+    """
+    Session and permission check for every admin resource route.
+
+    Routes outside the admin resources (login, logout, end-user login) and
+    CORS preflight requests pass through untouched. Otherwise the session
+    is resolved once and stored in g.user.
+    """
+    # Resolve the request proxy once; this runs on every API call
+    req = request._get_current_object()
+    bit = endpoint_permissions.get(req.endpoint)
+    if not bit or req.method == 'OPTIONS':
+        return None
+
+    token = req.headers.get('Authorization', '').replace('Bearer ', '')
+    user = check_user_session(token)
+
+    if not user:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    if not permission_table.mask(user['role']) & bit:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+
+    g.user = user
     return None
 
-def check_user_access(user_role, resource):
-    """Check if user has access to resource"""
-    return auth.check_access(user_role, resource)
+@app.after_request
+def compress(response):
+    """gzip / brotli compression negotiated from Accept-Encoding"""
+    return compress_response(response, request.accept_encodings)
+
+@app.after_request
+def check_query_profile(response):
+    """Registered after compress() so it runs first and an enforce mode error replaces the response"""
+    state = g.pop('query_profile', None)
+    if state is None:
+        return response
+    try:
+        finish_profile(state)
+    except QueryBudgetExceeded as e:
+        response = jsonify({'success': False, 'message': str(e)})
+        response.status_code = 500
+    return response
+
+def list_response(manager):
+    """
+    List endpoint response with keyset pagination, projection and filters.
+
+    Query parameters: after=<id>, limit=<n>, fields=a,b,c, total=true,
+    shape=columns; any other parameter is passed to the manager as a filter.
+    shape=columns sends 'fields' once and each row in 'data' as an array.
+
+    q=<text> on a searchable resource returns ranked matches instead, paged
+    with offset=<n> / 'next_offset'; on other resources q is a plain filter.
+
+    For versioned resources every response carries 'version' and an ETag;
+    If-None-Match answers 304 without a database query. since=<version>
+    returns only rows changed after that version ('full': false), or a
+    normal first page ('full': true) when the changes are no longer known.
+    """
+    args = request.args.to_dict()
+    since = args.pop('since', None)
+    columns_shape = args.pop('shape', 'objects') == 'columns'
+    topic = manager.topic
+    tracked = table_versions.is_tracked(topic)
+
+    if tracked:
+        # Read the version before querying so a concurrent change is sent again next time
+        version = table_versions.token(topic)
+        etag = f"{topic}-{version}-{zlib.crc32(request.query_string):08x}"
+        # Weak, because compressed and uncompressed bodies share the tag
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+    searching = 'q' in args and hasattr(manager, 'search')
+    changed = table_versions.changes_since(topic, since) if tracked and since and not searching else None
+    if searching:
+        since = None
+        result = manager.search(
+            args.pop('q'),
+            offset=args.pop('offset', None),
+            limit=args.pop('limit', None),
+            fields=args.pop('fields', None),
+            filters=args
+        )
+    elif changed is not None:
+        for name in ('after', 'limit', 'total'):
+            args.pop(name, None)
+        result = manager.get_changes(changed, fields=args.pop('fields', None), filters=args)
+        result['full'] = False
+    else:
+        result = manager.get_page(
+            after=args.pop('after', None),
+            limit=args.pop('limit', None),
+            fields=args.pop('fields', None),
+            with_total=args.pop('total', '').lower() in ('1', 'true', 'yes'),
+            filters=args
+        )
+        if since:
+            result['full'] = True
+
+    if not result['success']:
+        return jsonify(result), 400
+
+    if columns_shape and hasattr(result['data'], 'rows'):
+        result['fields'] = result['data'].fields
+        result['data'] = result['data'].rows
+
+    if not tracked:
+        return jsonify(result)
+
+    result['version'] = version
+    response = jsonify(result)
+    response.set_etag(etag, weak=True)
+    # Browsers revalidate with If-None-Match instead of reusing the copy blindly
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '100000'))
+
+def bulk_response(manager):
+    """
+    Apply a bulk operation (?op=create|update|upsert|delete).
+
+    The body is a JSON array of items, {"operation": ..., "items": [...]},
+    or NDJSON (Content-Type: application/x-ndjson) with one item per line.
+    """
+    operation = request.args.get('op')
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            items = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        else:
+            data = request.get_json()
+            if isinstance(data, dict):
+                operation = operation or data.get('operation')
+                data = data.get('items')
+            items = data
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Invalid body: {str(e)}'}), 400
+
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({'success': False, 'message': 'Expected a list of item objects'}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({'success': False, 'message': f'At most {BULK_MAX_ITEMS} items per request'}), 413
+
+    result = manager.bulk(operation or 'create', items)
+    return jsonify(result), 200 if result['success'] else 400
+
+def export_response(manager, name):
+    """
+    Stream a manager's rows as NDJSON (default) or CSV (?format=csv).
+
+    Accepts the same fields= and filter parameters as the list endpoint.
+    Rows are written one at a time as they come off the database cursor.
+    """
+    args = request.args.to_dict()
+    fmt = args.pop('format', 'ndjson').lower()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'message': 'format must be ndjson or csv'}), 400
+
+    result = manager.export(fields=args.pop('fields', None), filters=args)
+    if not result['success']:
+        return jsonify(result), 400
+
+    fields, rows = result['fields'], result['rows']
+
+    def generate_ndjson():
+        for row in rows:
+            yield dumps(dict(zip(fields, row))) + b'\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        # Header only when there are no rows
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    if fmt == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{name}.{fmt}"'
+    })
+
+def password_busy_response():
+    """503 for a request turned away by the saturated password verifier pool"""
+    return jsonify({'success': False, 'message': 'Server busy, try again shortly'}), 503, {'Retry-After': '1'}
+
+def verify_login(username, password, **kwargs):
+    """
+    Admission control and password check shared by both login endpoints.
+
+    Returns (user_info, error_response); exactly one of them is None.
+    """
+    if not login_throttle.admit(username, request.remote_addr):
+        return None, (jsonify({'success': False, 'message': 'Too many login attempts, try again later'}),
+                      429, {'Retry-After': '10'})
+    try:
+        user_info = auth.verify_user(username, password, **kwargs)
+    except PasswordVerifierBusy:
+        return None, password_busy_response()
+    if not user_info:
+        return None, (jsonify({'success': False, 'message': 'Invalid credentials'}), 401)
+    return user_info, None
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of this worker process, for METRICS_ALLOW addresses or METRICS_TOKEN"""
+    if not metrics_access.allows(request.remote_addr, request.headers.get('Authorization')):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    return Response(default_registry.render(), content_type=CONTENT_TYPE)
 
 # Authentication endpoints
 @app.route('/api/login', methods=['POST'])
@@ -39,54 +401,32 @@ def login():
     if not username or not password:
         return jsonify({'success': False, 'message': 'Username and password required'}), 400
 
-    user_info = auth.verify_admin_user(username, password)
+    user_info, error = verify_login(username, password, admin_only=True)
+    if error:
+        return error
 
-    if user_info:
-        session_token = f"{username}_{hash(password)}_{len(active_sessions)}"
-        active_sessions[session_token] = user_info
+    session_token = session_store.create(user_info)
 
-        return jsonify({
-            'success': True,
-            'token': session_token,
-            'user': user_info
-        })
-    else:
-        return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+    return jsonify({
+        'success': True,
+        'token': session_token,
+        'user': dict(user_info, permissions=permission_table.resources(user_info['role']))
+    })
 
 @app.route('/api/logout', methods=['POST'])
 def logout():
     """Admin logout endpoint"""
     token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if token in active_sessions:
-        del active_sessions[token]
+    session_store.delete(token)
     return jsonify({'success': True})
 
 # Product endpoints
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'products'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
-    products = product_manager.get_all()
-    return jsonify({'success': True, 'data': products})
+    return list_response(product_manager)
 
 @app.route('/api/products', methods=['POST'])
 def create_product():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'products'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
     result = product_manager.create(
         data.get('name', ''),
@@ -96,17 +436,12 @@ def create_product():
     )
     return jsonify(result)
 
+@app.route('/api/products/bulk', methods=['POST'])
+def bulk_products():
+    return bulk_response(product_manager)
+
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'products'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
     result = product_manager.update(
         product_id,
@@ -119,44 +454,20 @@ def update_product(product_id):
 
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'products'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     result = product_manager.delete(product_id)
     return jsonify(result)
 
 # Order endpoints
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'orders'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
-    orders = order_manager.get_all()
-    return jsonify({'success': True, 'data': orders})
+    return list_response(order_manager)
+
+@app.route('/api/orders/export', methods=['GET'])
+def export_orders():
+    return export_response(order_manager, 'orders')
 
 @app.route('/api/orders', methods=['POST'])
 def create_order():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'orders'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
     result = order_manager.create(
         int(data.get('user_id', 0)),
@@ -166,17 +477,12 @@ def create_order():
     )
     return jsonify(result)
 
+@app.route('/api/orders/bulk', methods=['POST'])
+def bulk_orders():
+    return bulk_response(order_manager)
+
 @app.route('/api/orders/<int:order_id>', methods=['PUT'])
 def update_order(order_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'orders'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
     result = order_manager.update(
         order_id,
@@ -187,112 +493,53 @@ def update_order(order_id):
 
 @app.route('/api/orders/<int:order_id>', methods=['DELETE'])
 def delete_order(order_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'orders'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     result = order_manager.delete(order_id)
     return jsonify(result)
 
 # User endpoints
 @app.route('/api/users', methods=['GET'])
 def get_users():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'users'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
-    users = user_manager.get_all()
-    return jsonify({'success': True, 'data': users})
+    return list_response(user_manager)
 
 @app.route('/api/users', methods=['POST'])
 def create_user():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'users'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
-    result = user_manager.create(
-        data.get('username', ''),
-        data.get('password', ''),
-        data.get('role_name', '')
-    )
+    try:
+        result = user_manager.create(
+            data.get('username', ''),
+            data.get('password', ''),
+            data.get('role_name', '')
+        )
+    except PasswordVerifierBusy:
+        return password_busy_response()
     return jsonify(result)
 
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'users'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
-    result = user_manager.update(
-        user_id,
-        data.get('username'),
-        data.get('password'),
-        data.get('role_name')
-    )
+    try:
+        result = user_manager.update(
+            user_id,
+            data.get('username'),
+            data.get('password'),
+            data.get('role_name')
+        )
+    except PasswordVerifierBusy:
+        return password_busy_response()
     return jsonify(result)
 
 @app.route('/api/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'users'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     result = user_manager.delete(user_id)
     return jsonify(result)
 
 # FAQ endpoints
 @app.route('/api/faq', methods=['GET'])
 def get_faq():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'faq'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
-    faqs = faq_manager.get_all()
-    return jsonify({'success': True, 'data': faqs})
+    return list_response(faq_manager)
 
 @app.route('/api/faq', methods=['POST'])
 def create_faq():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'faq'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
     result = faq_manager.create(
         data.get('question', ''),
@@ -302,15 +549,6 @@ def create_faq():
 
 @app.route('/api/faq/<int:faq_id>', methods=['PUT'])
 def update_faq(faq_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'faq'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
     result = faq_manager.update(
         faq_id,
@@ -321,106 +559,116 @@ def update_faq(faq_id):
 
 @app.route('/api/faq/<int:faq_id>', methods=['DELETE'])
 def delete_faq(faq_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'faq'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     result = faq_manager.delete(faq_id)
     return jsonify(result)
 
 # Unanswered Questions endpoints
 @app.route('/api/unanswered', methods=['GET'])
 def get_unanswered():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'unanswered'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
-    questions = unanswered_manager.get_all()
-    return jsonify({'success': True, 'data': questions})
+    return list_response(unanswered_manager)
+
+@app.route('/api/unanswered/export', methods=['GET'])
+def export_unanswered():
+    return export_response(unanswered_manager, 'unanswered_questions')
+
+@app.route('/api/unanswered/clusters', methods=['GET'])
+def get_unanswered_clusters():
+    """
+    Unanswered question clusters ranked by frequency, for triage.
+
+    Query parameters: offset=<n>, limit=<n>, fields=a,b,c, shape=columns;
+    other parameters are filters as for /api/unanswered (e.g. status=new).
+    """
+    args = request.args.to_dict()
+    columns_shape = args.pop('shape', 'objects') == 'columns'
+    result = unanswered_manager.get_clusters(
+        offset=args.pop('offset', None),
+        limit=args.pop('limit', None),
+        fields=args.pop('fields', None),
+        filters=args
+    )
+    if not result['success']:
+        return jsonify(result), 400
+    if columns_shape:
+        result['fields'] = result['data'].fields
+        result['data'] = result['data'].rows
+    return jsonify(result)
 
 @app.route('/api/unanswered/<int:uq_id>', methods=['PUT'])
 def update_unanswered(uq_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'unanswered'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
     result = unanswered_manager.update(uq_id, data.get('status'))
     return jsonify(result)
 
 @app.route('/api/unanswered/<int:uq_id>', methods=['DELETE'])
 def delete_unanswered(uq_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'unanswered'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     result = unanswered_manager.delete(uq_id)
     return jsonify(result)
 
 # Role endpoints (System Admin only)
 @app.route('/api/roles', methods=['GET'])
 def get_roles():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'roles'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
-    roles = role_manager.get_all()
-    return jsonify({'success': True, 'data': roles})
+    return list_response(role_manager)
 
 @app.route('/api/roles', methods=['POST'])
 def create_role():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'roles'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     data = request.get_json()
-    result = role_manager.create(data.get('role_name', ''))
+    result = role_manager.create(data.get('role_name', ''), data.get('permissions') or [])
+    return jsonify(result)
+
+@app.route('/api/roles/<int:role_id>/permissions', methods=['PUT'])
+def update_role_permissions(role_id):
+    data = request.get_json()
+    result = role_manager.set_permissions(role_id, data.get('permissions') or [])
     return jsonify(result)
 
 @app.route('/api/roles/<int:role_id>', methods=['DELETE'])
 def delete_role(role_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = check_user_session(token)
-    
-    if not user:
-        return jsonify({'success': False, 'message': 'Authentication required'}), 401
-    
-    if not check_user_access(user['role'], 'roles'):
-        return jsonify({'success': False, 'message': 'Access denied'}), 403
-    
     result = role_manager.delete(role_id)
     return jsonify(result)
 
+# Resources covered by /api/search; products, FAQs and unanswered questions are ranked
+SEARCH_MANAGERS = {
+    'products': product_manager,
+    'orders': order_manager,
+    'users': user_manager,
+    'faq': faq_manager,
+    'unanswered': unanswered_manager
+}
+SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', '5'))
+
+@app.route('/api/search', methods=['GET'])
+def global_search():
+    """
+    Search every resource the user may see.
+
+    Query parameters: q=<text>, limit=<results per resource>,
+    resources=products,faq (default: all). Resources the user's role
+    cannot access are left out of 'results'.
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'success': False, 'message': 'q is required'}), 400
+    limit = request.args.get('limit', SEARCH_DEFAULT_LIMIT)
+    wanted = [r.strip() for r in request.args.get('resources', '').split(',') if r.strip()] or list(SEARCH_MANAGERS)
+    unknown = [r for r in wanted if r not in SEARCH_MANAGERS]
+    if unknown:
+        return jsonify({'success': False, 'message': f'Unknown resource: {", ".join(unknown)}'}), 400
+
+    results = {}
+    for resource in wanted:
+        if not permission_table.allows(g.user['role'], resource):
+            continue
+        manager = SEARCH_MANAGERS[resource]
+        if hasattr(manager, 'search'):
+            result = manager.search(q, limit=limit)
+        else:
+            result = manager.get_page(limit=limit, filters={'q': q})
+        if not result['success']:
+            return jsonify(result), 400
+        results[resource] = result['data']
+    return jsonify({'success': True, 'q': q, 'results': results})
+
 @app.route('/api/user/login', methods=['POST'])
 def user_login():
     """Regular user login endpoint"""
@@ -432,14 +680,16 @@ def user_login():
         return jsonify({'success': False, 'message': 'Username and password required'}), 400
     
     # Use existing auth but check for End User role
-    user_info = auth.verify_user(username, password, allowed_roles=['End User'])
-    
-    if user_info:
-        session_token = f"user_{username}_{hash(password)}_{len(active_sessions)}"
-        active_sessions[session_token] = user_info
-        return jsonify({'success': True, 'token': session_token, 'user': user_info})
-    else:
-        return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+    user_info, error = verify_login(username, password, allowed_roles=['End User'])
+    if error:
+        return error
+
+    session_token = session_store.create(user_info)
+    return jsonify({'success': True, 'token': session_token, 'user': user_info})
+
+endpoint_permissions.update(compile_endpoint_permissions())
+# Any admin resource grants search; results are filtered per resource
+endpoint_permissions['global_search'] = resource_mask(RESOURCES)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,158 @@
+import heapq
+import os
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add database path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+try:
+    from models import session_scope, AdminSession
+except ImportError:
+    session_scope = None
+    AdminSession = None
+
+def new_token():
+    """Random, unguessable session token"""
+    return secrets.token_urlsafe(32)
+
+class MemorySessionStore:
+    """
+    Session store kept in this process.
+
+    Tokens are looked up in a dict. Expiry times are also kept in a heap so
+    sweep() only touches sessions that have actually expired. Only suitable
+    for a single worker; use SQLSessionStore when running several.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or int(os.getenv('SESSION_TTL', '28800'))
+        self._sessions = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def create(self, user_info):
+        token = new_token()
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._sessions[token] = (dict(user_info), expires_at)
+            heapq.heappush(self._expiry, (expires_at, token))
+        return token
+
+    def get(self, token):
+        entry = self._sessions.get(token)
+        if entry is None:
+            return None
+        user_info, expires_at = entry
+        if expires_at < time.time():
+            self.delete(token)
+            return None
+        return user_info
+
+    def delete(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def sweep(self):
+        """Remove expired sessions; returns how many were removed"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] < now:
+                expires_at, token = heapq.heappop(self._expiry)
+                entry = self._sessions.get(token)
+                # Skip heap entries for sessions already logged out
+                if entry is not None and entry[1] == expires_at:
+                    del self._sessions[token]
+                    removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._sessions)
+
+class SQLSessionStore:
+    """
+    Session store in the admin_sessions table, shared by every worker.
+
+    Validation is a primary-key lookup on the token. The table comes from
+    migration 0005.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or int(os.getenv('SESSION_TTL', '28800'))
+
+    def create(self, user_info):
+        token = new_token()
+        with session_scope() as session:
+            session.add(AdminSession(
+                token=token,
+                user_id=user_info['user_id'],
+                username=user_info['username'],
+                role=user_info['role'],
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl)
+            ))
+            session.commit()
+        return token
+
+    def get(self, token):
+        if not token:
+            return None
+        with session_scope() as session:
+            row = session.get(AdminSession, token)
+            if row is None or row.expires_at < datetime.utcnow():
+                return None
+            return {
+                'user_id': row.user_id,
+                'username': row.username,
+                'role': row.role
+            }
+
+    def delete(self, token):
+        with session_scope() as session:
+            session.query(AdminSession).filter(AdminSession.token == token).delete()
+            session.commit()
+
+    def sweep(self):
+        with session_scope() as session:
+            removed = session.query(AdminSession).filter(
+                AdminSession.expires_at < datetime.utcnow()
+            ).delete(synchronize_session=False)
+            session.commit()
+            return removed
+
+    def __len__(self):
+        with session_scope() as session:
+            return session.query(AdminSession).count()
+
+def create_session_store():
+    """
+    Build the store selected by SESSION_STORE ('memory' or 'sql').
+
+    Use 'sql' when running more than one API worker so every worker sees
+    the same sessions.
+    """
+    kind = os.getenv('SESSION_STORE', 'memory').lower()
+    if kind == 'sql':
+        if not session_scope or not AdminSession:
+            raise RuntimeError('SESSION_STORE=sql requires the database')
+        return SQLSessionStore()
+    return MemorySessionStore()
+
+def start_sweeper(store, interval=None):
+    """Periodically remove expired sessions in a background thread"""
+    interval = interval or float(os.getenv('SESSION_SWEEP_INTERVAL', '300'))
+
+    def sweep_forever():
+        while True:
+            time.sleep(interval)
+            try:
+                store.sweep()
+            except Exception as e:
+                print(f"Session sweep error: {e}")
+
+    thread = threading.Thread(target=sweep_forever, name='session-sweeper', daemon=True)
+    thread.start()
+    return thread
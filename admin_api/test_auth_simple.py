@@ -15,7 +15,7 @@ def test_basic_functionality():
     # Test password hashing
     password = "test123"
     hashed = auth.hash_password(password)
-    print(f"Password hashing works: {len(hashed) == 64}")  # SHA-256 produces 64 chars
+    print(f"Password hashing works: {auth.verifier.verify(password, hashed)[0]}")
     
     # Test admin login (using credentials from setup.py)
     user_info = auth.verify_admin_user("product_admin", "admin123")
@@ -18,16 +18,16 @@ class TestAdminAuth(unittest.TestCase):
         password = "test123"
         hashed = self.auth.hash_password(password)
         
-        # SHA-256 hash should be 64 characters long
-        self.assertEqual(len(hashed), 64)
+        # Hashes are salted KDF output, never the plain password
+        self.assertNotIn(password, hashed)
         
-        # Same password should produce same hash
+        # Same password hashes differently each time but still verifies
         hashed2 = self.auth.hash_password(password)
-        self.assertEqual(hashed, hashed2)
+        self.assertNotEqual(hashed, hashed2)
+        self.assertEqual(self.auth.verifier.verify(password, hashed2), (True, None))
         
-        # Different passwords should produce different hashes
-        different_hash = self.auth.hash_password("different123")
-        self.assertNotEqual(hashed, different_hash)
+        # Different passwords should not verify
+        self.assertFalse(self.auth.verifier.verify("different123", hashed)[0])
     
     def test_valid_admin_login(self):
         """Test valid admin user login"""
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+try:
+    import flask  # noqa: F401
+    from models import Role, get_engine
+    from migrations import MigrationRunner
+    from seed import seed_database
+except ImportError:
+    get_engine = None
+
+@unittest.skipIf(get_engine is None, 'Flask or SQLAlchemy is not installed')
+class TestListVersions(unittest.TestCase):
+    """ETags of list endpoints against a seeded SQLite database"""
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        cls.previous_url = os.environ.get('DATABASE_URL')
+        os.environ['DATABASE_URL'] = f"sqlite:///{cls.path}"
+        cls.engine = get_engine()
+        MigrationRunner(cls.engine).upgrade()
+        with cls.engine.begin() as conn:
+            conn.execute(Role.__table__.insert(), [{'role_name': 'End User'}, {'role_name': 'System Admin'}])
+        seed_database({'users': 5, 'products': 5, 'orders': 20, 'unanswered': 0, 'faqs': 0},
+                      seed=3, engine=cls.engine)
+
+        # Imported here so the server's setup runs against the temporary database
+        import server
+        cls.server = server
+        server.permission_table.seed_defaults()
+        server.permission_table.reload()
+        cls.client = server.app.test_client()
+        token = server.session_store.create({'user_id': 1, 'username': 'admin', 'role': 'System Admin'})
+        cls.headers = {'Authorization': f'Bearer {token}'}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        if cls.previous_url is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = cls.previous_url
+        os.remove(cls.path)
+
+    def test_in_process_bus_sends_no_etag(self):
+        """Without the PostgreSQL bus other workers' writes are unseen, so lists are never cached"""
+        self.assertFalse(self.server.cross_process)
+        response = self.client.get('/api/products', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response.headers)
+        self.assertNotIn('version', response.get_json())
+
+    def test_bulk_create_changes_the_orders_etag(self):
+        """Orders created in bulk are not hidden behind a 304 for the old ETag"""
+        # As with the PostgreSQL bus, where every worker tracks the topics
+        self.server.table_versions.track('orders')
+        first = self.client.get('/api/orders', headers=self.headers)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+        cached = self.client.get('/api/orders', headers=dict(self.headers, **{'If-None-Match': etag}))
+        self.assertEqual(cached.status_code, 304)
+
+        created = self.client.post('/api/orders/bulk?op=create', headers=self.headers,
+                                   json=[{'user_id': 1, 'product_id': 1, 'status': 'pending'}])
+        self.assertEqual(created.get_json()['succeeded'], 1)
+
+        after = self.client.get('/api/orders', headers=dict(self.headers, **{'If-None-Match': etag}))
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers['ETag'], etag)
+
+if __name__ == '__main__':
+    unittest.main()
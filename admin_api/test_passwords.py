@@ -0,0 +1,116 @@
+import hashlib
+import threading
+import unittest
+
+from passwords import (hash_password, verify_password, needs_rehash, PasswordVerifier,
+                       PasswordVerifierBusy, RateLimiter, LoginThrottle)
+
+FAST_PBKDF2 = {'kdf': 'pbkdf2_sha256', 'iterations': 1000, 'scrypt_n': 1024, 'scrypt_r': 8, 'scrypt_p': 1}
+FAST_SCRYPT = dict(FAST_PBKDF2, kdf='scrypt')
+
+class TestPasswordHashing(unittest.TestCase):
+    """Test KDF hashing and verification"""
+
+    def test_pbkdf2_and_scrypt_round_trip(self):
+        """Both KDFs verify the right password and reject others"""
+        for settings in (FAST_PBKDF2, FAST_SCRYPT):
+            stored = hash_password('secret', settings)
+            self.assertTrue(stored.startswith(settings['kdf'] + '$'))
+            self.assertTrue(verify_password('secret', stored))
+            self.assertFalse(verify_password('Secret', stored))
+            self.assertFalse(needs_rehash(stored, settings))
+
+    def test_legacy_sha256_needs_rehash(self):
+        """Old unsalted SHA-256 hashes still verify and are flagged for upgrade"""
+        stored = hashlib.sha256(b'admin123').hexdigest()
+        self.assertTrue(verify_password('admin123', stored))
+        self.assertFalse(verify_password('admin124', stored))
+        self.assertTrue(needs_rehash(stored, FAST_PBKDF2))
+
+    def test_changed_cost_needs_rehash(self):
+        """Hashes made with other KDF parameters are flagged for upgrade"""
+        stored = hash_password('secret', FAST_PBKDF2)
+        self.assertTrue(needs_rehash(stored, dict(FAST_PBKDF2, iterations=2000)))
+        self.assertTrue(needs_rehash(stored, FAST_SCRYPT))
+
+    def test_malformed_hash_is_rejected(self):
+        """Garbage in the password column never verifies"""
+        for stored in ('', 'pbkdf2_sha256$x$y$z', 'scrypt$1$2', 'plain-text'):
+            self.assertFalse(verify_password('secret', stored))
+
+class TestPasswordVerifier(unittest.TestCase):
+    """Test the bounded verification pool"""
+
+    def test_upgrade_returns_new_hash(self):
+        """A correct legacy password comes back with a replacement hash"""
+        verifier = PasswordVerifier(workers=1, max_pending=2)
+        valid, new_hash = verifier.verify('admin123', hashlib.sha256(b'admin123').hexdigest())
+        self.assertTrue(valid)
+        self.assertTrue(verify_password('admin123', new_hash))
+        self.assertEqual(verifier.verify('wrong', new_hash), (False, None))
+        self.assertEqual(verifier.stats()['upgraded'], 1)
+
+    def test_rejects_when_saturated(self):
+        """Logins beyond max_pending are refused without queueing"""
+        verifier = PasswordVerifier(workers=1, max_pending=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait()
+
+        worker = threading.Thread(target=verifier._run, args=(slow,))
+        worker.start()
+        started.wait()
+        with self.assertRaises(PasswordVerifierBusy):
+            verifier.verify('secret', 'x' * 64)
+        release.set()
+        worker.join()
+        self.assertEqual(verifier.stats()['rejected'], 1)
+
+    def test_timeout_is_busy_and_keeps_the_slot(self):
+        """A verification that outlives timeout is a 503, and its slot stays taken until it ends"""
+        verifier = PasswordVerifier(workers=1, max_pending=1, timeout=0.05)
+        release = threading.Event()
+        with self.assertRaises(PasswordVerifierBusy):
+            verifier._run(release.wait)
+        self.assertEqual(verifier.stats()['timed_out'], 1)
+        with self.assertRaises(PasswordVerifierBusy):
+            verifier.verify('secret', 'x' * 64)
+        self.assertEqual(verifier.stats()['rejected'], 1)
+
+        release.set()
+        verifier._executor.submit(lambda: None).result()
+        self.assertEqual(verifier.stats()['pending'], 0)
+        self.assertEqual(verifier.verify('secret', 'x' * 64), (False, None))
+
+    def test_missing_user_costs_a_verification(self):
+        """Unknown usernames go through the KDF like real ones"""
+        verifier = PasswordVerifier(workers=1, max_pending=2)
+        self.assertEqual(verifier.verify_missing('secret'), (False, None))
+        self.assertEqual(verifier.stats()['completed'], 1)
+
+class TestLoginThrottle(unittest.TestCase):
+    """Test per-user and per-IP admission control"""
+
+    def test_token_bucket(self):
+        """A key gets burst attempts, then is refused"""
+        limiter = RateLimiter(rate=0, burst=3)
+        self.assertEqual([limiter.allow('a') for _ in range(4)], [True, True, True, False])
+        self.assertTrue(limiter.allow('b'))
+
+    def test_per_user_and_per_ip(self):
+        """Either an exhausted user or an exhausted address blocks the attempt"""
+        throttle = LoginThrottle(user_rate=0, user_burst=2, ip_rate=0, ip_burst=3)
+        self.assertTrue(throttle.admit('alice', '10.0.0.1'))
+        self.assertTrue(throttle.admit('Alice', '10.0.0.2'))
+        self.assertFalse(throttle.admit('alice', '10.0.0.3'))
+
+        self.assertTrue(throttle.admit('bob', '10.0.0.1'))
+        self.assertTrue(throttle.admit('carol', '10.0.0.1'))
+        self.assertFalse(throttle.admit('dave', '10.0.0.1'))
+        self.assertEqual(throttle.throttled, 2)
+
+if __name__ == '__main__':
+    unittest.main()
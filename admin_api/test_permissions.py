@@ -0,0 +1,56 @@
+import unittest
+
+import permissions
+from permissions import (RESOURCES, DEFAULT_PERMISSIONS, compile_permissions, resource_mask,
+                         mask_resources, PermissionTable)
+
+class TestPermissions(unittest.TestCase):
+    """Test the compiled role permission table"""
+
+    def test_mask_round_trip(self):
+        """Resources survive conversion to a bitmask and back"""
+        self.assertEqual(mask_resources(resource_mask(['orders', 'products'])), ['products', 'orders'])
+        self.assertEqual(mask_resources(resource_mask(RESOURCES)), list(RESOURCES))
+        with self.assertRaises(ValueError):
+            resource_mask(['nonexistent'])
+
+    def test_compile_is_read_only(self):
+        """The compiled table cannot be changed in place"""
+        masks = compile_permissions([('Support', 'faq'), ('Support', 'unanswered')])
+        self.assertEqual(mask_resources(masks['Support']), ['faq', 'unanswered'])
+        with self.assertRaises(TypeError):
+            masks['Support'] = 0
+
+    def test_defaults_match_builtin_roles(self):
+        """Without role_permissions rows the built-in roles keep their access"""
+        table = PermissionTable()
+        table._masks = compile_permissions(
+            (role, resource) for role, resources in DEFAULT_PERMISSIONS.items() for resource in resources
+        )
+        self.assertTrue(table.allows('Product Admin', 'orders'))
+        self.assertFalse(table.allows('Product Admin', 'roles'))
+        self.assertFalse(table.allows('End User', 'orders'))
+        self.assertFalse(table.allows('System Admin', 'unknown'))
+        self.assertEqual(table.resources('Order Admin'), ['orders'])
+
+    @unittest.skipIf(permissions.session_scope is None, 'SQLAlchemy is not installed')
+    def test_failed_reload_keeps_loaded_table(self):
+        """A load error after a successful load neither drops custom roles nor restores defaults"""
+        rows = [[('Auditor', 'orders'), ('Product Admin', 'products')]]
+
+        class FlakyTable(PermissionTable):
+            def load(self):
+                if not rows:
+                    raise RuntimeError('database unavailable')
+                return rows.pop()
+
+        table = FlakyTable()
+        table.reload()
+        self.assertTrue(table.allows('Auditor', 'orders'))
+        self.assertFalse(table.allows('Product Admin', 'orders'))
+        table.reload('roles')
+        self.assertTrue(table.allows('Auditor', 'orders'))
+        self.assertFalse(table.allows('Product Admin', 'orders'))
+
+if __name__ == '__main__':
+    unittest.main()
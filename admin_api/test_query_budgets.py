@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import unittest
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+try:
+    from models import Order, Role, get_engine, session_scope
+    from migrations import MigrationRunner
+    from seed import seed_database
+    from auth import OrderManager, ProductManager, UserManager
+except ImportError:
+    get_engine = None
+
+from profiling import QueryBudgetExceeded, instrument_engine, query_profile
+
+@unittest.skipIf(get_engine is None, 'SQLAlchemy is not installed')
+class TestQueryBudgets(unittest.TestCase):
+    """Run the list paths against a seeded SQLite database in enforce mode"""
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        cls.previous_url = os.environ.get('DATABASE_URL')
+        os.environ['DATABASE_URL'] = f"sqlite:///{cls.path}"
+        cls.engine = get_engine()
+        instrument_engine(cls.engine)
+        MigrationRunner(cls.engine).upgrade()
+        with cls.engine.begin() as conn:
+            conn.execute(Role.__table__.insert(), [{'role_name': 'End User'}])
+        seed_database({'users': 20, 'products': 30, 'orders': 200, 'unanswered': 0, 'faqs': 0},
+                      seed=5, engine=cls.engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        if cls.previous_url is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = cls.previous_url
+        os.remove(cls.path)
+
+    def test_full_lists_are_one_statement(self):
+        """get_all projects joined columns instead of lazy loading per row"""
+        for manager in (OrderManager(), UserManager()):
+            with query_profile('get_all', budget=1, mode='enforce'):
+                self.assertTrue(manager.get_all())
+
+    def test_pages_fit_the_list_budget(self):
+        """A page with its total count stays within the list endpoint budget"""
+        for manager in (OrderManager(), ProductManager(), UserManager()):
+            with query_profile('get_page', budget=2, mode='enforce'):
+                self.assertTrue(manager.get_page(limit=50, with_total=True)['success'])
+
+    def test_lazy_loads_in_a_loop_are_caught(self):
+        """Reading o.user per order is flagged as N+1 with the line that did it"""
+        with self.assertRaises(QueryBudgetExceeded) as caught:
+            with query_profile('orders_before', mode='enforce'):
+                with session_scope() as session:
+                    [o.user.username for o in session.query(Order).order_by(Order.order_id).limit(50)]
+        self.assertIn('N+1', str(caught.exception))
+        self.assertIn('admin_api/test_query_budgets.py:', str(caught.exception))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import threading
+import time
+import unittest
+
+from search import FallbackIndex, TrigramIndex, WordIndex, prefix_tsquery
+
+class TestTrigramIndex(unittest.TestCase):
+    """Test substring and fuzzy product name search"""
+
+    def setUp(self):
+        self.index = TrigramIndex()
+        for doc_id, name in enumerate(['Wireless Headphones', 'Headphones', 'Jacket',
+                                       'Rain Jacket', 'Headphone Stand'], start=1):
+            self.index.add(doc_id, name)
+
+    def test_substring_ranking(self):
+        """Exact matches first, then prefixes, then shorter names"""
+        self.assertEqual(self.index.search('headphones'), [2, 1])
+        self.assertEqual(self.index.search('HEADPHONE'), [2, 5, 1])
+        self.assertEqual(self.index.search('jacket', limit=1), [3])
+
+    def test_short_queries(self):
+        """Queries shorter than a trigram still match by substring"""
+        self.assertEqual(self.index.search('ra'), [4])
+        self.assertEqual(self.index.search('  '), [])
+
+    def test_fuzzy_fallback(self):
+        """Misspellings match by trigram similarity when no name contains them"""
+        self.assertEqual(self.index.search('jackt'), [3])
+        self.assertEqual(self.index.search('headfones'), [2])
+        self.assertEqual(self.index.search('qqqq'), [])
+
+    def test_update_and_remove(self):
+        """Re-adding replaces a document; removed documents stop matching"""
+        self.index.add(3, 'Winter Coat')
+        self.assertEqual(self.index.search('jacket'), [4])
+        self.index.remove(4)
+        self.index.remove(99)
+        self.assertEqual(self.index.search('jacket'), [])
+        self.assertEqual(len(self.index), 4)
+
+class TestWordIndex(unittest.TestCase):
+    """Test full-text search over questions and answers"""
+
+    def setUp(self):
+        self.index = WordIndex()
+        self.index.add(1, 'Where is my order? Order number 12')
+        self.index.add(2, 'How long does delivery take?')
+        self.index.add(3, 'Can I cancel my order before delivery?')
+
+    def test_prefix_and_all_words(self):
+        """Every query word must prefix-match a word of the document"""
+        self.assertEqual(self.index.search('deliv'), [2, 3])
+        self.assertEqual(self.index.search('order deliv'), [3])
+        self.assertEqual(self.index.search('order refund'), [])
+        self.assertEqual(self.index.search('?!'), [])
+
+    def test_ranking(self):
+        """Documents using a word more often rank higher"""
+        self.assertEqual(self.index.search('order'), [1, 3])
+        self.assertEqual(self.index.search('order', limit=1), [1])
+
+    def test_update_and_remove(self):
+        """Re-adding replaces a document's words"""
+        self.index.add(1, 'Refund policy')
+        self.assertEqual(self.index.search('order'), [3])
+        self.assertEqual(self.index.search('refund'), [1])
+        self.index.remove(1)
+        self.assertEqual(self.index.search('refund'), [])
+
+    def test_prefix_tsquery(self):
+        """PostgreSQL queries use the same words as prefixes"""
+        self.assertEqual(prefix_tsquery("Where's my ORDER"), 'where:* & s:* & my:* & order:*')
+        self.assertEqual(prefix_tsquery('&|!'), '')
+
+class CountingIndex(FallbackIndex):
+    """FallbackIndex whose build only counts, instead of reading the database"""
+
+    def __init__(self, min_interval):
+        super().__init__({'topic': 'unanswered', 'kind': 'text'}, ttl=0, min_interval=min_interval)
+        self.builds = 0
+        self.built = threading.Event()
+
+    def build(self):
+        self._built_at = time.monotonic()
+        self.builds += 1
+        self.built.set()
+
+class TestFallbackIndexRebuilds(unittest.TestCase):
+    """Test that keyless changes do not rebuild back to back"""
+
+    def test_keyless_changes_are_debounced(self):
+        """A burst of keyless changes costs one rebuild per min_interval"""
+        index = CountingIndex(min_interval=0.3)
+        index.build()
+        for _ in range(50):
+            index.rebuild_later()
+            time.sleep(0.002)
+        time.sleep(0.1)
+        self.assertEqual(index.builds, 1)
+
+        index.built.clear()
+        self.assertTrue(index.built.wait(2))
+        for _ in range(50):
+            if not index._rebuilding:
+                break
+            time.sleep(0.02)
+        self.assertEqual(index.builds, 2)
+        self.assertFalse(index._rebuilding)
+
+class PausedIndex(FallbackIndex):
+    """FallbackIndex over an in-memory table whose build stops halfway until resumed"""
+
+    def __init__(self, table):
+        super().__init__({'topic': 'faq', 'kind': 'text'}, ttl=0, min_interval=0)
+        self.table = table
+        self.halfway = threading.Event()
+        self.resume = threading.Event()
+
+    def rows(self):
+        # Like a database cursor, the rows are as of the start of the query
+        for i, row in enumerate(sorted(self.table.items())):
+            if i == 2:
+                self.halfway.set()
+                self.resume.wait(2)
+            yield row
+
+    def fetch(self, doc_id):
+        return (doc_id, self.table[doc_id]) if doc_id in self.table else None
+
+class TestFallbackIndexChanges(unittest.TestCase):
+    """Test that row changes during a rebuild reach the new index"""
+
+    def test_changes_during_build_are_replayed(self):
+        """Rows the build read before they changed are corrected before the swap"""
+        index = PausedIndex({1: 'shipping times', 2: 'refund policy', 3: 'gift cards'})
+        index.resume.set()
+        index.build()
+        index.halfway.clear()
+        index.resume.clear()
+        previous = index.index
+
+        builder = threading.Thread(target=index.build)
+        builder.start()
+        self.assertTrue(index.halfway.wait(2))
+        index.table[1] = 'delivery times'
+        index.on_change(1)
+        del index.table[2]
+        index.on_change('2')
+        index.resume.set()
+        builder.join(2)
+
+        self.assertIsNot(index.index, previous)
+        self.assertEqual(index.search('delivery'), [1])
+        self.assertEqual(index.search('shipping'), [])
+        self.assertEqual(index.search('refund'), [])
+        self.assertIsNone(index._changes)
+
+if __name__ == '__main__':
+    unittest.main()
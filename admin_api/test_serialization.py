@@ -0,0 +1,57 @@
+import gzip
+import json
+import unittest
+from datetime import date
+
+import serialization
+from serialization import RowSet, dumps, compress_stream, choose_encoding
+
+class TestRowSet(unittest.TestCase):
+    """Test RowSet access and serialization"""
+
+    def setUp(self):
+        self.rows = RowSet(['order_id', 'status', 'estimated_delivery'],
+                           [(1, 'shipped', date(2025, 6, 10)), (2, 'pending', None)])
+
+    def test_dict_access(self):
+        """Python callers can still read rows as dicts"""
+        self.assertEqual(len(self.rows), 2)
+        self.assertEqual(self.rows[0]['status'], 'shipped')
+        self.assertEqual([row['order_id'] for row in self.rows], [1, 2])
+        self.assertEqual(self.rows.column('order_id'), [1, 2])
+
+    def test_serializes_as_objects(self):
+        """A RowSet is written as a list of JSON objects, with and without orjson"""
+        expected = [
+            {'order_id': 1, 'status': 'shipped', 'estimated_delivery': '2025-06-10'},
+            {'order_id': 2, 'status': 'pending', 'estimated_delivery': None},
+        ]
+        original = serialization.orjson
+        try:
+            for backend in {original, None}:
+                serialization.orjson = backend
+                self.assertEqual(json.loads(dumps({'data': self.rows})), {'data': expected})
+                self.assertEqual(json.loads(dumps({'data': self.rows.rows})),
+                                 {'data': [list(row.values()) for row in expected]})
+        finally:
+            serialization.orjson = original
+
+class TestCompression(unittest.TestCase):
+    """Test content coding negotiation and streamed compression"""
+
+    def test_choose_encoding(self):
+        """gzip is used when brotli is unavailable or not accepted"""
+        self.assertEqual(choose_encoding({'gzip': 1, 'br': 0}), 'gzip')
+        self.assertIsNone(choose_encoding({'gzip': 0, 'br': 0}))
+        if serialization.brotli is not None:
+            self.assertEqual(choose_encoding({'gzip': 1, 'br': 1}), 'br')
+
+    def test_gzip_stream(self):
+        """Chunks compressed one by one form a single valid gzip body"""
+        chunks = [f'{{"id":{i}}}\n'.encode() for i in range(1000)]
+        body = b''.join(compress_stream(iter(chunks), 'gzip'))
+        self.assertEqual(gzip.decompress(body), b''.join(chunks))
+        self.assertLess(len(body), len(b''.join(chunks)))
+
+if __name__ == '__main__':
+    unittest.main()
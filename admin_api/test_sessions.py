@@ -0,0 +1,45 @@
+import time
+import unittest
+
+from sessions import MemorySessionStore
+
+USER = {'user_id': 1, 'username': 'product_admin', 'role': 'Product Admin'}
+
+class TestMemorySessionStore(unittest.TestCase):
+    """Test the in-memory session store"""
+
+    def test_create_and_get(self):
+        """A created token resolves to the user info"""
+        store = MemorySessionStore(ttl=60)
+        token = store.create(USER)
+        self.assertEqual(store.get(token), USER)
+        self.assertIsNone(store.get('unknown-token'))
+
+    def test_tokens_are_random(self):
+        """Tokens do not depend on the user or the number of sessions"""
+        store = MemorySessionStore(ttl=60)
+        first = store.create(USER)
+        second = store.create(USER)
+        self.assertNotEqual(first, second)
+        self.assertNotIn('product_admin', first)
+        self.assertGreaterEqual(len(first), 32)
+
+    def test_delete(self):
+        """Logged out tokens are no longer valid"""
+        store = MemorySessionStore(ttl=60)
+        token = store.create(USER)
+        store.delete(token)
+        self.assertIsNone(store.get(token))
+
+    def test_expired_sessions_are_rejected_and_swept(self):
+        """Sessions past their TTL are invalid and removed by sweep()"""
+        store = MemorySessionStore(ttl=0.01)
+        token = store.create(USER)
+        store.create(USER)
+        time.sleep(0.02)
+        self.assertIsNone(store.get(token))
+        self.assertEqual(store.sweep(), 1)
+        self.assertEqual(len(store), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from versions import TableVersions
+
+class TestTableVersions(unittest.TestCase):
+    """Test per-table change versions and the change log"""
+
+    def test_bump_and_token(self):
+        """Each change bumps only its own table"""
+        versions = TableVersions()
+        self.assertEqual(versions.version('orders'), 0)
+        versions.bump('orders', 5)
+        versions.bump('orders', 6)
+        versions.bump('products', 1)
+        self.assertEqual(versions.version('orders'), 2)
+        self.assertEqual(versions.token('orders'), f"{versions.epoch}.2")
+
+    def test_changes_since(self):
+        """Keys changed after a token are returned once each"""
+        versions = TableVersions()
+        start = versions.token('orders')
+        self.assertEqual(versions.changes_since('orders', start), set())
+        versions.bump('orders', 5)
+        middle = versions.token('orders')
+        versions.bump('orders', 6)
+        versions.bump('orders', 5)
+        self.assertEqual(versions.changes_since('orders', start), {'5', '6'})
+        self.assertEqual(versions.changes_since('orders', middle), {'6', '5'})
+
+    def test_full_reload_cases(self):
+        """Unknown epochs, truncated logs and keyless changes need a full reload"""
+        versions = TableVersions(log_size=2)
+        start = versions.token('faq')
+        self.assertIsNone(versions.changes_since('faq', 'other.0'))
+        self.assertIsNone(versions.changes_since('faq', 'garbage'))
+        self.assertIsNone(versions.changes_since('faq', f"{versions.epoch}.9"))
+
+        for key in (1, 2, 3):
+            versions.bump('faq', key)
+        self.assertIsNone(versions.changes_since('faq', start))
+        self.assertEqual(versions.changes_since('faq', f"{versions.epoch}.1"), {'2', '3'})
+
+        token = versions.token('faq')
+        versions.bump('faq')
+        self.assertIsNone(versions.changes_since('faq', token))
+
+if __name__ == '__main__':
+    unittest.main()
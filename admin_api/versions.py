@@ -0,0 +1,77 @@
+import os
+import secrets
+import threading
+from collections import deque
+
+class TableVersions:
+    """
+    In-memory change counter per table, with a short log of changed keys.
+
+    Every change bumps the table's version. List endpoints use the version
+    for ETags, and the log to answer ?since=<token> with only the keys that
+    changed. Tokens are "<epoch>.<version>". The epoch is random per process,
+    so a token from another worker or from before a restart asks for a full
+    reload rather than a wrong delta.
+    """
+
+    def __init__(self, log_size=None):
+        self.epoch = secrets.token_hex(4)
+        self.log_size = log_size or int(os.getenv('CHANGE_LOG_SIZE', '1000'))
+        self._versions = {}
+        self._logs = {}
+        self._tracked = set()
+        self._lock = threading.Lock()
+
+    def track(self, table):
+        """Enable conditional and delta responses for table"""
+        self._tracked.add(table)
+
+    def is_tracked(self, table):
+        return table in self._tracked
+
+    def bump(self, table, key=None):
+        """Record a change; key None means any row may have changed"""
+        with self._lock:
+            version = self._versions.get(table, 0) + 1
+            self._versions[table] = version
+            log = self._logs.get(table)
+            if log is None:
+                log = self._logs[table] = deque(maxlen=self.log_size)
+            log.append((version, None if key is None else str(key)))
+            return version
+
+    def version(self, table):
+        return self._versions.get(table, 0)
+
+    def token(self, table):
+        return f"{self.epoch}.{self.version(table)}"
+
+    def changes_since(self, table, token):
+        """
+        Keys changed after token, or None if the caller must reload everything
+        (unknown epoch, log already truncated, or a change without a key).
+        """
+        epoch, _, number = str(token).partition('.')
+        try:
+            since = int(number)
+        except ValueError:
+            return None
+
+        with self._lock:
+            current = self._versions.get(table, 0)
+            if epoch != self.epoch or since < 0 or since > current:
+                return None
+            if since == current:
+                return set()
+
+            log = self._logs.get(table)
+            if not log or log[0][0] > since + 1:
+                return None
+            keys = set()
+            for version, key in reversed(log):
+                if version <= since:
+                    break
+                if key is None:
+                    return None
+                keys.add(key)
+            return keys
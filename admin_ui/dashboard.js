@@ -6,6 +6,12 @@ class AdminDashboard {
         this.currentSection = null;
         this.currentUpdateId = null;
         this.currentUpdateType = null;
+        this.pageSize = 100;
+        this.nextAfter = {};
+        this.rows = {};
+        this.versions = {};
+        this.searchQuery = {};
+        this.cursorParam = {};
 
         // Check authentication
         if (!this.token) {
@@ -87,6 +93,15 @@ class AdminDashboard {
             this.logout();
         });
 
+        // Section search boxes; typing pauses briefly before querying
+        document.querySelectorAll('.section-search').forEach(input => {
+            let timer = null;
+            input.addEventListener('input', () => {
+                clearTimeout(timer);
+                timer = setTimeout(() => this.searchSection(input.dataset.resource, input.value), 250);
+            });
+        });
+
         // Close modal on outside click
         this.updateModal?.addEventListener('click', (e) => {
             if (e.target === this.updateModal) {
@@ -133,7 +148,8 @@ class AdminDashboard {
             'System Admin': ['roles', 'users', 'products', 'orders', 'faq', 'unanswered']
         };
 
-        const allowedSections = accessMap[userRole] || [];
+        // Permissions come from the server at login; the map covers older sessions
+        const allowedSections = this.user.permissions || accessMap[userRole] || [];
         return allSections.filter(section => allowedSections.includes(section.id));
     }
 
@@ -212,16 +228,112 @@ class AdminDashboard {
         }
     }
 
+    // Search a section (server-side ?q=) or, with an empty query, go back to the full list
+    searchSection(resource, query) {
+        this.searchQuery[resource] = query.trim();
+        // Search results are not a version of the full list, so reload it from scratch
+        this.versions[resource] = null;
+        this.nextAfter[resource] = null;
+        this.loadSectionData(resource);
+    }
+
+    // Fetch one page of a list resource; append continues after the last loaded row.
+    // Reloads send since=<version> so only rows changed since the last load come back,
+    // and are merged into the rows already loaded. While searching, rows come ranked
+    // and pages continue with offset= instead.
+    async fetchPage(resource, append = false) {
+        // Columns shape sends field names once instead of on every row
+        let url = `${this.apiEndpoint}/${resource}?limit=${this.pageSize}&shape=columns`;
+        const query = this.searchQuery[resource];
+        if (query) {
+            url += `&q=${encodeURIComponent(query)}`;
+        }
+        const loaded = this.rows[resource] || [];
+        const delta = !append && !query && this.versions[resource] != null;
+        if (append && this.nextAfter[resource] != null) {
+            const cursor = this.cursorParam[resource] || 'after';
+            url += `&${cursor}=${encodeURIComponent(this.nextAfter[resource])}`;
+        } else if (delta) {
+            url += `&since=${encodeURIComponent(this.versions[resource])}`;
+        }
+        const result = await this.makeAuthenticatedRequest(url);
+        if (!result || !result.success) {
+            return result;
+        }
+        if (result.fields) {
+            const fields = result.fields;
+            result.data = result.data.map(row => Object.fromEntries(fields.map((field, i) => [field, row[i]])));
+        }
+
+        // Appended pages are at least as new as the rows already loaded, so keep the older version
+        if (!append && !query) {
+            this.versions[resource] = result.version;
+        }
+        if (delta && result.full === false) {
+            this.rows[resource] = this.mergeChanges(resource, loaded, result);
+            return { ...result, data: this.rows[resource] };
+        }
+        const ranked = result.next_offset !== undefined;
+        this.cursorParam[resource] = ranked ? 'offset' : 'after';
+        this.nextAfter[resource] = ranked ? result.next_offset : result.next_after;
+        this.rows[resource] = append ? loaded.concat(result.data) : result.data;
+        return result;
+    }
+
+    // Apply a since= delta to the loaded rows, keeping them ordered by id
+    mergeChanges(resource, rows, result) {
+        const idField = result.id_field;
+        const removed = new Set(result.removed);
+        const changed = new Map(result.data.map(row => [row[idField], row]));
+        const lastLoaded = rows.length ? rows[rows.length - 1][idField] : null;
+        const morePages = this.nextAfter[resource] != null;
+
+        const merged = [];
+        rows.forEach(row => {
+            const id = row[idField];
+            if (removed.has(id)) {
+                return;
+            }
+            merged.push(changed.get(id) || row);
+            changed.delete(id);
+        });
+        // New rows past the loaded pages arrive with "Load more"
+        changed.forEach((row, id) => {
+            if (!morePages || lastLoaded === null || id < lastLoaded) {
+                merged.push(row);
+            }
+        });
+        return merged.sort((a, b) => a[idField] - b[idField]);
+    }
+
+    // Show a "Load more" button under the table while more pages exist
+    updateLoadMore(resource, tableBody, loader) {
+        const buttonId = `${resource}LoadMore`;
+        let button = document.getElementById(buttonId);
+        if (!button) {
+            button = document.createElement('button');
+            button.id = buttonId;
+            button.className = 'btn btn-small';
+            button.textContent = 'Load more';
+            button.addEventListener('click', () => loader(true));
+            tableBody.closest('table').after(button);
+        }
+        button.style.display = this.nextAfter[resource] != null ? '' : 'none';
+    }
+
     // Products functionality
-    async loadProducts() {
-        const result = await this.makeAuthenticatedRequest(`${this.apiEndpoint}/products`);
+    async loadProducts(append = false) {
+        const result = await this.fetchPage('products', append);
         if (result && result.success) {
-            this.displayProducts(result.data);
+            this.displayProducts(result.data, append);
+            this.updateLoadMore('products', this.productsTableBody, (more) => this.loadProducts(more));
         }
     }
 
-    displayProducts(products) {
-        this.productsTableBody.innerHTML = '';
+    displayProducts(products, append = false) {
+        if (!append) {
+            this.productsTableBody.innerHTML = '';
+        }
         products.forEach(product => {
             const row = document.createElement('tr');
             row.innerHTML = `
@@ -269,15 +381,18 @@ class AdminDashboard {
     }
 
     // Orders functionality
-    async loadOrders() {
-        const result = await this.makeAuthenticatedRequest(`${this.apiEndpoint}/orders`);
+    async loadOrders(append = false) {
+        const result = await this.fetchPage('orders', append);
         if (result && result.success) {
-            this.displayOrders(result.data);
+            this.displayOrders(result.data, append);
+            this.updateLoadMore('orders', this.ordersTableBody, (more) => this.loadOrders(more));
         }
     }
 
-    displayOrders(orders) {
-        this.ordersTableBody.innerHTML = '';
+    displayOrders(orders, append = false) {
+        if (!append) {
+            this.ordersTableBody.innerHTML = '';
+        }
         orders.forEach(order => {
             const row = document.createElement('tr');
             row.innerHTML = `
@@ -325,15 +440,18 @@ class AdminDashboard {
     }
 
     // Users functionality
-    async loadUsers() {
-        const result = await this.makeAuthenticatedRequest(`${this.apiEndpoint}/users`);
+    async loadUsers(append = false) {
+        const result = await this.fetchPage('users', append);
         if (result && result.success) {
-            this.displayUsers(result.data);
+            this.displayUsers(result.data, append);
+            this.updateLoadMore('users', this.usersTableBody, (more) => this.loadUsers(more));
         }
     }
 
-    displayUsers(users) {
-        this.usersTableBody.innerHTML = '';
+    displayUsers(users, append = false) {
+        if (!append) {
+            this.usersTableBody.innerHTML = '';
+        }
         users.forEach(user => {
             const row = document.createElement('tr');
             row.innerHTML = `
@@ -378,15 +496,18 @@ class AdminDashboard {
     }
 
     // FAQ functionality
-    async loadFaq() {
-        const result = await this.makeAuthenticatedRequest(`${this.apiEndpoint}/faq`);
+    async loadFaq(append = false) {
+        const result = await this.fetchPage('faq', append);
         if (result && result.success) {
-            this.displayFaq(result.data);
+            this.displayFaq(result.data, append);
+            this.updateLoadMore('faq', this.faqTableBody, (more) => this.loadFaq(more));
         }
     }
 
-    displayFaq(faqs) {
-        this.faqTableBody.innerHTML = '';
+    displayFaq(faqs, append = false) {
+        if (!append) {
+            this.faqTableBody.innerHTML = '';
+        }
         faqs.forEach(faq => {
             const row = document.createElement('tr');
             row.innerHTML = `
@@ -430,20 +551,25 @@ class AdminDashboard {
     }
 
     // Unanswered Questions functionality
-    async loadUnanswered() {
-        const result = await this.makeAuthenticatedRequest(`${this.apiEndpoint}/unanswered`);
+    async loadUnanswered(append = false) {
+        const result = await this.fetchPage('unanswered', append);
         if (result && result.success) {
-            this.displayUnanswered(result.data);
+            this.displayUnanswered(result.data, append);
+            this.updateLoadMore('unanswered', this.unansweredTableBody, (more) => this.loadUnanswered(more));
         }
     }
 
-    displayUnanswered(questions) {
-        this.unansweredTableBody.innerHTML = '';
+    displayUnanswered(questions, append = false) {
+        if (!append) {
+            this.unansweredTableBody.innerHTML = '';
+        }
         questions.forEach(question => {
             const row = document.createElement('tr');
             row.innerHTML = `
                 <td>${question.uq_id}</td>
                 <td>${question.question}</td>
+                <td>${question.occurrences ?? 1}</td>
+                <td>${question.last_seen || '-'}</td>
                 <td><span class="status-badge status-${question.status.toLowerCase()}">${question.status}</span></td>
                 <td>
                     <button class="btn btn-success btn-small" onclick="dashboard.showUpdateModal('unanswered', ${question.uq_id}, ${JSON.stringify(question).replace(/"/g, '&quot;')})">
@@ -459,20 +585,24 @@ class AdminDashboard {
     }
 
     // Roles functionality
-    async loadRoles() {
-        const result = await this.makeAuthenticatedRequest(`${this.apiEndpoint}/roles`);
+    async loadRoles(append = false) {
+        const result = await this.fetchPage('roles', append);
         if (result && result.success) {
-            this.displayRoles(result.data);
+            this.displayRoles(result.data, append);
+            this.updateLoadMore('roles', this.rolesTableBody, (more) => this.loadRoles(more));
         }
     }
 
-    displayRoles(roles) {
-        this.rolesTableBody.innerHTML = '';
+    displayRoles(roles, append = false) {
+        if (!append) {
+            this.rolesTableBody.innerHTML = '';
+        }
         roles.forEach(role => {
             const row = document.createElement('tr');
             row.innerHTML = `
                 <td>${role.role_id}</td>
                 <td>${role.role_name}</td>
+                <td>${(role.permissions || []).join(', ')}</td>
                 <td>
                     <button class="btn btn-danger btn-small" onclick="dashboard.deleteItem('roles', ${role.role_id}, '${role.role_name}')">
                         🗑️ Delete
@@ -485,6 +615,8 @@ class AdminDashboard {
 
     async createRole() {
         const roleName = document.getElementById('roleName').value.trim();
+        const permissions = Array.from(document.querySelectorAll('input[name="rolePermissions"]:checked'))
+            .map(input => input.value);
 
         if (!roleName) {
             this.showResponse('Role name is required', 'error');
@@ -493,7 +625,7 @@ class AdminDashboard {
 
         const result = await this.makeAuthenticatedRequest(`${this.apiEndpoint}/roles`, {
             method: 'POST',
-            body: JSON.stringify({ role_name: roleName })
+            body: JSON.stringify({ role_name: roleName, permissions })
         });
 
         if (result) {
@@ -658,6 +790,36 @@ class AdminDashboard {
         }
     }
 
+    // Download a streamed export of a resource
+    async exportData(resource, format) {
+        try {
+            const response = await fetch(`${this.apiEndpoint}/${resource}/export?format=${format}`, {
+                headers: { 'Authorization': `Bearer ${this.token}` }
+            });
+
+            if (response.status === 401) {
+                this.logout();
+                return;
+            }
+            if (!response.ok) {
+                const result = await response.json();
+                this.showResponse(result.message, 'error');
+                return;
+            }
+
+            const url = URL.createObjectURL(await response.blob());
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = `${resource}.${format}`;
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+            URL.revokeObjectURL(url);
+        } catch (error) {
+            this.showResponse('Export failed. Please try again.', 'error');
+        }
+    }
+
     showResponse(message, type) {
         this.responseText.textContent = message;
         this.responseArea.className = `response-area ${type}`;
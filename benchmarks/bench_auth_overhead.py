@@ -0,0 +1,82 @@
+"""
+Per-request authentication overhead of the admin API.
+
+Compares the old per-route check (session lookup plus the if/elif role
+chain that built a new list on every call) with the before-request
+middleware (session lookup plus one bitmask test), and the bare
+permission checks on their own.
+
+Usage:
+    python benchmarks/bench_auth_overhead.py
+"""
+import argparse
+import timeit
+
+from bench_utils import use_temp_sqlite, seed_sample_data
+
+use_temp_sqlite()
+seed_sample_data(products=1, orders=1, users=1)
+
+from flask import request
+from models import Role, RolePermission, session_scope
+import server
+from permissions import permission_table, DEFAULT_PERMISSIONS
+
+def seed_admin_roles():
+    """Built-in admin roles with their default permissions"""
+    with session_scope() as session:
+        session.query(RolePermission).delete()
+        for role_name in DEFAULT_PERMISSIONS:
+            if not session.query(Role).filter_by(role_name=role_name).first():
+                session.add(Role(role_name=role_name))
+        session.commit()
+    permission_table.seed_defaults()
+    permission_table.reload()
+
+def legacy_check_access(user_role, resource):
+    """The if/elif chain AdminAuth.check_access used before the permission table"""
+    if user_role == 'System Admin':
+        return resource in ['roles', 'users', 'products', 'orders', 'faq', 'unanswered']
+    elif user_role == 'Application Admin':
+        return resource in ['users', 'products', 'orders', 'faq', 'unanswered']
+    elif user_role == 'Product Admin':
+        return resource in ['products', 'orders']
+    elif user_role == 'Order Admin':
+        return resource in ['orders']
+    else:
+        return False
+
+def legacy_route_check(resource):
+    """The boilerplate every route repeated before the middleware"""
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    user = server.check_user_session(token)
+    if not user:
+        return 401
+    if not legacy_check_access(user['role'], resource):
+        return 403
+    return None
+
+def report(name, seconds, number):
+    print(f"{name:<40}{seconds / number * 1e9:>12.0f} ns/call")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=200000, help='calls per measurement')
+    args = parser.parse_args()
+    number = args.number
+
+    seed_admin_roles()
+    token = server.session_store.create({'user_id': 1, 'username': 'bench', 'role': 'Order Admin'})
+
+    report('legacy check_access (last branch)', timeit.timeit(
+        lambda: legacy_check_access('Order Admin', 'orders'), number=number), number)
+    report('permission_table.allows', timeit.timeit(
+        lambda: permission_table.allows('Order Admin', 'orders'), number=number), number)
+
+    with server.app.test_request_context('/api/orders', headers={'Authorization': f'Bearer {token}'}):
+        report('legacy route boilerplate', timeit.timeit(
+            lambda: legacy_route_check('orders'), number=number), number)
+        report('before_request middleware', timeit.timeit(server.authenticate, number=number), number)
+
+if __name__ == '__main__':
+    main()
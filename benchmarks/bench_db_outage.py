@@ -0,0 +1,126 @@
+"""
+Order status lookups through a database incident, with and without the
+circuit breaker.
+
+Each phase runs --users simulated users, each asking for a random order
+every --think seconds:
+
+- healthy: the real SQLite lookup
+- outage:  every lookup hangs for --delay seconds before it runs, as when
+           PostgreSQL is saturated or a lock blocks the orders table
+- recovered: the real lookup again
+
+"old behaviour" waits for the database however long it takes (no timeout,
+breaker disabled). "breaker" uses ORDER_LOOKUP_TIMEOUT and db_breaker as
+configured, except that it is reopened for a probe after --open-seconds so
+recovery shows within a phase. For each phase the table shows action latency, how many
+answers came from the stale order cache or failed fast, and how many
+lookups actually reached the database.
+
+Usage:
+    python benchmarks/bench_db_outage.py
+    python benchmarks/bench_db_outage.py --users 50 --phase 10 --delay 5
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from bench_utils import percentile, seed_sample_data, use_temp_sqlite
+
+use_temp_sqlite()
+seed_sample_data()
+
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+import actions.actions as actions
+from actions.circuit_breaker import CircuitBreaker
+
+ORDERS = 1000
+DEFAULT_TIMEOUT = actions.ORDER_LOOKUP_TIMEOUT
+
+class Database:
+    """Wraps the real lookup; counts calls and can make every call hang first"""
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+        self.delay = 0.0
+        self.calls = 0
+
+    def __call__(self, order_id, timeout=None):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.lookup(order_id, timeout)
+
+async def user(action, rng, stop_at, think, results):
+    while time.perf_counter() < stop_at:
+        order_id = rng.randint(1, ORDERS)
+        tracker = Tracker('bench', {'ordernumber': str(order_id)}, {'text': str(order_id)}, [], False, None, {}, None)
+        dispatcher = CollectingDispatcher()
+        start = time.perf_counter()
+        await action.run(dispatcher, tracker, {})
+        texts = [m['text'] for m in dispatcher.messages]
+        if actions.STALE_NOTE in texts:
+            outcome = 'stale'
+        elif any('trouble accessing' in t for t in texts):
+            outcome = 'failed'
+        else:
+            outcome = 'ok'
+        results.append((time.perf_counter() - start, outcome))
+        await asyncio.sleep(rng.expovariate(1 / think))
+
+async def run_phase(action, database, args, delay, seed):
+    database.delay = delay
+    database.calls = 0
+    results = []
+    stop_at = time.perf_counter() + args.phase
+    await asyncio.gather(*(user(action, random.Random(seed * 1000 + i), stop_at, args.think, results)
+                           for i in range(args.users)))
+    latencies = [r[0] for r in results]
+    counts = {outcome: sum(1 for r in results if r[1] == outcome) for outcome in ('ok', 'stale', 'failed')}
+    return latencies, counts, database.calls
+
+async def scenario(name, args, breaker, timeout):
+    # The hang is injected into the sync lookup, which runs in worker threads
+    actions.DB_MODE = 'sync'
+    actions.db_breaker = breaker
+    actions.ORDER_LOOKUP_TIMEOUT = timeout
+    # Entries expire quickly so lookups keep reaching the database; stale copies stay
+    actions.order_cache = actions.LRUCache(max_size=ORDERS, ttl=args.cache_ttl, stale_ttl=3600)
+    database = Database(actions.fetch_order_status_sync)
+    actions.fetch_order_status_sync = database
+    action = actions.ActionFetchOrderStatus()
+
+    print(f"\n{name}")
+    print(f"  {'phase':<11}{'answers':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+          f"{'stale':>8}{'failed':>8}{'db calls':>10}")
+    for seed, (phase, delay) in enumerate((('healthy', 0.0), ('outage', args.delay), ('recovered', 0.0))):
+        latencies, counts, calls = await run_phase(action, database, args, delay, seed)
+        print(f"  {phase:<11}{len(latencies):>8}{percentile(latencies, 50) * 1000:>10.1f}"
+              f"{percentile(latencies, 99) * 1000:>10.1f}{max(latencies) * 1000:>10.1f}"
+              f"{counts['stale']:>8}{counts['failed']:>8}{calls:>10}")
+    stats = breaker.stats()
+    print(f"  breaker: {stats['trips']} trips, {stats['rejected']} calls rejected without reaching the database")
+    actions.fetch_order_status_sync = database.lookup
+    # Let lookups still hanging in worker threads finish before the next scenario
+    database.delay = 0.0
+    await asyncio.sleep(args.delay)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='concurrent simulated users')
+    parser.add_argument('--think', type=float, default=0.2, help='mean seconds between a user\'s messages')
+    parser.add_argument('--phase', type=float, default=8.0, help='seconds per phase')
+    parser.add_argument('--delay', type=float, default=3.0, help='seconds every lookup hangs during the outage')
+    parser.add_argument('--open-seconds', type=float, default=3.0, help='seconds the breaker stays open')
+    parser.add_argument('--cache-ttl', type=float, default=0.5, help='order cache TTL for the run')
+    args = parser.parse_args()
+
+    never_trips = CircuitBreaker('database', failure_ratio=2.0, slow_ratio=2.0, min_calls=10 ** 9)
+    asyncio.run(scenario('old behaviour (no timeout, no breaker)', args, never_trips, None))
+    asyncio.run(scenario(f"breaker (timeout {DEFAULT_TIMEOUT}s)", args, CircuitBreaker('database', open_seconds=args.open_seconds),
+                         DEFAULT_TIMEOUT))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+FAQ answering benchmark: FaqIndex retrieval against the ResponseSelector.
+
+Accuracy is measured on the faq/* examples of data/nlu.yml, answered from
+the FAQs database/setup.py seeds. The ResponseSelector is measured the
+same way when Rasa and a trained model are available; it was trained on
+these very examples, so its accuracy here is an upper bound.
+
+Latency is measured per message, and FaqIndex is also timed on synthetic
+FAQ tables to show how matching and incremental updates scale.
+
+Usage:
+    python benchmarks/bench_faq.py
+    python benchmarks/bench_faq.py --model models/ --sizes 1000,10000
+"""
+import argparse
+import asyncio
+import glob
+import os
+import random
+
+from bench_utils import ROOT, Timer, percentile
+
+from actions.faq_index import FaqEntry, FaqIndex
+
+# The FAQs seeded by database/setup.py, keyed by the retrieval intent they answer
+SEED_FAQS = {
+    'faq/store_hours': FaqEntry(1, "What are your store hours?",
+                                "Our store is open 9 AM–9 PM Monday through Saturday, and 10 AM–6 PM on Sundays."),
+    'faq/return_policy': FaqEntry(2, "What is your return policy?",
+                                  "You can return any item within 30 days for a full refund. Just visit our Returns page."),
+    'faq/contact_info': FaqEntry(3, "How can I contact support?",
+                                 "You can reach us at support@example.com or call 1-800-123-4567."),
+}
+
+TOPICS = ['order', 'delivery', 'refund', 'invoice', 'warranty', 'account', 'password', 'gift card',
+          'discount', 'shipping', 'store', 'payment', 'subscription', 'exchange', 'voucher']
+FORMS = ['How do I change my {}?', 'Can I cancel my {}?', 'Where can I find my {}?',
+         'Is there a fee for {}?', 'Why was my {} declined?', 'How long does {} take?']
+
+def load_examples():
+    """(text, retrieval intent) pairs of the faq/* intents in data/nlu.yml"""
+    examples = []
+    intent = None
+    with open(os.path.join(ROOT, 'data', 'nlu.yml')) as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith('- intent:'):
+                intent = stripped.split(':', 1)[1].strip()
+            elif stripped.startswith('- ') and line.startswith('    ') and intent and intent.startswith('faq/'):
+                examples.append((stripped[2:].strip(), intent))
+    return examples
+
+def report(name, predictions, examples, latencies):
+    correct = sum(predicted == intent for predicted, (_, intent) in zip(predictions, examples))
+    answered = [(predicted, intent) for predicted, (_, intent) in zip(predictions, examples) if predicted]
+    precision = sum(p == i for p, i in answered) / len(answered) if answered else 0.0
+    print(f"  {name:<18}{correct / len(examples):>9.0%}{len(answered) / len(examples):>10.0%}"
+          f"{precision:>11.0%}{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}")
+
+def bench_faq_index(examples, threshold):
+    intents = {faq.faq_id: intent for intent, faq in SEED_FAQS.items()}
+    index = FaqIndex(SEED_FAQS.values(), threshold=threshold)
+    predictions, latencies = [], []
+    for text, _ in examples:
+        with Timer() as t:
+            found = index.match(text)
+        latencies.append(t.elapsed)
+        predictions.append(intents[found.faq.faq_id] if found else None)
+    report(f"FaqIndex (>={threshold})", predictions, examples, latencies)
+
+def latest_model(path):
+    if os.path.isfile(path):
+        return path
+    models = sorted(glob.glob(os.path.join(path, '*.tar.gz')), key=os.path.getmtime)
+    return models[-1] if models else None
+
+def bench_response_selector(examples, model_path):
+    try:
+        from rasa.core.agent import Agent
+    except ImportError:
+        print("  ResponseSelector  skipped: Rasa is not installed")
+        return
+    model = latest_model(model_path)
+    if not model:
+        print(f"  ResponseSelector  skipped: no trained model in {model_path} (run rasa train)")
+        return
+
+    agent = Agent.load(model)
+
+    async def parse_all():
+        predictions, latencies = [], []
+        for text, _ in examples:
+            with Timer() as t:
+                result = await agent.parse_message(text)
+            latencies.append(t.elapsed)
+            selector = result.get('response_selector', {})
+            response = (selector.get('faq') or selector.get('default') or {}).get('response', {})
+            if result['intent']['name'] == 'faq':
+                predictions.append(response.get('intent_response_key'))
+            else:
+                predictions.append(None)
+        return predictions, latencies
+
+    predictions, latencies = asyncio.run(parse_all())
+    report("ResponseSelector", predictions, examples, latencies)
+
+def bench_scaling(size, rng):
+    faqs = [FaqEntry(i, rng.choice(FORMS).format(rng.choice(TOPICS)) + f" ({i})",
+                     f"Answer {i} about {rng.choice(TOPICS)} and {rng.choice(TOPICS)}.")
+            for i in range(1, size + 1)]
+    with Timer() as build:
+        index = FaqIndex(faqs)
+
+    queries = [rng.choice(FORMS).format(rng.choice(TOPICS)) for _ in range(200)]
+    latencies = []
+    for query in queries:
+        with Timer() as t:
+            index.match(query)
+        latencies.append(t.elapsed)
+
+    # FAQs edited in the admin UI: the first brings new n-grams and recompiles the
+    # matrix, the next is patched over it
+    with Timer() as recompile:
+        index.add(FaqEntry(1, "How do I change my delivery address?", "From your account page."))
+    with Timer() as update:
+        index.add(FaqEntry(2, "How do I change my delivery address?", "From your account page."))
+
+    print(f"  {size:>8}{build.elapsed:>10.2f}{recompile.elapsed * 1000:>14.1f}{update.elapsed * 1000:>11.2f}"
+          f"{percentile(latencies, 50) * 1000:>10.3f}{percentile(latencies, 99) * 1000:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(ROOT, 'models'), help='model file or directory')
+    parser.add_argument('--threshold', type=float, default=None, help='FaqIndex match threshold')
+    parser.add_argument('--sizes', default='100,1000,10000', help='synthetic FAQ table sizes')
+    args = parser.parse_args()
+
+    examples = load_examples()
+    threshold = args.threshold if args.threshold is not None else FaqIndex().threshold
+    print(f"Accuracy on {len(examples)} faq examples from data/nlu.yml")
+    print(f"  {'':<18}{'accuracy':>9}{'answered':>10}{'precision':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    bench_faq_index(examples, 0.0)
+    bench_faq_index(examples, threshold)
+    bench_response_selector(examples, args.model)
+
+    print("\nFaqIndex on synthetic FAQ tables")
+    print(f"  {'faqs':>8}{'build s':>10}{'recompile ms':>14}{'patch ms':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    rng = random.Random(7)
+    for size in (int(s) for s in args.sizes.split(',')):
+        bench_scaling(size, rng)
+
+if __name__ == '__main__':
+    main()
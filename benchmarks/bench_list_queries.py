@@ -0,0 +1,113 @@
+"""
+Query count and wall time of the full list paths, before and after
+projecting columns in one statement.
+
+"before" is the previous code: ORM objects with o.user, o.product and
+u.role read through lazy relationships, which costs one extra SELECT per
+distinct user, product or role. "after" is the current OrderManager /
+UserManager.get_all and the chatbot's order status lookup.
+
+Each size gets its own SQLite database seeded with database/seed.py
+(orders, with users = orders / 20 and products = orders / 10).
+
+Usage:
+    python benchmarks/bench_list_queries.py
+    python benchmarks/bench_list_queries.py --sizes 10000,100000 --lookups 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from bench_utils import Timer
+
+from sqlalchemy import event
+from models import Order, User, Role, get_engine, session_scope
+from migrations import MigrationRunner
+from seed import seed_database
+from auth import OrderManager, UserManager
+import actions.actions as actions
+
+def orders_before():
+    with session_scope() as session:
+        return [{'order_id': o.order_id, 'username': o.user.username, 'product_name': o.product.product_name,
+                 'status': o.status,
+                 'estimated_delivery': str(o.estimated_delivery) if o.estimated_delivery else None}
+                for o in session.query(Order).join(Order.product).join(Order.user).all()]
+
+def users_before():
+    with session_scope() as session:
+        return [{'user_id': u.user_id, 'username': u.username, 'role_name': u.role.role_name}
+                for u in session.query(User).join(Role).all()]
+
+def order_status_before(order_id):
+    with session_scope() as session:
+        order = session.query(Order).filter_by(order_id=order_id).first()
+        return order and (order.status, order.product.product_name, order.estimated_delivery)
+
+class QueryCounter:
+    """Counts statements sent to the database by an engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+
+    def before_cursor_execute(self, *args):
+        self.count += 1
+
+def measure(counter, fn):
+    counter.count = 0
+    with Timer() as t:
+        result = fn()
+    return counter.count, t.elapsed, result
+
+def seed(size):
+    fd, path = tempfile.mkstemp(prefix='chatbot_bench_lists_', suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+    engine = get_engine()
+    MigrationRunner(engine).upgrade()
+    with engine.begin() as conn:
+        conn.execute(Role.__table__.insert(), [{'role_name': 'End User'}, {'role_name': 'System Admin'}])
+    seed_database({'users': max(size // 20, 1), 'products': max(size // 10, 1), 'orders': size,
+                   'unanswered': 0, 'faqs': 0}, engine=engine)
+    return engine, path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='orders per database')
+    parser.add_argument('--lookups', type=int, default=1000, help='order status lookups per size')
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        print(f"\nSeeding {size:,} orders...")
+        engine, path = seed(size)
+        counter = QueryCounter(engine)
+        with session_scope() as session:
+            order_ids = [row[0] for row in session.query(Order.order_id)]
+        lookups = random.Random(size).sample(order_ids, min(args.lookups, len(order_ids)))
+
+        cases = [
+            ('orders get_all', orders_before, OrderManager().get_all),
+            ('users get_all', users_before, UserManager().get_all),
+            (f"order status x{len(lookups)}",
+             lambda: [order_status_before(i) for i in lookups],
+             lambda: [actions.fetch_order_status_sync(i) for i in lookups]),
+        ]
+        for name, before, after in cases:
+            queries_before, time_before, rows_before = measure(counter, before)
+            queries_after, time_after, rows_after = measure(counter, after)
+            assert len(rows_before) == len(rows_after)
+            results.append((size, name, queries_before, time_before, queries_after, time_after))
+
+        engine.dispose()
+        os.remove(path)
+
+    print(f"\n{'orders':>10}  {'path':<20}{'queries':>10}{'before s':>10}{'queries':>10}{'after s':>10}{'speedup':>9}")
+    for size, name, queries_before, time_before, queries_after, time_after in results:
+        print(f"{size:>10,}  {name:<20}{queries_before:>10,}{time_before:>10.2f}{queries_after:>10,}"
+              f"{time_after:>10.2f}{time_before / time_after:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
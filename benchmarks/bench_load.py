@@ -0,0 +1,493 @@
+"""
+Load generator for the action server and the admin API.
+
+Scenarios (--scenario, default both):
+    actions  synthetic conversation turns posted to the action server's
+             /webhook: action_fetch_order_status, action_get_product_info
+             and action_log_unknown_question
+    admin    an admin session against admin_api/server.py: list pages,
+             filters, ?q= search, unanswered clusters and product
+             create/update/delete
+
+Load models:
+    --concurrency N   closed loop: N workers, each sending its next request
+                      as soon as the previous one completes
+    --rate R          open loop: Poisson arrivals at R requests/s, whatever
+                      the response times; latency is measured from the
+                      scheduled send time, so queueing behind a slow server
+                      is counted instead of hidden
+
+The report lists p50/p95/p99/max latency, throughput, errors and a latency
+histogram per operation. --output writes it as JSON, and --compare prints
+the change against an earlier JSON report, e.g. of the previous release.
+
+Servers are either already running (--actions-url, --admin-url) or started
+by --spawn on DATABASE_URL, or on a temporary SQLite database seeded with
+database/seed.py when DATABASE_URL is not set.
+
+Usage:
+    python benchmarks/bench_load.py --spawn --duration 30 --concurrency 20 --output before.json
+    python benchmarks/bench_load.py --spawn --rate 200 --duration 60 --compare before.json
+    python benchmarks/bench_load.py --scenario admin --admin-url http://localhost:5000 --concurrency 50
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from bench_utils import ROOT, percentile
+
+from seed import generate_question
+
+# Upper bounds of the histogram buckets, in milliseconds
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+ACTION_MIX = [('order_status', 4), ('product_info', 4), ('unknown_question', 2)]
+ADMIN_MIX = [('list_orders', 30), ('filter_orders', 10), ('list_products', 10), ('search', 15),
+             ('unanswered_clusters', 10), ('create_product', 10), ('update_product', 10), ('delete_product', 5)]
+
+class HttpClient:
+    """
+    Keep-alive HTTP/1.1 connections to one host, shared by all threads.
+
+    A request takes the most recently used idle connection and only opens a
+    new one when all are busy, so bursts of open-loop arrivals do not pay
+    for (or measure) a TCP handshake each.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.connections_opened += 1
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn, response):
+        if response.will_close:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, parsed JSON body or None); retries once if the server closed an idle connection"""
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            conn = self._acquire()
+            try:
+                conn.request(method, path, payload, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError, socket.timeout):
+                conn.close()
+                if attempt == 2:
+                    raise
+                continue
+            self._release(conn, response)
+            break
+        if response.getheader('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+class Recorder:
+    """Latency samples, error counts and the first error of each operation"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.first_errors = {}
+        self._lock = threading.Lock()
+        self.recording = False
+
+    def record(self, operation, seconds, error=None):
+        if not self.recording:
+            return
+        with self._lock:
+            self.samples.setdefault(operation, []).append(seconds)
+            if error is not None:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+                self.first_errors.setdefault(operation, error)
+
+def histogram(latencies_ms):
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for value in latencies_ms:
+        for i, bound in enumerate(HISTOGRAM_BOUNDS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f"le_{bound}" for bound in HISTOGRAM_BOUNDS] + ['inf']
+    return dict(zip(labels, counts))
+
+def summarize(recorder, elapsed):
+    operations = {}
+    for operation in sorted(recorder.samples):
+        latencies = [s * 1000 for s in recorder.samples[operation]]
+        operations[operation] = {
+            'count': len(latencies),
+            'errors': recorder.errors.get(operation, 0),
+            'first_error': recorder.first_errors.get(operation),
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': max(latencies),
+            'histogram': histogram(latencies),
+        }
+    return operations
+
+class ActionScenario:
+    """Builds /webhook calls like the ones Rasa sends for each custom action"""
+
+    def __init__(self, client, order_ids, product_names):
+        self.client = client
+        self.order_ids = order_ids
+        self.product_names = product_names
+
+    def payload(self, action, sender_id, slots, text=''):
+        tracker = {
+            'sender_id': sender_id,
+            'slots': slots,
+            'latest_message': {'text': text, 'intent': {}, 'entities': []},
+            'events': [],
+            'paused': False,
+            'followup_action': None,
+            'active_loop': {},
+            'latest_action_name': 'action_listen',
+        }
+        return {'next_action': action, 'sender_id': sender_id, 'tracker': tracker, 'domain': {},
+                'version': '3.0.0'}
+
+    def run(self, operation, rng):
+        sender_id = f"load-{rng.randrange(100000)}"
+        if operation == 'order_status':
+            body = self.payload('action_fetch_order_status', sender_id,
+                                {'ordernumber': str(rng.choice(self.order_ids))})
+        elif operation == 'product_info':
+            name = rng.choice(self.product_names)
+            # Customers often type part of a name
+            if rng.random() < 0.3:
+                name = name.split()[-2] if len(name.split()) > 1 else name[:4]
+            body = self.payload('action_get_product_info', sender_id, {'productname': name})
+        else:
+            body = self.payload('action_log_unknown_question', sender_id, {}, generate_question(rng))
+        status, result = self.client.request('POST', '/webhook', body)
+        return check(status, result)
+
+class AdminScenario:
+    """List, search and CRUD traffic of a logged-in admin"""
+
+    def __init__(self, client, token, product_names):
+        self.client = client
+        self.headers = {'Authorization': f"Bearer {token}", 'Accept-Encoding': 'gzip'}
+        self.product_names = product_names
+        # Products created by this run, to update and delete
+        self.created = deque()
+        self._lock = threading.Lock()
+
+    def created_product(self, rng, remove=False):
+        with self._lock:
+            if not self.created:
+                return None
+            if remove:
+                return self.created.popleft()
+            return self.created[rng.randrange(len(self.created))]
+
+    def run(self, operation, rng):
+        get = lambda path: self.client.request('GET', path, headers=self.headers)
+        if operation == 'list_orders':
+            status, result = get("/api/orders?limit=50&shape=columns")
+        elif operation == 'filter_orders':
+            status, result = get(f"/api/orders?limit=50&status={rng.choice(['pending', 'shipped', 'processing'])}")
+        elif operation == 'list_products':
+            status, result = get("/api/products?limit=50")
+        elif operation == 'search':
+            word = rng.choice(rng.choice(self.product_names).split())
+            status, result = get(f"/api/search?q={word.lower()[:rng.randint(3, 8)]}")
+        elif operation == 'unanswered_clusters':
+            status, result = get("/api/unanswered/clusters?limit=50&status=new")
+        elif operation == 'update_product' and self.created:
+            product_id = self.created_product(rng)
+            status, result = self.client.request('PUT', f"/api/products/{product_id}",
+                                                 {'stock': rng.randint(0, 500)}, self.headers)
+        elif operation == 'delete_product' and self.created:
+            status, result = self.client.request('DELETE', f"/api/products/{self.created_product(rng, True)}",
+                                                 headers=self.headers)
+        else:
+            # The bulk endpoint returns the new id, which later updates and deletes need
+            status, result = self.client.request('POST', '/api/products/bulk?op=create', [{
+                'name': f"Load Test Product {rng.randrange(10 ** 9)}",
+                'stock': rng.randint(0, 500), 'moq': 1, 'quantity_type': 'pcs'}], self.headers)
+            error = check(status, result) or check(status, result['results'][0])
+            if error is None:
+                with self._lock:
+                    self.created.append(result['results'][0]['product_id'])
+            return error
+        return check(status, result)
+
+def weighted_operations(mix):
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    return lambda rng: rng.choices(names, weights=weights)[0]
+
+def check(status, result, expect_success=True):
+    """None if the response is a success, else a short description of the failure"""
+    if not 200 <= status < 300:
+        return f"HTTP {status}: {str(result)[:200]}"
+    # The admin API reports failed writes as success: false with a 200
+    if expect_success and isinstance(result, dict) and result.get('success') is False:
+        return f"success false: {result.get('message')}"
+    return None
+
+def execute(recorder, scenarios, rng, scheduled=None):
+    """Run one request of a randomly chosen scenario and operation"""
+    scenario, name, pick = rng.choice(scenarios)
+    operation = pick(rng)
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        error = scenario.run(operation, rng)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    recorder.record(f"{name}.{operation}", time.perf_counter() - start, error)
+
+def closed_loop(recorder, scenarios, concurrency, deadline, seed):
+    def worker(index):
+        rng = random.Random(f"{seed}:{index}")
+        while time.perf_counter() < deadline:
+            execute(recorder, scenarios, rng)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def open_loop(recorder, scenarios, rate, deadline, seed, max_inflight):
+    rng = random.Random(f"{seed}:arrivals")
+    local = threading.local()
+
+    def task(scheduled):
+        if not hasattr(local, 'rng'):
+            local.rng = random.Random(f"{seed}:{threading.get_ident()}")
+        execute(recorder, scenarios, local.rng, scheduled)
+
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Requests that cannot start yet wait in the pool queue; that wait counts as latency
+            pool.submit(task, next_arrival)
+            next_arrival += rng.expovariate(rate)
+
+def wait_for_port(url, timeout=60):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((parts.hostname, parts.port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+def spawn_servers(args):
+    """Set up and seed the database, then start both servers; returns their processes"""
+    from bench_utils import use_temp_sqlite
+
+    url = use_temp_sqlite()
+    env = dict(os.environ, DATABASE_URL=url, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, 'database')]))
+    print(f"Seeding {url} ...")
+    subprocess.run([sys.executable, os.path.join(ROOT, 'database', 'setup.py'), 'seed',
+                    '--users', str(args.seed_users), '--products', str(args.seed_products),
+                    '--orders', str(args.seed_orders), '--unanswered', str(args.seed_unanswered),
+                    '--faqs', '50', '--random-seed', str(args.seed)],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+
+    admin_port = urlsplit(args.admin_url).port
+    actions_port = urlsplit(args.actions_url).port
+    processes = [
+        subprocess.Popen([sys.executable, '-c', f"import server; server.app.run(port={admin_port}, threaded=True)"],
+                         cwd=os.path.join(ROOT, 'admin_api'), env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen([sys.executable, '-m', 'rasa_sdk', '--actions', 'actions', '--port', str(actions_port)],
+                         cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+    ]
+    try:
+        wait_for_port(args.admin_url)
+        wait_for_port(args.actions_url)
+    except Exception:
+        stop_servers(processes)
+        raise
+    return processes
+
+def stop_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def discover(admin, headers):
+    """Order ids and product names to ask about, taken from the admin API"""
+    order_ids, product_names = [12345, 98765, 12346], ['Jacket', 'Shoes', 'Headphones']
+    if admin is None:
+        return order_ids, product_names
+    status, result = admin.request('GET', '/api/orders?limit=1000&fields=order_id&shape=columns', headers=headers)
+    if status == 200 and result['data']:
+        order_ids = [row[result['fields'].index('order_id')] for row in result['data']]
+    status, result = admin.request('GET', '/api/products?limit=1000&fields=product_name&shape=columns',
+                                   headers=headers)
+    if status == 200 and result['data']:
+        product_names = [row[result['fields'].index('product_name')] for row in result['data']]
+    return order_ids, product_names
+
+def print_report(report, baseline=None):
+    meta = report['meta']
+    load = f"rate {meta['rate']}/s" if meta['rate'] else f"concurrency {meta['concurrency']}"
+    print(f"\n{meta['scenario']} scenario, {load}, {meta['duration']}s on {meta['database']}")
+    print(f"{'operation':<32}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'max ms':>9}")
+    for operation, stats in report['operations'].items():
+        print(f"{operation:<32}{stats['count']:>8}{stats['errors']:>8}{stats['throughput']:>9.1f}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}")
+
+    print("\nLatency histogram (ms, upper bound)")
+    labels = list(histogram([]).keys())
+    print(f"{'operation':<32}" + ''.join(f"{label.replace('le_', '≤'):>7}" for label in labels))
+    for operation, stats in report['operations'].items():
+        print(f"{operation:<32}" + ''.join(f"{stats['histogram'][label]:>7}" for label in labels))
+
+    failing = {operation: stats['first_error'] for operation, stats in report['operations'].items()
+               if stats['first_error']}
+    if failing:
+        print("\nFirst error of each failing operation")
+        for operation, error in failing.items():
+            print(f"{operation:<32}{error}")
+
+    if baseline:
+        print(f"\nChange against the baseline ({baseline['meta']['started_at']})")
+        print(f"{'operation':<32}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for operation, stats in report['operations'].items():
+            before = baseline['operations'].get(operation)
+            if not before:
+                print(f"{operation:<32}{'new':>10}")
+                continue
+            change = lambda key: (f"{(stats[key] - before[key]) / before[key]:+.0%}" if before[key] else 'n/a')
+            print(f"{operation:<32}{change('throughput'):>10}{change('p50_ms'):>10}{change('p95_ms'):>10}"
+                  f"{change('p99_ms'):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=['actions', 'admin', 'both'], default='both')
+    parser.add_argument('--concurrency', type=int, default=10, help='closed-loop workers')
+    parser.add_argument('--rate', type=float, default=None, help='open-loop arrivals per second')
+    parser.add_argument('--max-inflight', type=int, default=256, help='open-loop request threads')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before measuring')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the traffic and of --spawn data')
+    parser.add_argument('--actions-url', default='http://127.0.0.1:5055')
+    parser.add_argument('--admin-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--admin-user', default='system_admin')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--spawn', action='store_true', help='set up a database and start both servers')
+    parser.add_argument('--seed-users', type=int, default=5000)
+    parser.add_argument('--seed-products', type=int, default=10000)
+    parser.add_argument('--seed-orders', type=int, default=100000)
+    parser.add_argument('--seed-unanswered', type=int, default=20000)
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--compare', help='JSON report to compare against')
+    args = parser.parse_args()
+
+    processes = spawn_servers(args) if args.spawn else []
+    try:
+        admin = HttpClient(args.admin_url)
+        token = headers = None
+        if args.scenario != 'actions' or args.spawn:
+            status, result = admin.request('POST', '/api/login', {'username': args.admin_user,
+                                                                  'password': args.admin_password})
+            if status != 200:
+                raise SystemExit(f"Admin login failed: {status} {result}")
+            token = result['token']
+            headers = {'Authorization': f"Bearer {token}"}
+        else:
+            admin = None
+        order_ids, product_names = discover(admin, headers)
+
+        scenarios = []
+        if args.scenario in ('actions', 'both'):
+            scenarios.append((ActionScenario(HttpClient(args.actions_url), order_ids, product_names),
+                              'actions', weighted_operations(ACTION_MIX)))
+        if args.scenario in ('admin', 'both'):
+            scenarios.append((AdminScenario(admin, token, product_names),
+                              'admin', weighted_operations(ADMIN_MIX)))
+
+        recorder = Recorder()
+        started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        warmup_end = time.perf_counter() + args.warmup
+        deadline = warmup_end + args.duration
+        threading.Timer(args.warmup, lambda: setattr(recorder, 'recording', True)).start()
+        if args.rate:
+            open_loop(recorder, scenarios, args.rate, deadline, args.seed, args.max_inflight)
+        else:
+            closed_loop(recorder, scenarios, args.concurrency, deadline, args.seed)
+        elapsed = time.perf_counter() - warmup_end
+    finally:
+        stop_servers(processes)
+
+    database = os.getenv('DATABASE_URL', 'external servers').split('://')[0]
+    report = {
+        'meta': {
+            'scenario': args.scenario,
+            'concurrency': None if args.rate else args.concurrency,
+            'rate': args.rate,
+            'duration': args.duration,
+            'database': database,
+            'seed': args.seed,
+            'started_at': started_at,
+        },
+        'operations': summarize(recorder, elapsed),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nReport written to {args.output}")
+
+if __name__ == '__main__':
+    main()
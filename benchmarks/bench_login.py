@@ -0,0 +1,91 @@
+"""
+Login throughput benchmark for /api/login and /api/user/login.
+
+Runs 1, 10 and 50 concurrent clients against the Flask app (test client)
+and reports successful logins per second, p50/p99 latency and how many
+attempts were refused by the verification pool (503) or by admission
+control (429). Users start with legacy SHA-256 hashes, so the first round
+also measures the transparent upgrade to the configured KDF.
+
+A final "flood" round sends repeated attempts for one user from one
+address to show that throttled requests are rejected without hashing.
+
+Usage:
+    python benchmarks/bench_login.py
+    PASSWORD_KDF=scrypt PASSWORD_WORKERS=4 python benchmarks/bench_login.py
+"""
+import argparse
+import hashlib
+import threading
+
+from bench_utils import use_temp_sqlite, percentile, Timer
+
+use_temp_sqlite()
+
+from models import Base, Role, User, session_scope, get_engine
+from passwords import LoginThrottle
+import server
+
+def seed_users(count):
+    Base.metadata.create_all(get_engine())
+    with session_scope() as session:
+        if session.query(User).first():
+            return
+        role = Role(role_name='End User')
+        session.add(role)
+        session.flush()
+        legacy = hashlib.sha256(b'bench-password').hexdigest()
+        session.add_all([User(username=f"bench_login_{i}", password=legacy, role_id=role.role_id)
+                         for i in range(count)])
+        session.commit()
+
+def run_level(clients, attempts, users, fixed_user=None):
+    latencies = []
+    codes = {}
+    lock = threading.Lock()
+
+    def client(n):
+        http = server.app.test_client()
+        for i in range(attempts):
+            username = fixed_user or f"bench_login_{(n * attempts + i) % users}"
+            with Timer() as t:
+                response = http.post('/api/user/login', json={'username': username, 'password': 'bench-password'},
+                                     environ_base={'REMOTE_ADDR': f"10.0.{n // 250}.{n % 250}"})
+            with lock:
+                latencies.append(t.elapsed)
+                codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    with Timer() as t:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return codes.get(200, 0) / t.elapsed, latencies, codes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200, help='users to seed')
+    parser.add_argument('--attempts', type=int, default=10, help='logins per client')
+    parser.add_argument('--levels', default='1,10,50', help='concurrent clients to test')
+    args = parser.parse_args()
+
+    seed_users(args.users)
+    # Admission limits would throttle the benchmark itself
+    server.login_throttle = LoginThrottle(user_rate=1e9, user_burst=10 ** 9, ip_rate=1e9, ip_burst=10 ** 9)
+
+    print(f"{'clients':>8}{'logins/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'200':>7}{'401':>7}{'429':>7}{'503':>7}")
+    for clients in [int(level) for level in args.levels.split(',')]:
+        throughput, latencies, codes = run_level(clients, args.attempts, args.users)
+        print(f"{clients:>8}{throughput:>10.1f}{percentile(latencies, 50) * 1000:>10.2f}"
+              f"{percentile(latencies, 99) * 1000:>10.2f}"
+              + ''.join(f"{codes.get(code, 0):>7}" for code in (200, 401, 429, 503)))
+
+    server.login_throttle = LoginThrottle()
+    _, latencies, codes = run_level(1, 200, args.users, fixed_user='bench_login_0')
+    print(f"flood: {codes.get(429, 0)} of {sum(codes.values())} attempts throttled, "
+          f"p50 {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"Password pool: {server.auth.verifier.stats()}")
+
+if __name__ == '__main__':
+    main()
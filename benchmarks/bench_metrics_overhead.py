@@ -0,0 +1,132 @@
+"""
+Cost of the built-in metrics, measured on and off in the same process.
+
+- admin API: full Flask requests to a list route, with the request hooks
+  enabled and disabled (server.METRICS_ENABLED)
+- SQL: a point lookup on an engine with and without the query events
+- actions: ActionFetchOrderStatus.run served from the order cache, with
+  and without the @measured wrapper (the worst case: nothing else to do)
+- rendering /metrics with every series populated
+
+The on/off runs are interleaved so drift in the machine affects both.
+
+Usage:
+    python benchmarks/bench_metrics_overhead.py
+    python benchmarks/bench_metrics_overhead.py --requests 5000 --queries 20000
+"""
+import argparse
+import asyncio
+import time
+
+from bench_utils import Timer, percentile, seed_sample_data, use_temp_sqlite
+
+use_temp_sqlite()
+seed_sample_data()
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from models import DEFAULT_SCHEMA, Role, get_database_url, get_engine, session_scope
+from permissions import permission_table
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+from metrics import default_registry
+import server
+import actions.actions as actions
+
+ROUNDS = 5
+
+def timed_calls(fn, number):
+    """Per-call latencies of fn, in seconds"""
+    latencies = []
+    for _ in range(number):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def compare(name, off, on, number):
+    """Interleave ROUNDS of each variant and report per-call medians"""
+    results = {'off': [], 'on': []}
+    for _ in range(ROUNDS):
+        results['off'] += timed_calls(off, number // ROUNDS)
+        results['on'] += timed_calls(on, number // ROUNDS)
+    p50_off, p50_on = percentile(results['off'], 50), percentile(results['on'], 50)
+    p99_off, p99_on = percentile(results['off'], 99), percentile(results['on'], 99)
+    print(f"{name:<28}{p50_off * 1e6:>10.1f}{p50_on * 1e6:>10.1f}{(p50_on - p50_off) * 1e6:>10.1f}"
+          f"{(p50_on / p50_off - 1):>9.1%}{p99_off * 1e6:>10.1f}{p99_on * 1e6:>10.1f}")
+
+def bench_admin_api(number):
+    with session_scope() as session:
+        if not session.query(Role).filter_by(role_name='System Admin').first():
+            session.add(Role(role_name='System Admin'))
+            session.commit()
+    permission_table.seed_defaults()
+    permission_table.reload()
+    client = server.app.test_client()
+    token = server.session_store.create({'user_id': 1, 'username': 'bench', 'role': 'System Admin'})
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def request():
+        response = client.get('/api/orders?limit=20', headers=headers)
+        assert response.status_code == 200, response.status_code
+
+    def set_enabled(enabled):
+        def call():
+            server.METRICS_ENABLED = enabled
+            request()
+        return call
+
+    request()
+    compare('admin GET /api/orders', set_enabled(False), set_enabled(True), number)
+    server.METRICS_ENABLED = True
+
+def bench_queries(number):
+    instrumented = get_engine()
+    # Same settings as get_engine() uses for SQLite, without the query events
+    plain = create_engine(get_database_url(),
+                          execution_options={'schema_translate_map': {DEFAULT_SCHEMA: None}})
+    query = actions.order_status_query(1)
+
+    def lookup(engine):
+        def call():
+            with Session(engine) as session:
+                session.execute(query).first()
+        return call
+
+    compare('SQL point lookup', lookup(plain), lookup(instrumented), number)
+    plain.dispose()
+
+def bench_action(number):
+    action = actions.ActionFetchOrderStatus()
+    tracker = Tracker('bench', {'ordernumber': '1'}, {'text': 'where is order 1'}, [], False, None, {}, None)
+    loop = asyncio.new_event_loop()
+    measured = action.run
+    bare = actions.ActionFetchOrderStatus.run.__wrapped__.__get__(action)
+
+    def run(method):
+        return lambda: loop.run_until_complete(method(CollectingDispatcher(), tracker, {}))
+
+    # Prime the order cache so the action does no I/O
+    run(bare)()
+    compare('action run (cache hit)', run(bare), run(measured), number)
+    loop.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='admin API requests per variant')
+    parser.add_argument('--queries', type=int, default=10000, help='SQL lookups per variant')
+    parser.add_argument('--runs', type=int, default=20000, help='action runs per variant')
+    args = parser.parse_args()
+
+    print(f"{'':<28}{'off us':>10}{'on us':>10}{'cost us':>10}{'cost':>9}{'p99 off':>10}{'p99 on':>10}")
+    bench_admin_api(args.requests)
+    bench_queries(args.queries)
+    bench_action(args.runs)
+
+    with Timer() as render:
+        text = default_registry.render()
+    series = sum(1 for line in text.splitlines() if line and not line.startswith('#'))
+    print(f"\nRendering /metrics: {series} samples in {render.elapsed * 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
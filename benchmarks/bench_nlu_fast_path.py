@@ -0,0 +1,147 @@
+"""
+Share of NLU traffic the fast path classifies, and the latency it saves.
+
+The traffic is built from the examples in data/nlu.yml with their
+annotated order numbers replaced by random five-digit numbers (the shape
+used in data/nlu.yml) and product names by those of the benchmark
+database, plus --reply-share of bare slot-filling replies
+(an order number or a product name on its own, as users answer
+utter_ask_ordernumber and utter_ask_productname).
+
+Without --model the full pipeline is not run: the table shows the share
+short-circuited per intent and what matching costs, and the saving is
+estimated from --pipeline-ms, the time the featurizers and DIETClassifier
+take per message on your hardware. With --model (a model trained with
+config.yml, Rasa installed) every message is parsed through the model and
+the saving is measured from the parse times of fast path and model
+messages.
+
+Usage:
+    python benchmarks/bench_nlu_fast_path.py
+    python benchmarks/bench_nlu_fast_path.py --messages 50000 --pipeline-ms 12
+    python benchmarks/bench_nlu_fast_path.py --model models/latest.tar.gz
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import time
+from collections import Counter
+
+from bench_utils import ROOT, percentile, seed_sample_data, use_temp_sqlite
+
+use_temp_sqlite()
+seed_sample_data()
+
+from nlu_components.fast_path import DEFAULT_ORDER_MIN_DIGITS, FastPathMatcher, load_product_names
+
+ANNOTATION = re.compile(r"\[([^\]]+)\]\((\w+)\)")
+
+def read_examples(path):
+    """(intent, example) pairs of an NLU file, without needing a YAML parser"""
+    examples = []
+    intent = None
+    for line in open(path, encoding='utf-8'):
+        stripped = line.strip()
+        if stripped.startswith('- intent:'):
+            intent = stripped.split(':', 1)[1].strip()
+        elif stripped.startswith('- ') and intent and line.startswith('    '):
+            examples.append((intent, stripped[2:]))
+    return examples
+
+def build_traffic(examples, product_names, args):
+    """Messages with the intent they were written for"""
+    rng = random.Random(args.seed)
+    values = {'ordernumber': lambda: str(rng.randint(10000, 99999)),
+              'productname': lambda: rng.choice(product_names)}
+    traffic = []
+    for _ in range(args.messages):
+        if rng.random() < args.reply_share:
+            if rng.random() < 0.5:
+                traffic.append(('orderstatus', values['ordernumber']()))
+            else:
+                traffic.append(('productinfo', values['productname']()))
+            continue
+        intent, example = rng.choice(examples)
+        traffic.append((intent, ANNOTATION.sub(lambda m: values.get(m.group(2), lambda: m.group(1))(), example)))
+    return traffic
+
+def run_matcher(matcher, traffic):
+    """Per-message matching time and the (expected intent, match) pairs"""
+    timings = []
+    results = []
+    for intent, text in traffic:
+        start = time.perf_counter()
+        match = matcher.match(text)
+        timings.append(time.perf_counter() - start)
+        results.append((intent, match))
+    return timings, results
+
+def parse_with_model(model, traffic, limit):
+    """Parse times of fast path and model messages through a trained Rasa model"""
+    from rasa.core.agent import Agent
+
+    agent = Agent.load(model)
+    times = {True: [], False: []}
+
+    async def parse_all():
+        for _, text in traffic[:limit]:
+            start = time.perf_counter()
+            parsed = await agent.parse_message(text)
+            times[bool(parsed.get('fast_path'))].append(time.perf_counter() - start)
+
+    asyncio.run(parse_all())
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000, help='messages in the traffic mix')
+    parser.add_argument('--reply-share', type=float, default=0.3, help='share of bare slot-filling replies')
+    parser.add_argument('--pipeline-ms', type=float, default=None,
+                        help='featurizer + DIETClassifier time per message, to estimate the saving')
+    parser.add_argument('--model', help='trained model to measure parse latency with (needs Rasa)')
+    parser.add_argument('--model-messages', type=int, default=2000, help='messages parsed through --model')
+    parser.add_argument('--order-min-digits', type=int, default=DEFAULT_ORDER_MIN_DIGITS,
+                        help='shortest number taken as an order number')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    product_names = load_product_names()
+    examples = read_examples(os.path.join(ROOT, 'data', 'nlu.yml'))
+    traffic = build_traffic(examples, product_names, args)
+
+    start = time.perf_counter()
+    matcher = FastPathMatcher(product_names, order_min_digits=args.order_min_digits)
+    compile_ms = (time.perf_counter() - start) * 1000
+    timings, results = run_matcher(matcher, traffic)
+
+    totals = Counter(intent for intent, _ in results)
+    matched = Counter(intent for intent, match in results if match)
+    wrong = sum(1 for intent, match in results if match and match.intent != intent)
+    share = sum(matched.values()) / len(results)
+
+    print(f"{len(traffic)} messages, {len(product_names)} product names (automaton compiled in {compile_ms:.1f} ms)")
+    print(f"  {'intent':<22}{'messages':>10}{'fast path':>11}{'share':>8}")
+    for intent, count in sorted(totals.items()):
+        print(f"  {intent:<22}{count:>10}{matched[intent]:>11}{matched[intent] / count:>8.1%}")
+    print(f"  {'all':<22}{len(results):>10}{sum(matched.values()):>11}{share:>8.1%}")
+    print(f"  fast path answers with a different intent than the example's: {wrong}")
+    print(f"  matching: mean {sum(timings) / len(timings) * 1e6:.1f} us, "
+          f"p99 {percentile(timings, 99) * 1e6:.1f} us per message")
+
+    if args.model:
+        times = parse_with_model(args.model, traffic, args.model_messages)
+        fast, full = times[True], times[False]
+        if fast and full:
+            fast_ms = sum(fast) / len(fast) * 1000
+            full_ms = sum(full) / len(full) * 1000
+            print(f"  parse: fast path {fast_ms:.2f} ms, model {full_ms:.2f} ms per message; "
+                  f"mean saving {share * (full_ms - fast_ms):.2f} ms per message over the mix")
+    elif args.pipeline_ms is not None:
+        overhead_ms = sum(timings) / len(timings) * 1000
+        print(f"  estimated saving: {share * args.pipeline_ms - overhead_ms:.2f} ms per message "
+              f"({share:.1%} of {args.pipeline_ms} ms, less the matching cost on every message)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Search benchmark for the in-process fallback indexes.
+
+Builds synthetic product names and customer questions (300k by default)
+and compares, per query, a linear casefolded substring scan (what a LIKE
+'%q%' without a trigram index, or client-side filtering, has to do) with
+TrigramIndex (product names) and WordIndex (questions), plus the time and
+size of building each index.
+
+Usage:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --rows 100000,1000000 --limit 20
+"""
+import argparse
+import random
+
+from bench_utils import Timer, percentile
+
+from search import TrigramIndex, WordIndex
+
+BRANDS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Hooli', 'Vandelay']
+ADJECTIVES = ['Wireless', 'Portable', 'Smart', 'Compact', 'Deluxe', 'Classic', 'Rugged', 'Mini']
+NOUNS = ['Headphones', 'Jacket', 'Kettle', 'Backpack', 'Charger', 'Speaker', 'Lamp', 'Blender',
+         'Keyboard', 'Monitor', 'Sneakers', 'Camera']
+QUESTION_PARTS = [
+    'where is my order', 'can i return a', 'do you ship to', 'how long does delivery take for the',
+    'is the {} in stock', 'what colours does the {} come in', 'my {} arrived broken',
+    'can i pay for the {} in instalments'
+]
+
+PRODUCT_QUERIES = ['headphones', 'acme wire', 'x1234', 'kettle 9', 'jakcet', 'lamp']
+QUESTION_QUERIES = ['order', 'deliv', 'return jacket', 'stock speaker', 'broken kettle']
+
+def make_names(count, rng):
+    return [f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} X{rng.randint(1, 99999)}"
+            for _ in range(count)]
+
+def make_questions(count, rng):
+    return [rng.choice(QUESTION_PARTS).format(rng.choice(NOUNS).lower()) + f" #{i}" for i in range(count)]
+
+def scan(texts, query, limit):
+    query = query.casefold()
+    matches = [i for i, text in enumerate(texts) if query in text.casefold()]
+    return matches[:limit]
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        with Timer() as t:
+            result = fn()
+        samples.append(t.elapsed * 1000)
+    return percentile(samples, 50), result
+
+def run(kind, index_type, texts, queries, limit):
+    with Timer() as build:
+        index = index_type()
+        for i, text in enumerate(texts):
+            index.add(i, text)
+    print(f"  {kind}: built {len(index)} docs in {build.elapsed:.2f}s")
+    print(f"  {'query':<16}{'scan ms':>9}{'index ms':>10}{'hits':>8}")
+    for query in queries:
+        scan_ms, _ = timed(lambda: scan(texts, query, limit))
+        index_ms, ranked = timed(lambda: index.search(query, limit))
+        hits = len(index.search(query))
+        print(f"  {query:<16}{scan_ms:>9.1f}{index_ms:>10.2f}{hits:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='300000', help='document counts to test')
+    parser.add_argument('--limit', type=int, default=20, help='results per query')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for count in [int(n) for n in args.rows.split(',')]:
+        print(f"{count} rows")
+        run('products', TrigramIndex, make_names(count, rng), PRODUCT_QUERIES, args.limit)
+        run('questions', WordIndex, make_questions(count, rng), QUESTION_QUERIES, args.limit)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Serialization and compression benchmark for admin list responses.
+
+Builds synthetic order rows (10k and 100k by default) and compares:
+
+    legacy     - a dict per row (as the managers used to build) + stdlib
+                 json.dumps with sorted keys, as Flask's jsonify did
+    objects    - RowSet through serialization.dumps (orjson if installed)
+    columns    - ?shape=columns: field names once, rows as arrays
+
+and the payload size of each shape uncompressed, gzipped and, when the
+brotli package is installed, brotli-compressed.
+
+Usage:
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --rows 10000,100000,1000000
+"""
+import argparse
+import gzip
+import json
+from datetime import date, timedelta
+
+from bench_utils import Timer
+
+import serialization
+from serialization import RowSet, dumps, COMPRESS_LEVEL, BROTLI_QUALITY
+
+FIELDS = ['order_id', 'user_id', 'username', 'product_id', 'product_name', 'status', 'estimated_delivery']
+STATUSES = ['pending', 'processing', 'shipped', 'delivered']
+
+def make_rows(count):
+    start = date(2025, 1, 1)
+    return [(i, i % 500 + 1, f"user_{i % 500 + 1}", i % 100 + 1, f"Product {i % 100 + 1}",
+             STATUSES[i % 4], start + timedelta(days=i % 365)) for i in range(1, count + 1)]
+
+def legacy(rows):
+    data = [{name: str(value) if isinstance(value, date) else value for name, value in zip(FIELDS, row)}
+            for row in rows]
+    return json.dumps({'success': True, 'data': data}, sort_keys=True).encode()
+
+def objects(rows):
+    return dumps({'success': True, 'data': RowSet(FIELDS, rows)})
+
+def columns(rows):
+    return dumps({'success': True, 'fields': FIELDS, 'data': rows})
+
+def best_of(fn, rows, repeat=3):
+    best, body = None, None
+    for _ in range(repeat):
+        with Timer() as t:
+            body = fn(rows)
+        best = t.elapsed if best is None else min(best, t.elapsed)
+    return best, body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,100000', help='row counts to test')
+    args = parser.parse_args()
+
+    backend = 'orjson' if serialization.orjson is not None else 'stdlib json'
+    print(f"serializer: {backend}, brotli: {'yes' if serialization.brotli else 'not installed'}")
+    print(f"{'rows':>8} {'shape':<8}{'encode ms':>11}{'raw KB':>10}{'gzip KB':>10}{'gzip ms':>9}"
+          f"{'br KB':>9}{'br ms':>8}")
+    for count in [int(n) for n in args.rows.split(',')]:
+        rows = make_rows(count)
+        for name, fn in (('legacy', legacy), ('objects', objects), ('columns', columns)):
+            elapsed, body = best_of(fn, rows)
+            with Timer() as gz:
+                gz_size = len(gzip.compress(body, COMPRESS_LEVEL))
+            line = (f"{count:>8} {name:<8}{elapsed * 1000:>11.1f}{len(body) / 1024:>10.0f}"
+                    f"{gz_size / 1024:>10.0f}{gz.elapsed * 1000:>9.1f}")
+            if serialization.brotli is not None:
+                with Timer() as br:
+                    br_size = len(serialization.brotli.compress(body, quality=BROTLI_QUALITY))
+                line += f"{br_size / 1024:>9.0f}{br.elapsed * 1000:>8.1f}"
+            print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Shared helpers for the benchmark scripts"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'database'))
+sys.path.append(os.path.join(ROOT, 'admin_api'))
+
+def use_temp_sqlite():
+    """Point DATABASE_URL at a throwaway SQLite file unless one is configured"""
+    if os.getenv('DATABASE_URL'):
+        return os.getenv('DATABASE_URL')
+    fd, path = tempfile.mkstemp(prefix='chatbot_bench_', suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+    return os.environ['DATABASE_URL']
+
+def seed_sample_data(products=100, orders=1000, users=10):
+    """Create the schema and a small deterministic data set if the tables are empty"""
+    from models import Base, Role, User, Product, Order, session_scope, get_engine
+
+    Base.metadata.create_all(get_engine())
+    with session_scope() as session:
+        if session.query(Order).first():
+            return
+        role = Role(role_name='End User')
+        session.add(role)
+        session.flush()
+        session.add_all([User(user_id=i, username=f"bench_user_{i}", password='x', role_id=role.role_id)
+                         for i in range(1, users + 1)])
+        session.add_all([Product(product_id=i, product_name=f"Product {i}", current_stock=i % 20,
+                                 moq=1, quantity_type='pcs')
+                         for i in range(1, products + 1)])
+        session.flush()
+        session.add_all([Order(order_id=i, user_id=i % users + 1, product_id=i % products + 1,
+                               status='Shipped' if i % 2 else 'Processing')
+                         for i in range(1, orders + 1)])
+        session.commit()
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+class Timer:
+    """Context manager measuring wall time in seconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
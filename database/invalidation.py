@@ -0,0 +1,127 @@
+import os
+import select
+import threading
+
+class LocalInvalidationBus:
+    """
+    In-process publish/subscribe channel for "row changed" messages.
+
+    Subscribers register a callback per topic (e.g. 'orders') and receive
+    the changed key, or None when the whole topic should be dropped. This
+    only reaches subscribers in the same process; use PostgresInvalidationBus
+    to reach other processes.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, callback):
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, key=None):
+        self.dispatch(topic, None if key is None else str(key))
+
+    def dispatch(self, topic, key):
+        with self._lock:
+            callbacks = list(self._subscribers.get(topic, ()))
+        for callback in callbacks:
+            try:
+                callback(key)
+            except Exception as e:
+                print(f"Invalidation callback error for {topic}: {e}")
+
+    def close(self):
+        pass
+
+class PostgresInvalidationBus(LocalInvalidationBus):
+    """Invalidation bus carried over PostgreSQL LISTEN/NOTIFY, shared by all processes"""
+
+    CHANNEL = 'chatbot_invalidation'
+
+    def __init__(self, engine_factory=None, poll_interval=5.0):
+        super().__init__()
+        self.engine_factory = engine_factory
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _engine(self):
+        if self.engine_factory:
+            return self.engine_factory()
+        from models import get_engine
+        return get_engine()
+
+    def publish(self, topic, key=None):
+        from sqlalchemy import text
+
+        payload = f"{topic}:{'' if key is None else key}"
+        with self._engine().connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {'channel': self.CHANNEL, 'payload': payload})
+            conn.commit()
+
+    def subscribe(self, topic, callback):
+        super().subscribe(topic, callback)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name='invalidation-listener', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+
+    def _listen(self):
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = self._engine().raw_connection()
+                # LISTEN state must not leak back into the pool
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.CHANNEL}")
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        topic, _, key = notify.payload.partition(':')
+                        self.dispatch(topic, key or None)
+            except Exception as e:
+                print(f"Invalidation listener error: {e}")
+                self._stop.wait(self.poll_interval)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+
+_bus = None
+_bus_lock = threading.Lock()
+
+def get_invalidation_bus():
+    """
+    Return the process-wide invalidation bus.
+
+    INVALIDATION_BUS selects 'postgres' or 'local'; by default PostgreSQL
+    databases use LISTEN/NOTIFY and everything else the in-process bus.
+    """
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                kind = os.getenv('INVALIDATION_BUS')
+                if not kind:
+                    from models import get_database_url
+                    kind = 'postgres' if get_database_url().startswith('postgresql') else 'local'
+                _bus = PostgresInvalidationBus() if kind == 'postgres' else LocalInvalidationBus()
+    return _bus
+
+def set_invalidation_bus(bus):
+    """Replace the process-wide bus, e.g. with a LocalInvalidationBus in tests"""
+    global _bus
+    _bus = bus
@@ -0,0 +1,355 @@
+import hmac
+import ipaddress
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from a fast cached lookup to a slow report query
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def metrics_enabled():
+    """METRICS_ENABLED=false turns off request, action and query instrumentation"""
+    return os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+class MetricsAccess:
+    """
+    Who may read /metrics: clients in METRICS_ALLOW (comma-separated
+    addresses or CIDR networks, default loopback only) or requests with
+    Authorization: Bearer <METRICS_TOKEN>, for scrapers on other hosts.
+    """
+
+    def __init__(self, allow=None, token=None):
+        allow = allow if allow is not None else os.getenv('METRICS_ALLOW', '127.0.0.1,::1')
+        self.networks = [ipaddress.ip_network(item.strip(), strict=False)
+                         for item in allow.split(',') if item.strip()]
+        self.token = token if token is not None else os.getenv('METRICS_TOKEN', '')
+
+    def allows(self, client_ip, authorization=None):
+        if self.token and hmac.compare_digest((authorization or '').encode(),
+                                              f'Bearer {self.token}'.encode()):
+            return True
+        try:
+            address = ipaddress.ip_address(client_ip or '')
+        except ValueError:
+            return False
+        return any(address in network for network in self.networks)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+class Metric:
+    """
+    A named family of samples, one child per combination of label values.
+
+    labels(*values) returns the child for those values, creating it on
+    first use; label values should come from a small fixed set (route
+    templates, action names), never from user input.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for values, child in sorted(self._children.items()):
+            child.render(self, format_labels(self.labelnames, values), values, lines)
+
+class CounterValue:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self, metric, labels, values, lines):
+        lines.append(f"{metric.name}{labels} {format_value(self.value)}")
+
+class GaugeValue(CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+class HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf; made cumulative only when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+
+    def render(self, metric, labels, values, lines):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += count
+            bucket_labels = format_labels(metric.labelnames, values, f'le="{format_value(float(bound))}"')
+            lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{metric.name}_sum{labels} {format_value(total)}")
+        lines.append(f"{metric.name}_count{labels} {cumulative}")
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return CounterValue()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return GaugeValue()
+
+    def set(self, value):
+        self.labels().set(value)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return HistogramValue(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics, rendered in the Prometheus text format.
+
+    Besides the metrics it owns, a registry calls collectors at render time:
+    functions returning {name: (help, value)} for figures that are already
+    counted elsewhere, such as cache or pool statistics.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labelnames, buckets)
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+            collectors = list(self._collectors)
+        for _, metric in metrics:
+            metric.render(lines)
+        for collector in collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+                continue
+            for name, (help, value) in samples.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {format_value(value)}")
+        lines.append('')
+        return '\n'.join(lines)
+
+class RequestMetrics:
+    """
+    Latency histogram, in-flight gauge and request and error counters for
+    one kind of work (HTTP routes, actions), labelled the same way.
+
+    Use track(*labels) around the work, or start() and finish() when the
+    beginning and end happen in different hooks.
+    """
+
+    def __init__(self, registry, prefix, what, labelnames):
+        self.latency = registry.histogram(f'{prefix}_duration_seconds', f'Time spent handling {what}',
+                                          labelnames)
+        self.in_flight = registry.gauge(f'{prefix}_in_flight', f'{what.capitalize()} being handled now')
+        self.requests = registry.counter(f'{prefix}_total', f'{what.capitalize()} handled, by outcome',
+                                         labelnames + ('status',))
+        self.errors = registry.counter(f'{prefix}_errors_total', f'{what.capitalize()} that failed, by error',
+                                       labelnames + ('error',))
+
+    def start(self):
+        self.in_flight.labels().inc()
+        return time.perf_counter()
+
+    def finish(self, started, labels, status, error=None):
+        self.latency.labels(*labels).observe(time.perf_counter() - started)
+        self.requests.labels(*labels, str(status)).inc()
+        if error is not None:
+            self.record_error(labels, error)
+        self.in_flight.labels().dec()
+
+    def record_error(self, labels, error):
+        """Count an error, given as a name or an exception, e.g. one the handler caught itself"""
+        if isinstance(error, BaseException):
+            error = type(error).__name__
+        self.errors.labels(*labels, error).inc()
+
+    def track(self, *labels):
+        return Tracking(self, labels)
+
+class Tracking:
+    """Context manager returned by RequestMetrics.track(); a class is cheaper than a generator here"""
+
+    __slots__ = ('metrics', 'labels', 'started')
+
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = self.metrics.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.metrics.finish(self.started, self.labels, 'ok')
+        else:
+            self.metrics.finish(self.started, self.labels, 'error', exc)
+        return False
+
+def statement_kind(statement):
+    """SELECT, INSERT, UPDATE, DELETE or OTHER, from the start of a SQL statement"""
+    word = statement.lstrip()[:6].upper()
+    return word if word in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') else 'OTHER'
+
+def instrument_engine(engine, registry=None):
+    """Count and time every statement an engine sends, by statement kind"""
+    from sqlalchemy import event
+
+    registry = registry or default_registry
+    queries = registry.histogram('db_query_duration_seconds', 'Time spent executing SQL statements',
+                                 ('statement',))
+    failures = registry.counter('db_query_errors_total', 'SQL statements that raised', ('statement',))
+
+    # The start time rides on the execution context; conn.info would cost a
+    # pool lookup per statement
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'query_started', None)
+        if started is not None:
+            queries.labels(statement_kind(statement)).observe(time.perf_counter() - started)
+
+    def handle_error(context):
+        failures.labels(statement_kind(context.statement or '')).inc()
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
+
+def pool_collector():
+    """Connection pool gauges of the default engine, from get_pool_stats()"""
+    from models import get_pool_stats
+
+    stats = get_pool_stats()
+    names = {
+        'size': ('db_pool_size', 'Connections the pool keeps open'),
+        'checked_out': ('db_pool_checked_out', 'Connections in use'),
+        'overflow': ('db_pool_overflow', 'Connections open beyond the pool size'),
+        'wait_time_max': ('db_pool_wait_seconds_max', 'Longest wait for a connection'),
+        'timeouts': ('db_pool_timeouts', 'Connection checkouts that timed out'),
+    }
+    return {name: (help, stats[key]) for key, (name, help) in names.items() if key in stats}
+
+def stats_collector(prefix, stats, descriptions=None):
+    """
+    Collector exporting the numeric entries of a component's stats() dict
+    as {prefix}_{key} gauges.
+    """
+    descriptions = descriptions or {}
+
+    def collect():
+        return {f'{prefix}_{key}': (descriptions.get(key, f'{prefix} {key.replace("_", " ")}'), value)
+                for key, value in stats().items()}
+    return collect
+
+# Shared by everything in the process; both servers render it on /metrics
+default_registry = MetricsRegistry()
+
+# Time callers wait for a pooled connection, observed by TimedQueuePool
+pool_wait = default_registry.histogram('db_pool_wait_seconds', 'Time spent waiting for a pooled connection')
@@ -0,0 +1,468 @@
+"""
+Versioned schema migrations.
+
+Each migration has an up step and, where possible, a down step. Applied
+versions are recorded in schema_migrations, so running the runner again
+only applies what is new. Index migrations run outside a transaction, which
+lets PostgreSQL build the indexes CONCURRENTLY on a live database.
+
+Usage:
+    python database/migrations.py                 apply every pending migration
+    python database/migrations.py status          list migrations and when they were applied
+    python database/migrations.py up 0002         apply pending migrations up to 0002
+    python database/migrations.py down            revert the latest migration
+    python database/migrations.py down 0001       revert every migration after 0001
+    python database/migrations.py --check         EXPLAIN the hot queries and verify they use indexes
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(os.path.dirname(__file__))
+
+try:
+    from sqlalchemy import (select, insert, delete, text, bindparam, inspect, MetaData, Table, Column, Integer, String,
+                            Date, DateTime, Text, ForeignKey, Index)
+    from models import SchemaMigration, UnansweredQuestion, get_engine, session_scope, DEFAULT_SCHEMA
+except ImportError:
+    SchemaMigration = None
+    UnansweredQuestion = None
+    get_engine = None
+    session_scope = None
+
+class Migration:
+    """
+    One schema change. up(conn) and down(conn) receive a Connection; down is
+    None for migrations that cannot be reverted. Non-transactional migrations
+    run with autocommit.
+    """
+
+    def __init__(self, version, name, up, down=None, transactional=True):
+        self.version = version
+        self.name = name
+        self.up = up
+        self.down = down
+        self.transactional = transactional
+
+def is_postgres(conn):
+    return conn.dialect.name == 'postgresql'
+
+def schema_of(conn):
+    """Schema the connection keeps the tables in (SQLite has none)"""
+    if conn.dialect.name == 'sqlite':
+        return None
+    schema_map = conn.get_execution_options().get('schema_translate_map') or {}
+    return schema_map.get(DEFAULT_SCHEMA, DEFAULT_SCHEMA)
+
+def qualify(conn, name):
+    """Table or index name in the schema of the connection"""
+    schema = schema_of(conn)
+    return f"{schema}.{name}" if schema else name
+
+def create_index(conn, name, table, definition):
+    """CREATE INDEX IF NOT EXISTS; CONCURRENTLY on PostgreSQL"""
+    concurrently = ' CONCURRENTLY' if is_postgres(conn) else ''
+    if not definition.startswith('USING'):
+        definition = f"({definition})"
+    conn.execute(text(f"CREATE INDEX{concurrently} IF NOT EXISTS {name} ON {qualify(conn, table)} {definition}"))
+
+def drop_index(conn, name):
+    concurrently = ' CONCURRENTLY' if is_postgres(conn) else ''
+    conn.execute(text(f"DROP INDEX{concurrently} IF EXISTS {qualify(conn, name)}"))
+
+def add_column(conn, column):
+    """ALTER TABLE ADD COLUMN for a model column, unless the table already has it"""
+    table = column.table
+    if column.name in {c['name'] for c in inspect(conn).get_columns(table.name, schema=schema_of(conn))}:
+        return
+    definition = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+    if column.server_default is not None:
+        definition += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        definition += " NOT NULL"
+    conn.execute(text(f"ALTER TABLE {qualify(conn, table.name)} ADD COLUMN {definition}"))
+
+def drop_column(conn, table, name):
+    conn.execute(text(f"ALTER TABLE {qualify(conn, table)} DROP COLUMN {name}"))
+
+def baseline_metadata():
+    """
+    The tables as the original setup.py created them, frozen here: later
+    columns and tables belong to their own migrations, not to models.py.
+    """
+    metadata = MetaData(schema=DEFAULT_SCHEMA)
+    Table('roles', metadata,
+          Column('role_id', Integer, primary_key=True),
+          Column('role_name', String(50), nullable=False, unique=True))
+    Table('users', metadata,
+          Column('user_id', Integer, primary_key=True),
+          Column('username', String(100), nullable=False, unique=True),
+          Column('password', String(255), nullable=False),
+          Column('role_id', Integer, ForeignKey(f"{DEFAULT_SCHEMA}.roles.role_id"), nullable=False))
+    Table('products', metadata,
+          Column('product_id', Integer, primary_key=True),
+          Column('product_name', String(200), nullable=False),
+          Column('current_stock', Integer, nullable=False),
+          Column('moq', Integer, nullable=False),
+          Column('quantity_type', String(20), nullable=False))
+    Table('orders', metadata,
+          Column('order_id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey(f"{DEFAULT_SCHEMA}.users.user_id"), nullable=False),
+          Column('product_id', Integer, ForeignKey(f"{DEFAULT_SCHEMA}.products.product_id"), nullable=False),
+          Column('status', String(20), nullable=False),
+          Column('estimated_delivery', Date))
+    Table('faq', metadata,
+          Column('faq_id', Integer, primary_key=True),
+          Column('question', Text, nullable=False),
+          Column('answer', Text, nullable=False))
+    Table('unanswered_questions', metadata,
+          Column('uq_id', Integer, primary_key=True),
+          Column('question', Text, nullable=False),
+          Column('status', String(20), nullable=False))
+    return metadata
+
+def create_baseline(conn):
+    # Adopts databases created by earlier setup.py runs: existing tables are kept
+    baseline_metadata().create_all(conn)
+
+# name, table, columns: filters of the admin lists plus the foreign keys.
+# The id comes second so keyset pages (WHERE x = ? AND id > ? ORDER BY id)
+# are read straight from the index.
+HOT_PATH_INDEXES = [
+    ('ix_orders_status', 'orders', 'status, order_id'),
+    ('ix_orders_user_id', 'orders', 'user_id, order_id'),
+    ('ix_orders_product_id', 'orders', 'product_id, order_id'),
+    ('ix_users_role_id', 'users', 'role_id'),
+    ('ix_unanswered_questions_status', 'unanswered_questions', 'status, uq_id'),
+    ('ix_products_name_lower', 'products', 'lower(product_name)'),
+]
+
+def create_hot_path_indexes(conn):
+    for name, table, columns in HOT_PATH_INDEXES:
+        create_index(conn, name, table, columns)
+
+def drop_hot_path_indexes(conn):
+    for name, _, _ in HOT_PATH_INDEXES:
+        drop_index(conn, name)
+
+# PostgreSQL only. Trigram indexes serve the case-insensitive substring
+# filters and ranked search; full-text indexes serve ranked FAQ and question search.
+TRIGRAM_INDEXES = [
+    ('ix_products_name_trgm', 'products', 'USING gin (lower(product_name) gin_trgm_ops)'),
+    ('ix_users_username_trgm', 'users', 'USING gin (lower(username) gin_trgm_ops)'),
+]
+FULL_TEXT_INDEXES = [
+    ('ix_faq_fts', 'faq', "USING gin (to_tsvector('simple', question || ' ' || answer))"),
+    ('ix_unanswered_questions_fts', 'unanswered_questions', "USING gin (to_tsvector('simple', question))"),
+]
+
+def create_search_indexes(conn):
+    if not is_postgres(conn):
+        return
+    try:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        trigram = True
+    except Exception as e:
+        # Search then uses the in-process index; rerun after installing the extension
+        print(f"pg_trgm unavailable, skipping trigram indexes: {e}")
+        trigram = False
+    for name, table, definition in (TRIGRAM_INDEXES if trigram else []) + FULL_TEXT_INDEXES:
+        create_index(conn, name, table, definition)
+
+def drop_search_indexes(conn):
+    if not is_postgres(conn):
+        return
+    for name, _, _ in TRIGRAM_INDEXES + FULL_TEXT_INDEXES:
+        drop_index(conn, name)
+
+# Unanswered questions become clusters of near-duplicates (see actions/question_clusters.py)
+CLUSTER_COLUMNS = ('occurrences', 'first_seen', 'last_seen', 'minhash')
+
+def add_question_clusters(conn):
+    for name in CLUSTER_COLUMNS:
+        add_column(conn, UnansweredQuestion.__table__.c[name])
+    # Triage lists: most frequent clusters of a status first
+    create_index(conn, 'ix_unanswered_questions_frequency', 'unanswered_questions',
+                 'status, occurrences DESC, uq_id')
+
+def drop_question_clusters(conn):
+    drop_index(conn, 'ix_unanswered_questions_frequency')
+    for name in reversed(CLUSTER_COLUMNS):
+        drop_column(conn, 'unanswered_questions', name)
+
+def merge_duplicate_clusters(conn):
+    """Fold clusters with the same signature into the oldest one"""
+    table = qualify(conn, 'unanswered_questions')
+    rows = conn.execute(text(f"SELECT uq_id, minhash, occurrences, last_seen FROM {table} "
+                             f"WHERE minhash IS NOT NULL ORDER BY uq_id"))
+    first = {}
+    merged = []
+    for uq_id, minhash, occurrences, last_seen in rows:
+        signature = bytes(minhash)
+        if signature not in first:
+            first[signature] = [uq_id, 0, last_seen]
+        else:
+            merged.append(uq_id)
+            if last_seen and (first[signature][2] is None or last_seen > first[signature][2]):
+                first[signature][2] = last_seen
+        first[signature][1] += occurrences or 1
+    if not merged:
+        return
+    for uq_id, occurrences, last_seen in first.values():
+        conn.execute(text(f"UPDATE {table} SET occurrences = :occurrences, last_seen = :last_seen "
+                          f"WHERE uq_id = :uq_id"),
+                     {'uq_id': uq_id, 'occurrences': occurrences, 'last_seen': last_seen})
+    conn.execute(text(f"DELETE FROM {table} WHERE uq_id IN :ids").bindparams(bindparam('ids', expanding=True)),
+                 {'ids': merged})
+
+def add_cluster_signature_unique(conn):
+    merge_duplicate_clusters(conn)
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS ix_unanswered_questions_minhash "
+                      f"ON {qualify(conn, 'unanswered_questions')} (minhash)"))
+
+def drop_cluster_signature_unique(conn):
+    # Inside the migration's transaction, so not CONCURRENTLY
+    conn.execute(text(f"DROP INDEX IF EXISTS {qualify(conn, 'ix_unanswered_questions_minhash')}"))
+
+def admin_tables_metadata():
+    """role_permissions (compiled into the RBAC table) and admin_sessions (SESSION_STORE=sql)"""
+    metadata = MetaData(schema=DEFAULT_SCHEMA)
+    Table('roles', metadata, Column('role_id', Integer, primary_key=True))
+    Table('role_permissions', metadata,
+          Column('role_id', Integer, ForeignKey(f"{DEFAULT_SCHEMA}.roles.role_id"), primary_key=True),
+          Column('resource', String(50), primary_key=True))
+    Table('admin_sessions', metadata,
+          Column('token', String(64), primary_key=True),
+          Column('user_id', Integer, nullable=False),
+          Column('username', String(100), nullable=False),
+          Column('role', String(50), nullable=False),
+          Column('expires_at', DateTime, nullable=False),
+          Index('ix_admin_sessions_expires_at', 'expires_at'))
+    return metadata
+
+ADMIN_TABLES = ('role_permissions', 'admin_sessions')
+
+def create_admin_tables(conn):
+    # Databases where the API server created them at startup keep theirs
+    metadata = admin_tables_metadata()
+    metadata.create_all(conn, tables=[metadata.tables[f"{DEFAULT_SCHEMA}.{name}"] for name in ADMIN_TABLES])
+
+def drop_admin_tables(conn):
+    metadata = admin_tables_metadata()
+    metadata.drop_all(conn, tables=[metadata.tables[f"{DEFAULT_SCHEMA}.{name}"] for name in ADMIN_TABLES])
+
+MIGRATIONS = [
+    Migration('0001', 'baseline', create_baseline),
+    Migration('0002', 'hot_path_indexes', create_hot_path_indexes, drop_hot_path_indexes, transactional=False),
+    Migration('0003', 'search_indexes', create_search_indexes, drop_search_indexes, transactional=False),
+    Migration('0004', 'question_clusters', add_question_clusters, drop_question_clusters, transactional=False),
+    Migration('0005', 'admin_tables', create_admin_tables, drop_admin_tables),
+    Migration('0006', 'cluster_signature_unique', add_cluster_signature_unique, drop_cluster_signature_unique),
+]
+
+class MigrationRunner:
+    """Applies and reverts MIGRATIONS, recording versions in schema_migrations"""
+
+    def __init__(self, engine=None, migrations=None):
+        self.engine = engine or get_engine()
+        self.migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+
+    def applied(self):
+        """version -> applied_at of every applied migration"""
+        SchemaMigration.__table__.create(self.engine, checkfirst=True)
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(SchemaMigration.version, SchemaMigration.applied_at))
+            return {version: applied_at for version, applied_at in rows}
+
+    def status(self):
+        """(version, name, applied_at or None) for every known migration"""
+        applied = self.applied()
+        return [(m.version, m.name, applied.get(m.version)) for m in self.migrations]
+
+    def run(self, migration, direction):
+        step = migration.up if direction == 'up' else migration.down
+        if migration.transactional:
+            with self.engine.begin() as conn:
+                step(conn)
+                self.record(conn, migration, direction)
+            return
+        with self.engine.connect() as conn:
+            step(conn.execution_options(isolation_level='AUTOCOMMIT'))
+        with self.engine.begin() as conn:
+            self.record(conn, migration, direction)
+
+    def record(self, conn, migration, direction):
+        if direction == 'up':
+            conn.execute(insert(SchemaMigration).values(version=migration.version, name=migration.name))
+        else:
+            conn.execute(delete(SchemaMigration).where(SchemaMigration.version == migration.version))
+
+    def upgrade(self, target=None):
+        """Apply pending migrations up to target (default: all); returns their versions"""
+        applied = self.applied()
+        done = []
+        for migration in self.migrations:
+            if migration.version in applied or (target and migration.version > target):
+                continue
+            self.run(migration, 'up')
+            print(f"Applied {migration.version} {migration.name}")
+            done.append(migration.version)
+        return done
+
+    def downgrade(self, target=None):
+        """
+        Revert applied migrations newer than target, or only the latest one
+        without a target; returns their versions.
+        """
+        applied = self.applied()
+        to_revert = [m for m in reversed(self.migrations) if m.version in applied]
+        if target is None:
+            to_revert = to_revert[:1]
+        else:
+            to_revert = [m for m in to_revert if m.version > target]
+        irreversible = [m.version for m in to_revert if m.down is None]
+        if irreversible:
+            raise ValueError(f"Migration {irreversible[0]} cannot be reverted")
+
+        done = []
+        for migration in to_revert:
+            self.run(migration, 'down')
+            print(f"Reverted {migration.version} {migration.name}")
+            done.append(migration.version)
+        return done
+
+def list_statement(session, manager, filters):
+    """First page of an admin list, built exactly as the list endpoints do"""
+    from auth import resolve_list_params, build_list_query
+
+    spec = manager.list_spec()
+    selected, conditions = resolve_list_params(spec['id_field'], spec['columns'], spec.get('filter_specs'),
+                                               None, filters)
+    query = build_list_query(session, spec['columns'], spec.get('joins', ()), selected, conditions)
+    return query.order_by(spec['columns'][spec['id_field']]).limit(100).statement
+
+def hot_queries(session):
+    """
+    (name, statement, tables that must not be read in full, dialects or None)
+    for the queries behind the chatbot's and the admin API's hot paths.
+    """
+    sys.path.append(ROOT)
+    sys.path.append(os.path.join(ROOT, 'admin_api'))
+    from auth import OrderManager, UserManager, ProductManager, UnansweredQuestionManager, login_query
+
+    queries = []
+    try:
+        from actions.actions import order_status_query
+        queries.append(('actions: order status', order_status_query(12345), ('orders', 'products'), None))
+    except ImportError as e:
+        print(f"Skipping action queries: {e}")
+
+    login = login_query('system_admin')
+    orders, users = OrderManager(), UserManager()
+    queries += [
+        ('admin: login', login, ('users', 'roles'), None),
+        ('admin: orders by status', list_statement(session, orders, {'status': 'pending'}), ('orders',), None),
+        ('admin: orders by customer', list_statement(session, orders, {'user_id': '1'}), ('orders',), None),
+        ('admin: orders by product', list_statement(session, orders, {'product_id': '1'}), ('orders',), None),
+        ('admin: users by role', list_statement(session, users, {'role': 'End User'}), ('users',), None),
+        ('admin: unanswered by status', list_statement(session, UnansweredQuestionManager(), {'status': 'new'}),
+         ('unanswered_questions',), None),
+        # Substring matches need a trigram index, which only PostgreSQL has
+        ('admin: products by name', list_statement(session, ProductManager(), {'name': 'jack'}),
+         ('products',), ('postgresql',)),
+    ]
+    return queries
+
+def sql_text(conn, statement):
+    """The statement as literal SQL for EXPLAIN, in the connection's schema"""
+    schema_map = conn.get_execution_options().get('schema_translate_map')
+    compiled = statement.compile(dialect=conn.dialect, schema_translate_map=schema_map,
+                                 render_schema_translate=bool(schema_map),
+                                 compile_kwargs={'literal_binds': True})
+    return str(compiled)
+
+SQLITE_PLAN = re.compile(r'^(SCAN|SEARCH) (?:\w+\.)?(\w+)(?: USING (?:COVERING )?INDEX (\w+)| USING (INTEGER PRIMARY KEY))?')
+
+def explain(conn, statement):
+    """(tables read in full, indexes used) according to the database's plan"""
+    sql = sql_text(conn, statement)
+    scanned, indexes = set(), set()
+
+    if is_postgres(conn):
+        # With sequential scans priced out, the plan shows whether an index *can*
+        # serve the query, independent of how small the tables are right now
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan':
+                scanned.add(node['Relation Name'])
+            if 'Index Name' in node:
+                indexes.add(node['Index Name'])
+            nodes.extend(node.get('Plans', []))
+        return scanned, indexes
+
+    for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+        match = SQLITE_PLAN.match(row[-1])
+        if not match:
+            continue
+        operation, table, index, primary_key = match.groups()
+        if operation == 'SCAN' and not primary_key:
+            scanned.add(table)
+        if index or primary_key:
+            indexes.add(index or f"{table} primary key")
+    return scanned, indexes
+
+def check(engine=None):
+    """Print whether each hot query is served by indexes; returns True if all are"""
+    engine = engine or get_engine()
+    ok = True
+    with session_scope() as session, engine.connect() as conn:
+        for name, statement, tables, dialects in hot_queries(session):
+            if dialects and conn.dialect.name not in dialects:
+                print(f"SKIP  {name:<30} ({', '.join(dialects)} only)")
+                continue
+            with conn.begin():
+                scanned, indexes = explain(conn, statement)
+            full_scans = sorted(set(tables) & scanned)
+            if full_scans:
+                ok = False
+                print(f"FAIL  {name:<30} full scan of {', '.join(full_scans)}")
+            else:
+                print(f"OK    {name:<30} {', '.join(sorted(indexes))}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', default='up', choices=['up', 'down', 'status'])
+    parser.add_argument('target', nargs='?', help='migration version, e.g. 0002')
+    parser.add_argument('--check', action='store_true', help='verify the hot queries use indexes')
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check() else 1)
+
+    runner = MigrationRunner()
+    if args.command == 'status':
+        for version, name, applied_at in runner.status():
+            print(f"{version}  {name:<20} {applied_at or 'pending'}")
+    elif args.command == 'down':
+        try:
+            reverted = runner.downgrade(args.target)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        if not reverted:
+            print("ℹ️  Nothing to revert")
+    else:
+        if not runner.upgrade(args.target):
+            print("✅ Database is up to date")
+
+if __name__ == '__main__':
+    main()
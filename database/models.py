@@ -1,9 +1,16 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, Text, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, Text, ForeignKey, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
-from sqlalchemy.sql import func
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import func, text
+from contextlib import contextmanager, asynccontextmanager
+import importlib.util
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from metrics import instrument_engine, metrics_enabled, pool_wait
+import profiling
 
 load_dotenv()
 
@@ -17,6 +24,7 @@ class Role(Base):
     role_name = Column(String(50), nullable=False, unique=True)
 
     users = relationship("User", back_populates="role")
+    permissions = relationship("RolePermission", cascade="all, delete-orphan")
 
 class User(Base):
     __tablename__ = 'users'
@@ -70,14 +78,280 @@ class UnansweredQuestion(Base):
     uq_id = Column(Integer, primary_key=True)
     question = Column(Text, nullable=False)
     status = Column(String(20), nullable=False, default='new')
+    # Each row is a cluster of near-duplicate questions; question is the first one seen
+    occurrences = Column(Integer, nullable=False, default=1, server_default='1')
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    # Unique, so action servers that create the same cluster at once end up with one row
+    minhash = Column(LargeBinary, index=True, unique=True)
+
+class RolePermission(Base):
+    __tablename__ = 'role_permissions'
+    __table_args__ = {'schema': os.getenv('DB_SCHEMA', 'chatbot_v4')}
+
+    role_id = Column(Integer, ForeignKey(f"{os.getenv('DB_SCHEMA', 'chatbot_v4')}.roles.role_id"), primary_key=True)
+    resource = Column(String(50), primary_key=True)
+
+class AdminSession(Base):
+    __tablename__ = 'admin_sessions'
+    __table_args__ = {'schema': os.getenv('DB_SCHEMA', 'chatbot_v4')}
+
+    token = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    username = Column(String(100), nullable=False)
+    role = Column(String(50), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class SchemaMigration(Base):
+    __tablename__ = 'schema_migrations'
+    __table_args__ = {'schema': os.getenv('DB_SCHEMA', 'chatbot_v4')}
+
+    version = Column(String(20), primary_key=True)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, nullable=False, server_default=func.now())
+
+DEFAULT_SCHEMA = os.getenv('DB_SCHEMA', 'chatbot_v4')
 
 def get_database_url():
+    """Database URL; DATABASE_URL overrides the individual DB_* settings"""
+    if os.getenv('DATABASE_URL'):
+        return os.getenv('DATABASE_URL')
     return f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
+def get_pool_settings():
+    """Connection pool settings, configurable through environment variables"""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+    }
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_time_total += waited
+            if waited > self.wait_time_max:
+                self.wait_time_max = waited
+            pool_wait.observe(waited)
+
+    def recreate(self):
+        # Keep the wait statistics when the pool is recreated after invalidation
+        pool = super().recreate()
+        pool.wait_count = self.wait_count
+        pool.wait_time_total = self.wait_time_total
+        pool.wait_time_max = self.wait_time_max
+        pool.timeouts = self.timeouts
+        return pool
+
+# One engine and session factory per (url, schema), shared by the whole process
+_engines = {}
+_session_factories = {}
+_engine_lock = threading.Lock()
+
+def _engine_key(url, schema):
+    return (url or get_database_url(), DEFAULT_SCHEMA if schema is None else schema)
+
+def get_engine(url=None, schema=None):
+    """Return the process-wide engine for (url, schema), creating it on first use"""
+    key = _engine_key(url, schema)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engine_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            db_url, db_schema = key
+            kwargs = {}
+            if db_url.startswith('sqlite'):
+                # SQLite has no schemas; keep the tables in the main database
+                db_schema = None
+            else:
+                kwargs.update(get_pool_settings())
+                kwargs['poolclass'] = TimedQueuePool
+            if db_schema != DEFAULT_SCHEMA:
+                kwargs['execution_options'] = {
+                    'schema_translate_map': {DEFAULT_SCHEMA: db_schema or None}
+                }
+            engine = create_engine(db_url, **kwargs)
+            if metrics_enabled():
+                instrument_engine(engine)
+            if profiling.profile_mode() != 'off':
+                profiling.instrument_engine(engine)
+            _engines[key] = engine
+            _session_factories[key] = sessionmaker(bind=engine)
+    return engine
+
+def get_session_factory(url=None, schema=None):
+    """Return the shared sessionmaker bound to the engine for (url, schema)"""
+    key = _engine_key(url, schema)
+    if key not in _session_factories:
+        get_engine(url, schema)
+    return _session_factories[key]
+
+@contextmanager
+def session_scope(url=None, schema=None):
+    """
+    Provide a session from the shared pool for the duration of a block.
+
+    The caller commits explicitly; the session is rolled back if the block
+    raises and is always closed, returning its connection to the pool.
+    """
+    session = get_session_factory(url, schema)()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_pool_stats(url=None, schema=None):
+    """Pool statistics for sizing the pool in production"""
+    key = _engine_key(url, schema)
+    engine = _engines.get(key)
+    if engine is None:
+        return {'engine_created': False}
+
+    pool = engine.pool
+    stats = {'engine_created': True, 'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update({
+            'wait_count': pool.wait_count,
+            'wait_time_total': pool.wait_time_total,
+            'wait_time_avg': pool.wait_time_total / pool.wait_count if pool.wait_count else 0.0,
+            'wait_time_max': pool.wait_time_max,
+            'timeouts': pool.timeouts,
+        })
+    return stats
+
+def statement_timeout(dialect_name, seconds):
+    """
+    Statement that limits the queries of the current transaction to seconds,
+    or None where the database has no such setting (SQLite).
+    """
+    if seconds and dialect_name == 'postgresql':
+        return text(f"SET LOCAL statement_timeout = {int(seconds * 1000)}")
+    return None
+
+def dispose_engines():
+    """Dispose every shared engine, e.g. after forking worker processes"""
+    with _engine_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
+
+# Async drivers used for each sync URL scheme
+ASYNC_DRIVERS = {
+    'postgresql': ('postgresql+asyncpg', 'asyncpg'),
+    'sqlite': ('sqlite+aiosqlite', 'aiosqlite'),
+}
+
+_async_engines = {}
+_async_session_factories = {}
+
+def get_async_database_url(url=None):
+    """Translate a sync database URL to its async driver URL, or None if there is none"""
+    url = url or get_database_url()
+    scheme, sep, rest = url.partition('://')
+    driver = ASYNC_DRIVERS.get(scheme.split('+')[0])
+    if not sep or not driver:
+        return None
+    return f"{driver[0]}://{rest}"
+
+def async_driver_available(url=None):
+    """True if SQLAlchemy asyncio support and the async driver for url are installed"""
+    url = url or get_database_url()
+    driver = ASYNC_DRIVERS.get(url.partition('://')[0].split('+')[0])
+    if not driver:
+        return False
+    return all(importlib.util.find_spec(module) is not None for module in ('greenlet', driver[1]))
+
+def get_async_engine(url=None, schema=None):
+    """Return the process-wide async engine for (url, schema), with its own pool"""
+    key = _engine_key(url, schema)
+    engine = _async_engines.get(key)
+    if engine is not None:
+        return engine
+
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    with _engine_lock:
+        engine = _async_engines.get(key)
+        if engine is None:
+            db_url, db_schema = key
+            kwargs = {}
+            if db_url.startswith('sqlite'):
+                db_schema = None
+            else:
+                kwargs.update(get_pool_settings())
+            if db_schema != DEFAULT_SCHEMA:
+                kwargs['execution_options'] = {
+                    'schema_translate_map': {DEFAULT_SCHEMA: db_schema or None}
+                }
+            engine = create_async_engine(get_async_database_url(db_url), **kwargs)
+            if metrics_enabled():
+                instrument_engine(engine.sync_engine)
+            if profiling.profile_mode() != 'off':
+                profiling.instrument_engine(engine.sync_engine)
+            _async_engines[key] = engine
+            _async_session_factories[key] = async_sessionmaker(bind=engine, expire_on_commit=False)
+    return engine
+
+@asynccontextmanager
+async def async_session_scope(url=None, schema=None):
+    """Async counterpart of session_scope() backed by the async engine"""
+    key = _engine_key(url, schema)
+    if key not in _async_session_factories:
+        get_async_engine(url, schema)
+    session = _async_session_factories[key]()
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+async def dispose_async_engines():
+    """Dispose every shared async engine"""
+    engines = list(_async_engines.values())
+    _async_engines.clear()
+    _async_session_factories.clear()
+    for engine in engines:
+        await engine.dispose()
+
 def create_engine_instance():
-    return create_engine(get_database_url())
+    """Return the shared engine for the configured database"""
+    return get_engine()
 
 def create_session():
-    engine = create_engine_instance()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    """Return a session from the shared pool; prefer session_scope() in new code"""
+    return get_session_factory()()
@@ -0,0 +1,244 @@
+import atexit
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+THIS_FILE = os.path.abspath(__file__)
+
+# Quoted strings and bare numbers; identifiers such as param_1 are left alone
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# An expanded IN list of placeholders: (?, ?, ?) or (%(id_1_1)s, %(id_1_2)s)
+PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|\$\d+))+\s*\)")
+
+class QueryBudgetExceeded(Exception):
+    """Raised in enforce mode when a request or action run breaks its query budget or repeats a statement"""
+
+def profile_mode():
+    """
+    QUERY_PROFILE selects what happens to the statements of each admin API
+    request and action run: off (default), report (print budget and N+1
+    warnings, and the slowest statements at exit) or enforce (raise
+    QueryBudgetExceeded, for test runs).
+    """
+    mode = os.getenv('QUERY_PROFILE', 'off').lower()
+    return mode if mode in ('report', 'enforce') else 'off'
+
+def repeat_threshold():
+    """Executions of one statement shape in a single unit of work that count as N+1"""
+    return int(os.getenv('QUERY_REPEAT_THRESHOLD', '5'))
+
+def parse_budgets(text):
+    """'get_orders=2,action_fetch_order_status=1' -> {'get_orders': 2, 'action_fetch_order_status': 1}"""
+    budgets = {}
+    for item in (text or '').split(','):
+        name, sep, value = item.partition('=')
+        if sep and name.strip():
+            budgets[name.strip()] = int(value)
+    return budgets
+
+def load_budgets(defaults):
+    """Per-endpoint query budgets: the defaults, overridden by QUERY_BUDGETS"""
+    budgets = dict(defaults)
+    budgets.update(parse_budgets(os.getenv('QUERY_BUDGETS')))
+    return budgets
+
+def statement_shape(statement):
+    """Statement text with literals and IN lists collapsed, so executions differing only in values match"""
+    shape = PLACEHOLDER_LIST.sub('(?...)', LITERALS.sub('?', statement))
+    return ' '.join(shape.split())
+
+def call_site():
+    """'file:line in function' of the innermost project frame that issued the statement"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        # Skip generated code such as SQLAlchemy's <... wrapper> functions
+        filename = '' if filename.startswith('<') else os.path.abspath(filename)
+        if filename.startswith(ROOT) and filename != THIS_FILE and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+class QueryProfile:
+    """Every SQL statement issued by one unit of work: an admin API request or an action run"""
+
+    def __init__(self, name, budget=None, mode=None):
+        self.name = name
+        self.budget = budget
+        self.mode = mode or profile_mode()
+        # (shape, seconds, call site) in execution order
+        self.statements = []
+
+    def record(self, statement, seconds, context=None):
+        """
+        Add a statement. Cursor executions sharing one execution context are
+        batches of a single execute() call (executemany, insertmanyvalues),
+        so they are folded into one statement.
+        """
+        index = getattr(context, 'profile_index', None)
+        if index is not None and index < len(self.statements):
+            shape, total, site = self.statements[index]
+            self.statements[index] = (shape, total + seconds, site)
+            return
+        if context is not None:
+            context.profile_index = len(self.statements)
+        self.statements.append((statement_shape(statement), seconds, call_site()))
+
+    def repeated(self, threshold=None):
+        """{shape: (count, call sites)} of the shapes run at least threshold times"""
+        threshold = threshold or repeat_threshold()
+        counts = Counter(shape for shape, _, _ in self.statements)
+        return {shape: (count, sorted({site for s, _, site in self.statements if s == shape}))
+                for shape, count in counts.items() if count >= threshold}
+
+    def violations(self):
+        """Human-readable budget and N+1 problems, empty if there are none"""
+        problems = []
+        if self.budget is not None and len(self.statements) > self.budget:
+            problems.append(f"{self.name} issued {len(self.statements)} statements, budget is {self.budget}")
+        for shape, (count, sites) in self.repeated().items():
+            problems.append(f"{self.name} ran the same statement {count} times (N+1?) "
+                            f"from {', '.join(sites)}: {shape[:200]}")
+        return problems
+
+class SlowQueryLog:
+    """
+    Process-wide totals per statement shape, for a report of the slowest
+    statements and where they are issued from. At most max_shapes distinct
+    shapes are kept.
+    """
+
+    def __init__(self, max_shapes=1000):
+        self.max_shapes = max_shapes
+        self._shapes = {}
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            for shape, seconds, site in profile.statements:
+                entry = self._shapes.get(shape)
+                if entry is None:
+                    if len(self._shapes) >= self.max_shapes:
+                        continue
+                    entry = self._shapes[shape] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                                   'sites': Counter(), 'owners': Counter()}
+                entry['count'] += 1
+                entry['total'] += seconds
+                entry['max'] = max(entry['max'], seconds)
+                entry['sites'][site] += 1
+                entry['owners'][profile.name] += 1
+
+    def slowest(self, limit=20):
+        """(shape, entry) pairs with the largest total time first"""
+        with self._lock:
+            entries = list(self._shapes.items())
+        return sorted(entries, key=lambda item: item[1]['total'], reverse=True)[:limit]
+
+    def report(self, limit=20):
+        lines = [f"{'count':>8}{'total ms':>11}{'max ms':>9}  statement / call sites / issued by"]
+        for shape, entry in self.slowest(limit):
+            lines.append(f"{entry['count']:>8}{entry['total'] * 1000:>11.1f}{entry['max'] * 1000:>9.1f}  {shape[:160]}")
+            for site, count in entry['sites'].most_common(3):
+                lines.append(f"{'':>30}{count:>6}  {site}")
+            owners = ', '.join(name for name, _ in entry['owners'].most_common(3))
+            lines.append(f"{'':>36}by {owners}")
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._shapes.clear()
+
+query_log = SlowQueryLog()
+
+# The profile of the request or action run executing in this thread or task
+active_profile = ContextVar('active_profile', default=None)
+
+def start_profile(name, budget=None, mode=None):
+    """Begin profiling a unit of work; returns the state finish_profile() needs"""
+    profile = QueryProfile(name, budget, mode)
+    return profile, active_profile.set(profile)
+
+def finish_profile(state):
+    """Stop profiling, log the statements and report or raise on violations"""
+    profile, token = state
+    active_profile.reset(token)
+    query_log.add(profile)
+    problems = profile.violations()
+    if problems and profile.mode == 'enforce':
+        raise QueryBudgetExceeded('; '.join(problems))
+    for problem in problems:
+        print(f"Query profile: {problem}")
+    return profile
+
+class query_profile:
+    """
+    Profile the statements of a block: with query_profile('get_orders', budget=1): ...
+
+    Does nothing when mode (default: QUERY_PROFILE) is off.
+    """
+
+    def __init__(self, name, budget=None, mode=None):
+        self.name = name
+        self.budget = budget
+        self.mode = mode or profile_mode()
+        self.state = None
+
+    def __enter__(self):
+        if self.mode != 'off':
+            self.state = start_profile(self.name, self.budget, self.mode)
+            return self.state[0]
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.state is None:
+            return False
+        if exc is not None:
+            # The block already failed; do not hide its error behind a budget one
+            profile, token = self.state
+            active_profile.reset(token)
+            query_log.add(profile)
+            return False
+        finish_profile(self.state)
+        return False
+
+def print_report():
+    """Slowest statements, to QUERY_PROFILE_REPORT if set, else stdout"""
+    if not query_log.slowest(1):
+        return
+    report = query_log.report()
+    path = os.getenv('QUERY_PROFILE_REPORT')
+    if path:
+        with open(path, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(f"Slowest SQL statements:\n{report}")
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and active_profile.get() is not None:
+        context.profile_started = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'profile_started', None)
+    profile = active_profile.get()
+    if started is not None and profile is not None:
+        profile.record(statement, time.perf_counter() - started, context)
+
+_report_registered = False
+
+def instrument_engine(engine):
+    """Record the statements of an engine into the active profile, if any; safe to call twice"""
+    from sqlalchemy import event
+
+    global _report_registered
+    if not _report_registered and profile_mode() != 'off':
+        _report_registered = True
+        atexit.register(print_report)
+
+    if not event.contains(engine, 'after_cursor_execute', after_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
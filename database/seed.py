@@ -0,0 +1,279 @@
+"""
+Generate and bulk-load a production-sized data set for testing.
+
+Rows are generated deterministically from a seed: the same seed and
+volumes on a freshly set up database produce the same rows. Popularity is
+skewed the way real traffic is: a few customers place most orders, a few
+products get most of them, and a few unanswered questions are asked far
+more often than the rest. Older orders are mostly delivered, recent ones
+still pending or in transit.
+
+PostgreSQL is loaded with COPY, other databases with chunked executemany.
+Ids are assigned here, after the highest existing id, so orders can
+reference users and products without a round trip per row.
+
+Usage:
+    python database/setup.py seed
+    python database/setup.py seed --orders 1000000 --products 100000 --unanswered 500000 --random-seed 7
+"""
+import csv
+import hashlib
+import io
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+try:
+    from sqlalchemy import func, insert, select, text
+    from models import Role, User, Product, Order, FAQ, UnansweredQuestion, get_engine
+    from migrations import is_postgres, qualify
+except ImportError:
+    get_engine = None
+
+DEFAULT_VOLUMES = {
+    'users': 50000,
+    'products': 100000,
+    'orders': 1000000,
+    'unanswered': 500000,
+    'faqs': 500,
+}
+DEFAULT_SEED = 42
+CHUNK_SIZE = int(os.getenv('SEED_CHUNK_SIZE', '50000'))
+
+# Orders span the year before this date; fixed so a seed always gives the same rows
+HISTORY_END = datetime(2025, 6, 30)
+HISTORY_DAYS = 365
+
+BRANDS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Hooli', 'Vandelay', 'Soylent', 'Tyrell']
+ADJECTIVES = ['Wireless', 'Portable', 'Smart', 'Compact', 'Deluxe', 'Classic', 'Rugged', 'Mini', 'Pro', 'Eco']
+NOUNS = ['Headphones', 'Jacket', 'Kettle', 'Backpack', 'Charger', 'Speaker', 'Lamp', 'Blender', 'Keyboard',
+         'Monitor', 'Sneakers', 'Camera', 'Shoes', 'Laptop', 'Smartphone', 'Coffee Beans', 'Olive Oil', 'Rice']
+# Unit of each noun that is not sold by the piece
+UNITS = {'Coffee Beans': 'kg', 'Rice': 'kg', 'Olive Oil': 'ltr'}
+ORDER_STATUSES = ['pending', 'processing', 'shipped', 'delivered']
+
+QUESTION_FORMS = [
+    'do you sell {brand} {noun}', 'is the {noun} {model} waterproof', 'can i return my {noun} after {days} days',
+    'when will the {brand} {noun} be back in stock', 'does the {noun} come in {colour}',
+    'how do i reset my {brand} {noun}', 'is there a warranty on the {noun} {model}',
+    'can i pick up my {noun} in store', 'why is my {noun} order {order} late',
+    'do you price match the {brand} {noun}', 'what size {noun} should i get', 'can i pay for the {noun} in instalments',
+]
+COLOURS = ['black', 'white', 'red', 'navy', 'green', 'grey', 'pink']
+FAQ_TOPICS = ['delivery', 'returns', 'refunds', 'warranty', 'gift cards', 'payments', 'accounts', 'discounts',
+              'store pickup', 'price matching', 'exchanges', 'invoices', 'subscriptions', 'shipping abroad']
+FAQ_FORMS = ['How do {topic} work?', 'What is your policy on {topic}?', 'Where can I read about {topic}?',
+             'Who do I contact about {topic}?', 'Are there fees for {topic}?']
+
+def rng_for(seed, table):
+    """Independent generator per table, so one table's volume does not change another's rows"""
+    return random.Random(f"{seed}:{table}")
+
+def zipf_weights(count, exponent):
+    """Cumulative weights of ranks 1..count under a Zipf distribution"""
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in range(1, count + 1)))
+
+def skewed_picker(rng, ids, exponent):
+    """Draw ids with Zipf popularity; which ids are popular is shuffled, not the lowest ones"""
+    ids = list(ids)
+    rng.shuffle(ids)
+    weights = zipf_weights(len(ids), exponent)
+
+    def pick(k):
+        return rng.choices(ids, cum_weights=weights, k=k)
+    return pick
+
+def generate_users(rng, first_id, count, role_id):
+    """(user_id, username, password, role_id); every seeded customer's password is test123"""
+    password = hashlib.sha256('test123'.encode()).hexdigest()
+    for user_id in range(first_id, first_id + count):
+        yield (user_id, f"customer_{user_id}", password, role_id)
+
+def generate_products(rng, first_id, count):
+    """(product_id, product_name, current_stock, moq, quantity_type)"""
+    for product_id in range(first_id, first_id + count):
+        noun = rng.choice(NOUNS)
+        name = f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {noun} {rng.choice('ABCDEFGHJK')}{rng.randint(100, 9999)}"
+        roll = rng.random()
+        if roll < 0.08:
+            stock = 0
+        elif roll < 0.2:
+            stock = rng.randint(1, 5)
+        else:
+            stock = min(int(rng.lognormvariate(3.5, 1.0)), 5000)
+        moq = rng.choice([1, 1, 1, 1, 1, 2, 5, 10])
+        yield (product_id, name, stock, moq, UNITS.get(noun, 'pcs'))
+
+def order_status(rng, age_days):
+    """Status of an order placed age_days ago"""
+    if age_days > 14:
+        return 'delivered' if rng.random() < 0.97 else 'shipped'
+    if age_days > 5:
+        return rng.choices(ORDER_STATUSES, weights=[1, 2, 5, 12])[0]
+    return rng.choices(ORDER_STATUSES, weights=[5, 8, 4, 1])[0]
+
+def generate_orders(rng, first_id, count, pick_user, pick_product):
+    """(order_id, user_id, product_id, status, estimated_delivery), oldest first"""
+    produced = 0
+    while produced < count:
+        size = min(CHUNK_SIZE, count - produced)
+        users = pick_user(size)
+        products = pick_product(size)
+        for i in range(size):
+            position = produced + i
+            # Ids grow with time, and order volume grows over the year
+            age_days = HISTORY_DAYS * (1 - (position / count) ** 0.8)
+            placed = HISTORY_END - timedelta(days=age_days)
+            yield (first_id + position, users[i], products[i], order_status(rng, age_days),
+                   (placed + timedelta(days=rng.randint(2, 7))).date())
+        produced += size
+
+def generate_question(rng):
+    return rng.choice(QUESTION_FORMS).format(
+        brand=rng.choice(BRANDS).lower(), noun=rng.choice(NOUNS).lower(), model=rng.randint(100, 9999),
+        days=rng.choice([14, 30, 45, 60, 90]), colour=rng.choice(COLOURS), order=rng.randint(10000, 999999))
+
+def generate_unanswered(rng, first_id, count):
+    """
+    (uq_id, question, status, occurrences, first_seen, last_seen), one row per
+    question cluster; the action server computes the MinHash of rows without one.
+    """
+    for uq_id in range(first_id, first_id + count):
+        occurrences = min(int(rng.paretovariate(1.1)), 50000)
+        first_seen = HISTORY_END - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400))
+        last_seen = first_seen
+        if occurrences > 1:
+            last_seen = min(HISTORY_END, first_seen + timedelta(seconds=rng.randint(0, 60 * 86400)))
+        status = rng.choices(['new', 'reviewed', 'resolved'], weights=[70, 20, 10])[0]
+        yield (uq_id, generate_question(rng), status, occurrences, first_seen, last_seen)
+
+def generate_faqs(rng, first_id, count):
+    """(faq_id, question, answer)"""
+    for faq_id in range(first_id, first_id + count):
+        topic = rng.choice(FAQ_TOPICS)
+        question = rng.choice(FAQ_FORMS).format(topic=topic)
+        yield (faq_id, f"{question} ({faq_id})", f"Everything about {topic} is explained on our help pages, "
+                                                 f"or ask support@example.com and quote reference {faq_id}.")
+
+def chunks(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def copy_rows(conn, table, columns, rows):
+    """Load rows with COPY FROM STDIN, one CSV buffer per chunk"""
+    sql = f"COPY {qualify(conn, table.name)} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.connection.driver_connection.cursor()
+    loaded = 0
+    try:
+        for chunk in chunks(rows, CHUNK_SIZE):
+            buffer = io.StringIO()
+            # None becomes an unquoted empty field, which COPY reads as NULL
+            csv.writer(buffer).writerows(chunk)
+            buffer.seek(0)
+            if hasattr(cursor, 'copy_expert'):
+                cursor.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+            loaded += len(chunk)
+    finally:
+        cursor.close()
+    return loaded
+
+def insert_rows(conn, table, columns, rows):
+    """Load rows with one executemany INSERT per chunk"""
+    statement = insert(table)
+    loaded = 0
+    for chunk in chunks(rows, CHUNK_SIZE):
+        conn.execute(statement, [dict(zip(columns, row)) for row in chunk])
+        loaded += len(chunk)
+    return loaded
+
+def load(conn, model, columns, rows):
+    table = model.__table__
+    start = time.perf_counter()
+    if is_postgres(conn):
+        loaded = copy_rows(conn, table, columns, rows)
+        # Explicit ids bypass the serial sequence; move it past them
+        id_column = columns[0]
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{qualify(conn, table.name)}', '{id_column}'), "
+                          f"(SELECT max({id_column}) FROM {qualify(conn, table.name)}))"))
+    else:
+        loaded = insert_rows(conn, table, columns, rows)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    if loaded:
+        print(f"✅ Loaded {loaded:,} {table.name} in {elapsed:.1f}s ({loaded / elapsed:,.0f} rows/s)")
+    return loaded
+
+def next_id(conn, column):
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+def seed_database(volumes=None, seed=DEFAULT_SEED, engine=None):
+    """
+    Generate and load volumes (see DEFAULT_VOLUMES) of rows; the roles must
+    exist, as after setup_database(). Returns {table: rows loaded}.
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    engine = engine or get_engine()
+    loaded = {}
+    start = time.perf_counter()
+
+    with engine.connect() as conn:
+        if is_postgres(conn):
+            conn.execute(text("SET synchronous_commit = off"))
+        elif conn.dialect.name == 'sqlite':
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+
+        role_id = conn.execute(select(Role.role_id).where(Role.role_name == 'End User')).scalar()
+        if role_id is None:
+            raise ValueError("Role 'End User' not found; run setup_database() first")
+
+        loaded['users'] = load(conn, User, ['user_id', 'username', 'password', 'role_id'], generate_users(
+            rng_for(seed, 'users'), next_id(conn, User.user_id), volumes['users'], role_id))
+        loaded['products'] = load(conn, Product, ['product_id', 'product_name', 'current_stock', 'moq',
+                                                  'quantity_type'],
+                                  generate_products(rng_for(seed, 'products'), next_id(conn, Product.product_id),
+                                                    volumes['products']))
+
+        if volumes['orders']:
+            rng = rng_for(seed, 'orders')
+            customers = conn.execute(select(User.user_id).where(User.role_id == role_id)
+                                     .order_by(User.user_id)).scalars().all()
+            products = conn.execute(select(Product.product_id).order_by(Product.product_id)).scalars().all()
+            if not customers or not products:
+                raise ValueError('Orders need at least one customer and one product')
+            loaded['orders'] = load(conn, Order, ['order_id', 'user_id', 'product_id', 'status',
+                                                  'estimated_delivery'],
+                                    generate_orders(rng, next_id(conn, Order.order_id), volumes['orders'],
+                                                    skewed_picker(rng, customers, 1.1),
+                                                    skewed_picker(rng, products, 1.0)))
+
+        loaded['unanswered'] = load(conn, UnansweredQuestion, ['uq_id', 'question', 'status', 'occurrences',
+                                                               'first_seen', 'last_seen'],
+                                    generate_unanswered(rng_for(seed, 'unanswered'),
+                                                        next_id(conn, UnansweredQuestion.uq_id),
+                                                        volumes['unanswered']))
+        loaded['faqs'] = load(conn, FAQ, ['faq_id', 'question', 'answer'],
+                              generate_faqs(rng_for(seed, 'faqs'), next_id(conn, FAQ.faq_id), volumes['faqs']))
+
+        # Fresh statistics so the planner sees the new volumes
+        if is_postgres(conn):
+            for model in (User, Product, Order, UnansweredQuestion, FAQ):
+                conn.execute(text(f"ANALYZE {qualify(conn, model.__table__.name)}"))
+        else:
+            conn.exec_driver_sql("ANALYZE")
+        conn.commit()
+
+    print(f"\n🎉 Seeded {sum(loaded.values()):,} rows in {time.perf_counter() - start:.1f}s")
+    return loaded
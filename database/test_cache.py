@@ -0,0 +1,89 @@
+import time
+import unittest
+
+from cache import LRUCache
+from invalidation import LocalInvalidationBus
+
+class TestLRUCache(unittest.TestCase):
+    """Test LRUCache eviction, expiry and counters"""
+
+    def test_hit_and_miss_counters(self):
+        """Lookups are counted as hits or misses"""
+        cache = LRUCache(max_size=10, ttl=60)
+        cache.set(12345, ('Shipped', 'Jacket', None))
+        self.assertEqual(cache.get(12345), ('Shipped', 'Jacket', None))
+        self.assertIsNone(cache.get(98765))
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        """The entry not used for the longest time is evicted first"""
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        self.assertEqual(cache.get(1), 'a')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire(self):
+        """Entries older than the TTL are treated as missing"""
+        cache = LRUCache(max_size=10, ttl=0.01)
+        cache.set(1, 'a')
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_expired_entries_are_kept_for_stale_reads(self):
+        """get_stale() returns an expired entry until stale_ttl runs out too"""
+        cache = LRUCache(max_size=10, ttl=0.01, stale_ttl=0.05)
+        cache.set(1, 'a')
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get_stale(1), 'a')
+        time.sleep(0.05)
+        self.assertIsNone(cache.get_stale(1))
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+
+    def test_invalidate_and_clear(self):
+        """Invalidated entries are removed"""
+        cache = LRUCache(max_size=10, ttl=60)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(1))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+class TestLocalInvalidationBus(unittest.TestCase):
+    """Test the in-process invalidation bus"""
+
+    def test_publish_reaches_topic_subscribers(self):
+        """Subscribers receive keys published on their topic only"""
+        bus = LocalInvalidationBus()
+        orders, products = [], []
+        bus.subscribe('orders', orders.append)
+        bus.subscribe('products', products.append)
+
+        bus.publish('orders', 12345)
+        bus.publish('orders')
+        self.assertEqual(orders, ['12345', None])
+        self.assertEqual(products, [])
+
+    def test_failing_subscriber_does_not_stop_others(self):
+        """One broken callback does not block delivery to the rest"""
+        bus = LocalInvalidationBus()
+        received = []
+
+        def broken(key):
+            raise RuntimeError("boom")
+
+        bus.subscribe('orders', broken)
+        bus.subscribe('orders', received.append)
+        bus.publish('orders', 1)
+        self.assertEqual(received, ['1'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+from metrics import MetricsAccess, MetricsRegistry, RequestMetrics, instrument_engine, statement_kind, stats_collector
+
+try:
+    from sqlalchemy import create_engine, text
+except ImportError:
+    create_engine = None
+
+def samples(registry):
+    """{sample line without value: value} of the rendered text, comments left out"""
+    result = {}
+    for line in registry.render().splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            result[name] = value
+    return result
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test metric types and the Prometheus text rendering"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Each le bucket counts every observation at or below its bound"""
+        registry = MetricsRegistry()
+        latency = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.labels('/api/products').observe(value)
+        rendered = samples(registry)
+        self.assertEqual(rendered['latency_seconds_bucket{route="/api/products",le="0.1"}'], '2')
+        self.assertEqual(rendered['latency_seconds_bucket{route="/api/products",le="1"}'], '3')
+        self.assertEqual(rendered['latency_seconds_bucket{route="/api/products",le="+Inf"}'], '4')
+        self.assertEqual(rendered['latency_seconds_count{route="/api/products"}'], '4')
+        self.assertAlmostEqual(float(rendered['latency_seconds_sum{route="/api/products"}']), 3.65)
+
+    def test_label_values_are_escaped(self):
+        """Quotes, backslashes and newlines cannot break the text format"""
+        registry = MetricsRegistry()
+        registry.counter('errors_total', 'Errors', ('error',)).labels('bad "quote"\n\\').inc()
+        self.assertIn('errors_total{error="bad \\"quote\\"\\n\\\\"} 1', registry.render())
+
+    def test_registering_twice_returns_the_same_metric(self):
+        """Modules can ask for a shared metric by name"""
+        registry = MetricsRegistry()
+        self.assertIs(registry.counter('runs_total', 'Runs'), registry.counter('runs_total', 'Runs'))
+        with self.assertRaises(ValueError):
+            registry.gauge('runs_total', 'Runs')
+
+    def test_request_metrics_track_errors_and_in_flight(self):
+        """track() counts outcomes, and in-flight drops back to zero after an error"""
+        registry = MetricsRegistry()
+        runs = RequestMetrics(registry, 'action_runs', 'action runs', ('action',))
+        with runs.track('action_answer_faq'):
+            self.assertEqual(runs.in_flight.labels().value, 1)
+        with self.assertRaises(KeyError):
+            with runs.track('action_answer_faq'):
+                raise KeyError('faq')
+        rendered = samples(registry)
+        self.assertEqual(rendered['action_runs_in_flight'], '0')
+        self.assertEqual(rendered['action_runs_total{action="action_answer_faq",status="ok"}'], '1')
+        self.assertEqual(rendered['action_runs_total{action="action_answer_faq",status="error"}'], '1')
+        self.assertEqual(rendered['action_runs_errors_total{action="action_answer_faq",error="KeyError"}'], '1')
+        self.assertEqual(rendered['action_runs_duration_seconds_count{action="action_answer_faq"}'], '2')
+
+    def test_stats_collector_exports_numbers_only(self):
+        """Booleans become 0/1 and values that are not numbers are skipped"""
+        registry = MetricsRegistry()
+        registry.add_collector(stats_collector('faq_catalog', lambda: {
+            'faqs': 3, 'loaded': True, 'refreshed_at': None, 'threshold': 0.3}))
+        rendered = samples(registry)
+        self.assertEqual(rendered, {'faq_catalog_faqs': '3', 'faq_catalog_loaded': '1',
+                                    'faq_catalog_threshold': '0.3'})
+
+    def test_metrics_access(self):
+        """Only allowed networks or the scrape token may read /metrics"""
+        access = MetricsAccess(allow='127.0.0.1, 10.1.0.0/16', token='')
+        self.assertTrue(access.allows('127.0.0.1'))
+        self.assertTrue(access.allows('10.1.2.3'))
+        self.assertFalse(access.allows('10.2.0.1'))
+        self.assertFalse(access.allows(None))
+        self.assertFalse(access.allows('10.2.0.1', 'Bearer '))
+
+        access = MetricsAccess(allow='', token='s3cret')
+        self.assertFalse(access.allows('127.0.0.1'))
+        self.assertFalse(access.allows('127.0.0.1', 'Bearer wrong'))
+        self.assertTrue(access.allows('203.0.113.7', 'Bearer s3cret'))
+
+    def test_statement_kind(self):
+        self.assertEqual(statement_kind('\n  select 1'), 'SELECT')
+        self.assertEqual(statement_kind('UPDATE orders SET status = ?'), 'UPDATE')
+        self.assertEqual(statement_kind('PRAGMA table_info(orders)'), 'OTHER')
+
+    @unittest.skipIf(create_engine is None, 'SQLAlchemy is not installed')
+    def test_instrumented_engine_counts_queries_and_errors(self):
+        """Engine events time each statement and count the ones that fail"""
+        registry = MetricsRegistry()
+        engine = create_engine('sqlite://')
+        instrument_engine(engine, registry)
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+            conn.execute(text('SELECT 2'))
+            with self.assertRaises(Exception):
+                conn.execute(text('SELECT * FROM missing_table'))
+        rendered = samples(registry)
+        self.assertEqual(rendered['db_query_duration_seconds_count{statement="SELECT"}'], '2')
+        self.assertEqual(rendered['db_query_errors_total{statement="SELECT"}'], '1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+try:
+    from sqlalchemy import create_engine, inspect, select
+    from models import Order, UnansweredQuestion
+    from migrations import Migration, MigrationRunner, MIGRATIONS, explain
+except ImportError:
+    create_engine = None
+
+@unittest.skipIf(create_engine is None, 'SQLAlchemy is not installed')
+class TestMigrationRunner(unittest.TestCase):
+    """Test applying, reverting and checking migrations on SQLite"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.engine = create_engine(f"sqlite:///{self.path}",
+                                    execution_options={'schema_translate_map': {Order.__table__.schema: None}})
+        self.runner = MigrationRunner(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def indexes(self, table):
+        return {index['name'] for index in inspect(self.engine).get_indexes(table)}
+
+    def test_upgrade_is_idempotent(self):
+        """Migrations are applied once and recorded"""
+        self.assertEqual(self.runner.upgrade(), [m.version for m in MIGRATIONS])
+        self.assertEqual(self.runner.upgrade(), [])
+        self.assertIn('ix_orders_status', self.indexes('orders'))
+        self.assertTrue(all(applied_at for _, _, applied_at in self.runner.status()))
+
+    def test_upgrade_to_target_and_downgrade(self):
+        """Versions up to a target are applied; down reverts newest first"""
+        self.assertEqual(self.runner.upgrade('0001'), ['0001'])
+        self.assertNotIn('ix_orders_status', self.indexes('orders'))
+        self.runner.upgrade()
+        self.assertEqual(self.runner.downgrade(), ['0006'])
+        self.assertNotIn('ix_unanswered_questions_minhash', self.indexes('unanswered_questions'))
+        self.assertEqual(self.runner.downgrade(), ['0005'])
+        self.assertNotIn('role_permissions', inspect(self.engine).get_table_names())
+        self.assertEqual(self.runner.downgrade(), ['0004'])
+        self.assertNotIn('occurrences', {c['name'] for c in inspect(self.engine).get_columns('unanswered_questions')})
+        self.assertEqual(self.runner.downgrade('0001'), ['0003', '0002'])
+        self.assertNotIn('ix_orders_status', self.indexes('orders'))
+        with self.assertRaises(ValueError):
+            self.runner.downgrade()
+
+    def test_baseline_is_frozen(self):
+        """0001 creates the original tables only; later tables and columns come from their migrations"""
+        self.runner.upgrade('0001')
+        tables = set(inspect(self.engine).get_table_names())
+        self.assertEqual(tables - {'schema_migrations'},
+                         {'roles', 'users', 'products', 'orders', 'faq', 'unanswered_questions'})
+        self.assertEqual([c['name'] for c in inspect(self.engine).get_columns('unanswered_questions')],
+                         ['uq_id', 'question', 'status'])
+        self.runner.upgrade()
+        self.assertLessEqual({'role_permissions', 'admin_sessions'}, set(inspect(self.engine).get_table_names()))
+        self.assertIn('ix_admin_sessions_expires_at', self.indexes('admin_sessions'))
+
+    def test_duplicate_clusters_are_merged(self):
+        """Clusters sharing a signature are folded into the oldest before the unique index"""
+        self.runner.upgrade('0005')
+        table = UnansweredQuestion.__table__
+        with self.engine.begin() as conn:
+            conn.execute(table.insert(), [
+                {'question': 'where is my order', 'occurrences': 2, 'minhash': b'a'},
+                {'question': 'do you ship to canada', 'occurrences': 1, 'minhash': b'b'},
+                {'question': 'Where is my order?', 'occurrences': 3, 'minhash': b'a'},
+                {'question': 'refund', 'occurrences': 1, 'minhash': None},
+            ])
+        self.runner.upgrade()
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(table.c.uq_id, table.c.occurrences).order_by(table.c.uq_id)).all()
+        self.assertEqual([tuple(row) for row in rows], [(1, 5), (2, 1), (4, 1)])
+        self.assertIn('ix_unanswered_questions_minhash', self.indexes('unanswered_questions'))
+
+    def test_failed_migration_is_not_recorded(self):
+        """A migration that raises stays pending"""
+        def fail(conn):
+            raise RuntimeError('boom')
+        runner = MigrationRunner(self.engine, MIGRATIONS + [Migration('9999', 'broken', fail)])
+        with self.assertRaises(RuntimeError):
+            runner.upgrade()
+        self.assertIsNone(runner.status()[-1][2])
+
+    def test_explain_sees_indexes(self):
+        """The plan of an orders status filter uses the status index once it exists"""
+        query = select(Order.order_id).where(Order.status == 'pending')
+        self.runner.upgrade('0001')
+        with self.engine.connect() as conn:
+            self.assertEqual(explain(conn, query), ({'orders'}, set()))
+        self.runner.upgrade()
+        with self.engine.connect() as conn:
+            scanned, indexes = explain(conn, query)
+        self.assertEqual(scanned, set())
+        self.assertIn('ix_orders_status', indexes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from profiling import (QueryBudgetExceeded, QueryProfile, SlowQueryLog, instrument_engine, parse_budgets,
+                       query_profile, statement_shape)
+
+try:
+    from sqlalchemy import create_engine, text
+except ImportError:
+    create_engine = None
+
+class TestQueryProfile(unittest.TestCase):
+    """Test statement shapes, N+1 detection and query budgets"""
+
+    def test_statement_shape(self):
+        """Literals and expanded IN lists do not make a new shape"""
+        self.assertEqual(statement_shape("SELECT * FROM orders WHERE id IN (?, ?, ?) AND status = 'x'"),
+                         statement_shape("SELECT * FROM orders WHERE id IN (?, ?) AND status = 'y'"))
+        self.assertEqual(statement_shape("SELECT * FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s)"),
+                         "SELECT * FROM t WHERE id IN (?...)")
+        self.assertEqual(statement_shape("SELECT param_1 FROM t LIMIT 10"), "SELECT param_1 FROM t LIMIT ?")
+
+    def test_repeated_statements_are_reported_with_call_site(self):
+        """A lookup per row shows up once with its count and where it came from"""
+        profile = QueryProfile('get_orders', mode='report')
+        profile.record('SELECT * FROM orders', 0.001)
+        for _ in range(5):
+            profile.record('SELECT * FROM users WHERE user_id = ?', 0.001)
+        repeated = profile.repeated(threshold=5)
+        self.assertEqual(list(repeated), ['SELECT * FROM users WHERE user_id = ?'])
+        count, sites = repeated['SELECT * FROM users WHERE user_id = ?']
+        self.assertEqual(count, 5)
+        self.assertTrue(sites[0].startswith('database/test_profiling.py:'))
+
+    def test_budget_in_enforce_and_report_mode(self):
+        """Enforce mode raises, report mode only prints"""
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_profile('get_users', budget=1, mode='enforce') as profile:
+                profile.record('SELECT 1', 0.001)
+                profile.record('SELECT 2', 0.001)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with query_profile('get_users', budget=1, mode='report') as profile:
+                profile.record('SELECT 1', 0.001)
+                profile.record('SELECT 2', 0.001)
+        self.assertIn('get_users issued 2 statements, budget is 1', output.getvalue())
+
+    def test_off_mode_records_nothing(self):
+        with query_profile('get_users', budget=0, mode='off') as profile:
+            self.assertIsNone(profile)
+
+    def test_parse_budgets(self):
+        self.assertEqual(parse_budgets('get_orders=2, action_fetch_order_status = 1,,junk'),
+                         {'get_orders': 2, 'action_fetch_order_status': 1})
+
+    def test_slow_query_log_orders_by_total_time(self):
+        """The report lists the most expensive shapes first, with their call sites"""
+        log = SlowQueryLog()
+        profile = QueryProfile('get_orders', mode='report')
+        profile.record('SELECT * FROM orders', 0.5)
+        profile.record('SELECT * FROM users WHERE user_id = 1', 0.2)
+        profile.record('SELECT * FROM users WHERE user_id = 2', 0.2)
+        log.add(profile)
+        slowest = log.slowest()
+        self.assertEqual([shape for shape, _ in slowest],
+                         ['SELECT * FROM orders', 'SELECT * FROM users WHERE user_id = ?'])
+        self.assertEqual(slowest[1][1]['count'], 2)
+        self.assertIn('database/test_profiling.py:', log.report())
+
+    @unittest.skipIf(create_engine is None, 'SQLAlchemy is not installed')
+    def test_engine_statements_are_recorded_once_per_execute(self):
+        """executemany batches count as one statement and statements outside a profile are ignored"""
+        engine = create_engine('sqlite://')
+        instrument_engine(engine)
+        instrument_engine(engine)
+        with engine.connect() as conn:
+            conn.execute(text('CREATE TABLE t (x INTEGER)'))
+            with query_profile('bulk', mode='report') as profile:
+                conn.execute(text('INSERT INTO t (x) VALUES (:x)'), [{'x': i} for i in range(10)])
+                conn.execute(text('SELECT count(*) FROM t')).scalar()
+        self.assertEqual([shape for shape, _, _ in profile.statements],
+                         ['INSERT INTO t (x) VALUES (?)', 'SELECT count(*) FROM t'])
+
+if __name__ == '__main__':
+    unittest.main()
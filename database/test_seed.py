@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+try:
+    from sqlalchemy import create_engine, func, select
+    from models import Role, Order, Product, User, UnansweredQuestion
+    from migrations import MigrationRunner
+    from seed import generate_orders, generate_products, rng_for, seed_database, skewed_picker
+except ImportError:
+    create_engine = None
+
+@unittest.skipIf(create_engine is None, 'SQLAlchemy is not installed')
+class TestSeed(unittest.TestCase):
+    """Test generating and bulk-loading test data"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.engine = create_engine(f"sqlite:///{self.path}",
+                                    execution_options={'schema_translate_map': {Order.__table__.schema: None}})
+        MigrationRunner(self.engine).upgrade()
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_generators_are_deterministic(self):
+        """The same seed gives the same rows"""
+        first = list(generate_products(rng_for(1, 'products'), 1, 50))
+        self.assertEqual(first, list(generate_products(rng_for(1, 'products'), 1, 50)))
+        self.assertNotEqual(first, list(generate_products(rng_for(2, 'products'), 1, 50)))
+
+    def test_orders_are_skewed(self):
+        """A few products get most of the orders; old orders are delivered"""
+        rng = rng_for(1, 'orders')
+        orders = list(generate_orders(rng, 1, 5000, skewed_picker(rng, range(1, 11), 1.1),
+                                      skewed_picker(rng, range(1, 1001), 1.0)))
+        counts = sorted((sum(1 for o in orders if o[2] == p) for p in range(1, 1001)), reverse=True)
+        self.assertGreater(sum(counts[:10]), 5000 * 0.3)
+        self.assertEqual([o[0] for o in orders], list(range(1, 5001)))
+        self.assertTrue(all(o[3] in ('delivered', 'shipped') for o in orders[:1000]))
+
+    def test_seed_database(self):
+        """Rows are loaded after the existing ids and reference existing users and products"""
+        with self.engine.begin() as conn:
+            conn.execute(Role.__table__.insert(), [{'role_name': 'End User'}])
+        volumes = {'users': 20, 'products': 30, 'orders': 200, 'unanswered': 40, 'faqs': 5}
+        self.assertEqual(seed_database(volumes, seed=3, engine=self.engine),
+                         {'users': 20, 'products': 30, 'orders': 200, 'unanswered': 40, 'faqs': 5})
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(select(func.count()).select_from(Order)
+                                          .join(User, Order.user_id == User.user_id)
+                                          .join(Product, Order.product_id == Product.product_id)).scalar(), 200)
+            self.assertGreaterEqual(conn.execute(select(func.min(UnansweredQuestion.occurrences))).scalar(), 1)
+
+        seed_database({'users': 1, 'products': 0, 'orders': 0, 'unanswered': 0, 'faqs': 0}, engine=self.engine)
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(select(func.max(User.user_id))).scalar(), 21)
+
+if __name__ == '__main__':
+    unittest.main()
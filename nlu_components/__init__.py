@@ -0,0 +1,5 @@
+"""
+Custom Rasa NLU components, referenced from config.yml by module path
+(nlu_components.components.FastPathClassifier). Rasa imports them when it
+trains or serves a model from the project root.
+"""
@@ -0,0 +1,152 @@
+"""
+Rasa pipeline components for the fast path.
+
+FastPathClassifier runs right after the tokenizer. When FastPathMatcher
+recognizes a message it sets the intent and entity with confidence 1.0 and
+marks the message with FAST_PATH. The FastPath* subclasses of the costly
+featurizers and classifiers below it in config.yml leave marked messages
+alone, so those messages never reach the CountVectors featurizers,
+DIETClassifier or ResponseSelector. Training data is processed as usual.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Text
+
+from rasa.engine.graph import ExecutionContext, GraphComponent
+from rasa.engine.recipes.default_recipe import DefaultV1Recipe
+from rasa.engine.storage.resource import Resource
+from rasa.engine.storage.storage import ModelStorage
+from rasa.nlu.classifiers.diet_classifier import DIETClassifier
+from rasa.nlu.featurizers.sparse_featurizer.count_vectors_featurizer import CountVectorsFeaturizer
+from rasa.nlu.selectors.response_selector import ResponseSelector
+from rasa.shared.nlu.constants import ENTITIES, INTENT, INTENT_RANKING_KEY, TEXT
+from rasa.shared.nlu.training_data.message import Message
+from rasa.shared.nlu.training_data.training_data import TrainingData
+
+# fast_path puts the database directory on sys.path
+from .fast_path import (DEFAULT_LEAD_INS, DEFAULT_ORDER_MIN_DIGITS, FastPathMatcher, load_product_names,
+                        session_scope)
+from invalidation import get_invalidation_bus
+
+# Message property set on messages the fast path classified
+FAST_PATH = 'fast_path'
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER, DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR],
+    is_trainable=False,
+)
+class FastPathClassifier(GraphComponent):
+    """Classify bare order numbers and exact product names without the trained model"""
+
+    @staticmethod
+    def get_default_config() -> Dict[Text, Any]:
+        return {
+            # Load product names from the products table and follow product changes
+            'product_names_from_database': True,
+            # Seconds between reloads of the product names, which also picks up
+            # changes the invalidation bus cannot deliver (e.g. the in-process bus
+            # of another process); None reads FAST_PATH_PRODUCTS_TTL, 0 disables
+            'product_names_ttl': None,
+            # Extra product names, e.g. when the database is not reachable at startup
+            'product_names': [],
+            # Product names that are also phrases of other intents
+            'excluded_names': [],
+            'lead_ins': list(DEFAULT_LEAD_INS),
+            # Shorter numbers are left to the model, as they may be quantities or years
+            'order_number_min_digits': DEFAULT_ORDER_MIN_DIGITS,
+        }
+
+    def __init__(self, config: Dict[Text, Any], name: Text) -> None:
+        self.config = config
+        self.name = name
+        self.matcher = FastPathMatcher(config['product_names'], config['lead_ins'],
+                                       config['excluded_names'], config['order_number_min_digits'])
+        self._stop = threading.Event()
+        self._refresh_thread = None
+
+    @classmethod
+    def create(
+        cls,
+        config: Dict[Text, Any],
+        model_storage: ModelStorage,
+        resource: Resource,
+        execution_context: ExecutionContext,
+    ) -> "FastPathClassifier":
+        component = cls(config, execution_context.node_name)
+        if config['product_names_from_database']:
+            if session_scope:
+                component.reload_product_names()
+                get_invalidation_bus().subscribe('products', component.reload_product_names)
+                component.start_refresh()
+            else:
+                # Product messages then go through the model; order numbers still take the fast path
+                print("Fast path: database not available, product names are not loaded")
+        return component
+
+    def reload_product_names(self, key: Optional[Text] = None) -> None:
+        """Recompile the product automaton; key is accepted for invalidation bus callbacks"""
+        try:
+            self.matcher.set_product_names(list(self.config['product_names']) + load_product_names())
+        except Exception as e:
+            print(f"Fast path product names could not be loaded: {e}")
+
+    def start_refresh(self) -> None:
+        """Reload the product names every product_names_ttl seconds in a background thread"""
+        ttl = self.config.get('product_names_ttl')
+        ttl = ttl if ttl is not None else float(os.getenv('FAST_PATH_PRODUCTS_TTL', '60'))
+        if ttl <= 0 or self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh, args=(ttl,), name='fast-path-products',
+                                                daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh(self, ttl: float) -> None:
+        while not self._stop.wait(ttl):
+            self.reload_product_names()
+
+    def process_training_data(self, training_data: TrainingData) -> TrainingData:
+        # Training examples must reach every component
+        return training_data
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        for message in messages:
+            match = self.matcher.match(message.get(TEXT))
+            if match is None:
+                continue
+            intent = {'name': match.intent, 'confidence': 1.0}
+            message.set(INTENT, intent, add_to_output=True)
+            message.set(INTENT_RANKING_KEY, [intent], add_to_output=True)
+            message.set(ENTITIES, message.get(ENTITIES, []) + [{
+                'entity': match.entity,
+                'value': match.value,
+                'start': match.start,
+                'end': match.end,
+                'confidence_entity': 1.0,
+                'extractor': self.__class__.__name__,
+            }], add_to_output=True)
+            message.set(FAST_PATH, True, add_to_output=True)
+        return messages
+
+class SkipFastPath:
+    """Mixin for pipeline components that fast path messages do not need"""
+
+    def process(self, messages: List[Message], *args: Any, **kwargs: Any) -> List[Message]:
+        remaining = [message for message in messages if not message.get(FAST_PATH)]
+        if remaining:
+            super().process(remaining, *args, **kwargs)
+        return messages
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.MESSAGE_FEATURIZER], is_trainable=True)
+class FastPathCountVectorsFeaturizer(SkipFastPath, CountVectorsFeaturizer):
+    """CountVectorsFeaturizer that skips messages the fast path classified"""
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER, DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR],
+    is_trainable=True,
+)
+class FastPathDIETClassifier(SkipFastPath, DIETClassifier):
+    """DIETClassifier that skips messages the fast path classified"""
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER], is_trainable=True)
+class FastPathResponseSelector(SkipFastPath, ResponseSelector):
+    """ResponseSelector that skips messages the fast path classified"""
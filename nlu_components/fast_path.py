@@ -0,0 +1,163 @@
+import re
+import sys
+import os
+from collections import namedtuple
+
+# Add the database path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+
+try:
+    from models import session_scope, Product
+except ImportError:
+    # Fallback if database not available
+    session_scope = None
+    Product = None
+
+ORDER_INTENT = 'orderstatus'
+ORDER_ENTITY = 'ordernumber'
+PRODUCT_INTENT = 'productinfo'
+PRODUCT_ENTITY = 'productname'
+
+# Order numbers in data/nlu.yml have five digits; shorter numbers ("1", "30", "2024")
+# are more likely quantities or years and are left to the model and FallbackClassifier
+DEFAULT_ORDER_MIN_DIGITS = 5
+ORDER_MAX_DIGITS = 10
+
+def order_message_pattern(min_digits=DEFAULT_ORDER_MIN_DIGITS):
+    """Matches a message that is only an order number, e.g. 12345, Order 12345, order #12345, Order number 11111"""
+    return re.compile(
+        r"^\s*(?:order\s*(?:(?:number|no\.?|num|#)\s*)?)?#?\s*(\d{%d,%d})\s*[.!?]*\s*$"
+        % (min_digits, ORDER_MAX_DIGITS), re.IGNORECASE)
+
+# Phrases that may come before a product name, from the productinfo examples in data/nlu.yml
+DEFAULT_LEAD_INS = (
+    'tell me about',
+    'tell me about the',
+    'info about',
+    'info on',
+    'details on',
+    'product info for',
+    'what about',
+    'i want to know about',
+)
+
+WORD = re.compile(r"\w+")
+
+# intent, entity and the entity value with its character span in the message
+FastPathMatch = namedtuple('FastPathMatch', ['intent', 'entity', 'value', 'start', 'end'])
+
+def tokenize(text):
+    """Casefolded words of text with their (start, end) spans; punctuation is dropped"""
+    return [(m.group().casefold(), m.start(), m.end()) for m in WORD.finditer(text)]
+
+class PhraseAutomaton:
+    """
+    Word-level automaton accepting a fixed set of phrases.
+
+    States are numbered; transitions[state] maps the next word to the
+    following state and accept[state] holds the value of the phrase ending
+    there. Matching walks one transition per word, so its cost depends on
+    the message length and not on how many phrases were compiled in.
+    """
+
+    def __init__(self, phrases):
+        self.transitions = [{}]
+        self.accept = {}
+        for phrase, value in phrases:
+            state = 0
+            for word, _, _ in tokenize(phrase):
+                following = self.transitions[state].get(word)
+                if following is None:
+                    following = len(self.transitions)
+                    self.transitions[state][word] = following
+                    self.transitions.append({})
+                state = following
+            if state:
+                # Keep the first value for phrases that only differ in case or punctuation
+                self.accept.setdefault(state, value)
+
+    def __len__(self):
+        return len(self.accept)
+
+    def prefix_ends(self, words, start=0):
+        """Every position after start where an accepted phrase ends"""
+        ends = []
+        state = 0
+        for pos in range(start, len(words)):
+            state = self.transitions[state].get(words[pos][0])
+            if state is None:
+                break
+            if state in self.accept:
+                ends.append(pos + 1)
+        return ends
+
+    def match_rest(self, words, start=0):
+        """Value of the phrase spanning words[start:] exactly, or None"""
+        state = 0
+        for pos in range(start, len(words)):
+            state = self.transitions[state].get(words[pos][0])
+            if state is None:
+                return None
+        return self.accept.get(state)
+
+class FastPathMatcher:
+    """
+    Recognizes messages whose intent is certain without the trained model:
+    a bare order number of at least order_min_digits digits, or an exact
+    product name, optionally after a lead-in such as "tell me about".
+
+    The product automaton is rebuilt by set_product_names() and replaced in
+    one assignment, so match() never sees a half-built one.
+    """
+
+    def __init__(self, product_names=(), lead_ins=DEFAULT_LEAD_INS, excluded_names=(),
+                 order_min_digits=DEFAULT_ORDER_MIN_DIGITS):
+        self.order_message = order_message_pattern(order_min_digits)
+        self.lead_ins = PhraseAutomaton((phrase, phrase) for phrase in lead_ins)
+        self.excluded_names = {name.casefold() for name in excluded_names}
+        self.products = PhraseAutomaton(())
+        self.messages = 0
+        self.order_matches = 0
+        self.product_matches = 0
+        self.set_product_names(product_names)
+
+    def set_product_names(self, names):
+        """Compile a new product automaton from the current product names"""
+        self.products = PhraseAutomaton(
+            (name, name) for name in names if name and name.casefold() not in self.excluded_names)
+
+    def match(self, text):
+        """FastPathMatch for text, or None if the message needs the full pipeline"""
+        self.messages += 1
+        order = self.order_message.match(text or '')
+        if order:
+            self.order_matches += 1
+            return FastPathMatch(ORDER_INTENT, ORDER_ENTITY, order.group(1), order.start(1), order.end(1))
+
+        words = tokenize(text or '')
+        products = self.products
+        if not words or not len(products):
+            return None
+        for start in [0] + self.lead_ins.prefix_ends(words):
+            if start < len(words):
+                name = products.match_rest(words, start)
+                if name is not None:
+                    self.product_matches += 1
+                    return FastPathMatch(PRODUCT_INTENT, PRODUCT_ENTITY, name,
+                                         words[start][1], words[-1][2])
+        return None
+
+    def stats(self):
+        matched = self.order_matches + self.product_matches
+        return {
+            'messages': self.messages,
+            'order_matches': self.order_matches,
+            'product_matches': self.product_matches,
+            'short_circuited_ratio': matched / self.messages if self.messages else 0.0,
+            'product_names': len(self.products),
+        }
+
+def load_product_names():
+    """Every product name in the catalog"""
+    with session_scope() as session:
+        return [row[0] for row in session.query(Product.product_name).order_by(Product.product_id)]
@@ -0,0 +1,65 @@
+import unittest
+
+from nlu_components.fast_path import FastPathMatcher, PhraseAutomaton, tokenize
+
+PRODUCTS = ['Jacket', 'Light jacket', 'Laptop 2000', 'Headphones', 'T-Shirt']
+
+class TestFastPathMatcher(unittest.TestCase):
+    """Test which messages skip the trained model"""
+
+    def setUp(self):
+        self.matcher = FastPathMatcher(PRODUCTS)
+
+    def test_bare_order_numbers(self):
+        """A number alone or after 'order' is an order status request"""
+        for text, value in (('12345', '12345'), ('Order 12345', '12345'), ('order #20254', '20254'),
+                            ('Order number 11111', '11111'), (' 00001 ', '00001'), ('12345?', '12345')):
+            match = self.matcher.match(text)
+            self.assertEqual((match.intent, match.entity, match.value), ('orderstatus', 'ordernumber', value))
+            self.assertEqual(text[match.start:match.end], value)
+
+    def test_order_numbers_in_sentences_need_the_model(self):
+        """Only pure order-number messages are short-circuited"""
+        for text in ('Where is my order 98765?', 'Has order 44444 shipped yet?', 'order', '12345 67890'):
+            self.assertIsNone(self.matcher.match(text))
+
+    def test_short_numbers_need_the_model(self):
+        """Numbers shorter than an order id may be quantities or years; the minimum is configurable"""
+        for text in ('1', '30', '2024', 'order 2024'):
+            self.assertIsNone(self.matcher.match(text))
+        matcher = FastPathMatcher(PRODUCTS, order_min_digits=3)
+        self.assertEqual(matcher.match('order 123').value, '123')
+        self.assertIsNone(matcher.match('30'))
+
+    def test_exact_product_names(self):
+        """The whole message, or what follows a lead-in, must be a product name"""
+        for text, value in (('jacket', 'Jacket'), ('Light Jacket!', 'Light jacket'),
+                            ('Tell me about the Laptop 2000', 'Laptop 2000'), ('Info on t-shirt', 'T-Shirt')):
+            match = self.matcher.match(text)
+            self.assertEqual((match.intent, match.entity, match.value), ('productinfo', 'productname', value))
+        match = self.matcher.match('Info about Headphones?')
+        self.assertEqual('Info about Headphones?'[match.start:match.end], 'Headphones')
+
+    def test_partial_names_need_the_model(self):
+        """Prefixes, longer phrases and unknown lead-ins are left to the model"""
+        for text in ('Light', 'jacket please', 'Do you sell jackets', 'I lost my jacket', 'tell me about'):
+            self.assertIsNone(self.matcher.match(text))
+
+    def test_product_names_can_be_replaced_and_excluded(self):
+        """A recompiled automaton takes effect at once; excluded names never match"""
+        matcher = FastPathMatcher(PRODUCTS, excluded_names=['headphones'])
+        self.assertIsNone(matcher.match('headphones'))
+        matcher.set_product_names(['Tablet'])
+        self.assertIsNone(matcher.match('jacket'))
+        self.assertEqual(matcher.match('tablet').value, 'Tablet')
+        self.assertEqual(matcher.stats()['product_names'], 1)
+
+    def test_automaton_prefix_ends(self):
+        """prefix_ends lists where each accepted lead-in ends"""
+        automaton = PhraseAutomaton([('tell me about', 1), ('tell me about the', 2)])
+        words = tokenize('Tell me about the jacket')
+        self.assertEqual(automaton.prefix_ends(words), [3, 4])
+        self.assertEqual(automaton.match_rest(words[:4]), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+"""
+Action server extensions. rasa_sdk imports this package and calls
+init_hooks() when the action server is started from the project root
+(python -m rasa_sdk --actions actions, or rasa run actions).
+"""
+import pluggy
+from sanic import response
+
+hookimpl = pluggy.HookimplMarker("rasa_sdk")
+
+class MetricsPlugin:
+    """Serves GET /metrics on the action server's own port, to METRICS_ALLOW addresses or METRICS_TOKEN"""
+
+    @hookimpl
+    def attach_sanic_app_extensions(self, app):
+        # The actions package registers the action metrics and collectors on import
+        import actions.actions  # noqa: F401
+        from metrics import CONTENT_TYPE, MetricsAccess, default_registry
+
+        access = MetricsAccess()
+
+        async def metrics(request):
+            if not access.allows(request.remote_addr or request.ip, request.headers.get('Authorization')):
+                return response.json({'success': False, 'message': 'Access denied'}, status=403)
+            return response.text(default_registry.render(), content_type=CONTENT_TYPE)
+
+        app.add_route(metrics, '/metrics', methods=['GET'], name='metrics')
+
+def init_hooks(manager):
+    manager.register(MetricsPlugin())